@@ -7,49 +7,311 @@ import os
 import cv2
 import numpy as np
 import time
+import tracemalloc
 from datetime import datetime
 from PIL import Image, ImageEnhance, ImageFilter
 import random
+from contextlib import contextmanager
+from functools import lru_cache
+from metrics import FILTER_STAGE_SECONDS, FILTER_ROI_SAVED_SECONDS
+from color_quantization import ColorQuantizer, apply_palette
+from color_lut import build_lut, apply_lut
+from buffer_arena import get_arena
+from edge_smoothing import EdgeSmoother, DEFAULT_SMOOTHER
+from face_roi import FaceRegionDetector, DEFAULT_ROI, DEFAULT_BACKGROUND_QUALITY, feather_mask
+from image_output import OutputFormat, file_writer
+from style_registry import styles as style_registry
+
+# Quality presets: lower presets smooth and quantize a downscaled copy, then upsample with
+# the full-resolution gray image as guide. Edges always come from the full-resolution image.
+QUALITY_PRESETS = {
+    'max': {'scale': 1.0, 'min_side': 0, 'guide_radius': 0, 'final_diameter': 9},
+    'balanced': {'scale': 0.5, 'min_side': 360, 'guide_radius': 4, 'final_diameter': 7},
+    'fast': {'scale': 0.25, 'min_side': 240, 'guide_radius': 2, 'final_diameter': 5},
+}
+
+# Pick the default preset with CHAT_FILTER_QUALITY
+DEFAULT_QUALITY = os.environ.get('CHAT_FILTER_QUALITY', 'balanced')
+
+# Working memory of the whole-frame pipeline per pixel (measured peak for the balanced
+# preset, where the guided upsampling's float32 planes dominate). Frames whose estimate
+# exceeds CHAT_FILTER_MAX_MEMORY_MB are filtered in tiles instead.
+WORKING_BYTES_PER_PIXEL = 80
+DEFAULT_MAX_MEMORY_MB = float(os.environ.get('CHAT_FILTER_MAX_MEMORY_MB', '256'))
+
+# Tile origins sit on this grid so downscaled tiles line up with the whole-frame grid
+_TILE_ALIGN = 8
+
+# ROI-aware filtering renders the background from a copy at this resolution, and runs the
+# whole frame at full quality when the face region covers more than ROI_MAX_SHARE of it
+ROI_BACKGROUND_SCALE = 0.5
+ROI_MAX_SHARE = 0.6
+
+def _work_scale(preset, height, width):
+    """Scale the smoothing and palette stages run at for a frame size"""
+    return min(1.0, max(preset['scale'], preset['min_side'] / min(height, width)))
+
+def _smoothing_diameter(scale):
+    """Bilateral diameter with the same footprint at the working scale"""
+    return max(5, int(round(15 * scale)) | 1)
+
+def _tile_halo(preset, scale, smoother):
+    """
+    Context a tile needs on each side so its interior matches a whole-frame run
+    
+    The smoothing passes and the guided upsampling's two box passes at the working scale,
+    the adaptive threshold's 9x9 block and the final smoothing pass at full resolution.
+    """
+    work_radius = smoother.reach(_smoothing_diameter(scale)) + 2 * preset['guide_radius'] + 2
+    halo = int(np.ceil(work_radius / scale)) + 4 + smoother.finish_reach(preset['final_diameter'])
+    return -(-halo // _TILE_ALIGN) * _TILE_ALIGN
+
+def _hue_wrap_at(top, left, height, width, amplitude=30, frequency=0.01):
+    """
+    Wave-pattern hue shift (Paprika's hue_wave effect) for a region of the frame
+
+    The shift amplitude * sin(frequency * row) * cos(frequency * col) is built from an
+    outer product of a row and a column vector. Only its integer part survives the uint8
+    hue channel, so it is stored as the hue value at which (hue + shift) mod 180 wraps:
+    shifted = hue - wrap_at, plus 180 where hue < wrap_at.
+    """
+    rows = np.sin(np.arange(top, top + height) * frequency)
+    cols = np.cos(np.arange(left, left + width) * frequency)
+    shift = np.floor(np.outer(rows, cols * amplitude).astype(np.float32)).astype(np.int16)
+    return (180 - np.mod(shift, 180)).astype(np.uint8)  # 1..180
+
+@lru_cache(maxsize=8)
+def _hue_shift_field(height, width, amplitude=30, frequency=0.01):
+    """Hue shift of a whole frame, cached per frame size and wave"""
+    wrap_at = _hue_wrap_at(0, 0, height, width, amplitude, frequency)
+    wrap_at.flags.writeable = False
+    return wrap_at
+
+def _guided_upsample(source, guide, radius, eps=1e-3, out=None):
+    """
+    Edge-aware upsampling (fast guided filter)
+    
+    Fits source = a * guide + b over small windows at the source resolution, then
+    upsamples a and b and applies them to the full-resolution guide, so color
+    boundaries follow the guide's edges instead of the blocky low-resolution ones.
+    Intermediates live in the thread's buffer arena and are updated in place.
+    
+    Args:
+        source (np.ndarray): Low-resolution uint8 BGR image
+        guide (np.ndarray): Full-resolution uint8 gray image
+        radius (int): Window radius at the source resolution
+        eps (float): Regularization; larger values smooth more
+        out (np.ndarray): uint8 BGR array at the guide's size to write into
+    """
+    arena = get_arena()
+    height, width = guide.shape[:2]
+    small_height, small_width = source.shape[:2]
+    small, small_color = (small_height, small_width), (small_height, small_width, 3)
+    ksize = (2 * radius + 1, 2 * radius + 1)
+    
+    def scratch(name, shape):
+        return arena.get(f'guided.{name}', shape, np.float32)
+    
+    def box(name, values):
+        return cv2.boxFilter(values, -1, ksize, dst=scratch(name, values.shape))
+    
+    guide_full = np.divide(guide, np.float32(255.0), out=arena.get('scratch:2', (height, width), np.float32))
+    guide_small = cv2.resize(guide_full, (small_width, small_height), dst=scratch('guide_small', small),
+                             interpolation=cv2.INTER_AREA)
+    source_small = np.divide(source, np.float32(255.0), out=scratch('source', small_color))
+    
+    mean_guide = box('mean_guide', guide_small)
+    mean_source = box('mean_source', source_small)
+    product = np.multiply(guide_small[:, :, None], source_small, out=scratch('product', small_color))
+    covariance = box('covariance', product)
+    np.subtract(covariance, np.multiply(mean_guide[:, :, None], mean_source, out=product), out=covariance)
+    square = np.multiply(guide_small, guide_small, out=scratch('square', small))
+    variance = box('variance', square)
+    np.subtract(variance, np.multiply(mean_guide, mean_guide, out=square), out=variance)
+    
+    # a = covariance / (variance + eps) and b = mean_source - a * mean_guide, in place
+    a = np.divide(covariance, np.add(variance, np.float32(eps), out=variance)[:, :, None], out=covariance)
+    b = np.subtract(mean_source, np.multiply(a, mean_guide[:, :, None], out=product), out=mean_source)
+    a = cv2.resize(box('a', a), (width, height), dst=arena.get('scratch:0', (height, width, 3), np.float32),
+                   interpolation=cv2.INTER_LINEAR)
+    b = cv2.resize(box('b', b), (width, height), dst=arena.get('scratch:1', (height, width, 3), np.float32),
+                   interpolation=cv2.INTER_LINEAR)
+    
+    upsampled = np.add(np.multiply(a, guide_full[:, :, None], out=a), b, out=a)
+    np.multiply(upsampled, np.float32(255.0), out=upsampled)
+    np.add(upsampled, np.float32(0.5), out=upsampled)
+    np.clip(upsampled, 0, 255, out=upsampled)
+    if out is None:
+        return upsampled.astype(np.uint8)
+    np.copyto(out, upsampled, casting='unsafe')
+    return out
+
+# Compiled styles and grading tables, shared by every filter instance
+_compiled_styles = {}
+_saturation_tables = {}
+
+class _CompiledStyle:
+    """
+    A style declaration turned into the tables its pipeline runs on
+
+    The grading steps fold into one 3D LUT applied to the palette colors and brightness
+    and contrast into a 256-entry table, so a style costs the same however many point-wise
+    steps it declares. Only position-dependent effects run as passes of their own.
+    """
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.colors = definition['colors']
+        self.image_weight = definition['image_weight']
+        self.edge_strength = definition['edge_strength']
+        self.effects = definition['effects']
+        self.smoother = EdgeSmoother(DEFAULT_SMOOTHER or definition['smoothing'])
+        self.grading = _grading_functions(definition['grading'])
+        self.grading_lut = build_lut(self.grading) if self.grading else None
+        # convertScaleAbs of every uint8 value, so the table matches it exactly
+        self.tone_table = cv2.convertScaleAbs(np.arange(256, dtype=np.uint8)[None, :],
+                                              alpha=definition['contrast'], beta=definition['brightness'])
+
+def _grading_functions(steps):
+    """Image functions for a style's grading steps, in pipeline order"""
+    functions = {
+        'color_temperature': AnimeMoodFilter._adjust_color_temperature,
+        'saturation': AnimeMoodFilter._enhance_saturation,
+    }
+    return [lambda image, step=step: functions[step['op']](image, step['factor']) for step in steps]
+
+def _compile_style(style):
+    """The compiled pipeline of a registered style, rebuilt only when its declaration changes"""
+    key = (style, style_registry.fingerprint(style))
+    compiled = _compiled_styles.get(key)
+    if compiled is None:
+        compiled = _compiled_styles[key] = _CompiledStyle(style, style_registry.get(style))
+    return compiled
+
+@contextmanager
+def _measure_stage(stats, key):
+    """
+    Add a stage's wall time, CPU time and peak memory to stats[key] (nothing if stats is None)
+    
+    Tiles add their times to the same entry. Peak memory is what the stage allocated on
+    top of what was live when it started, measured only while tracemalloc is tracing.
+    """
+    if stats is None:
+        yield
+        return
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    start, cpu_start = time.perf_counter(), time.process_time()
+    yield
+    entry = stats.setdefault(key, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_bytes': None})
+    entry['calls'] += 1
+    entry['wall_seconds'] += time.perf_counter() - start
+    entry['cpu_seconds'] += time.process_time() - cpu_start
+    if tracing:
+        entry['peak_bytes'] = max(entry['peak_bytes'] or 0, tracemalloc.get_traced_memory()[1] - baseline)
+
+class _StageGraph:
+    """
+    Pipeline stages for one input frame, each run at most once
+    
+    Stages are keyed by their name plus whatever their output depends on besides the
+    input, so styles that need the same stage (smoothing, edges, an 8-color palette)
+    share one result and only the style-specific stages fork.
+    """
+    
+    def __init__(self, image, quality, progress=None, metric_style=None, scale=None, palettes=None, origin=(0, 0),
+                 quantizer=None, stats=None, resolution=1.0):
+        """
+        Args:
+            image (np.ndarray): BGR input frame, or one tile of it
+            quality (str): Quality preset
+            progress (callable): Called once per pipeline stage reached
+            metric_style (str): Style label for the shared stages' metrics
+            scale (float): Working scale (default: from the preset and the image size)
+            palettes (dict): Palettes fixed in advance, by quantization stage key
+            origin (tuple): (row, column) of the image within the whole frame
+            quantizer (ColorQuantizer): Quantizer for this frame (default: the filter's)
+            stats (dict): Filled with each stage's wall time, CPU time and, while tracemalloc
+                          is tracing, peak memory (see _measure_stage)
+            resolution (float): Size of the image relative to the frame, for a downscaled copy
+        """
+        self.image = image
+        self.preset = QUALITY_PRESETS[quality]
+        self.progress = progress
+        self.metric_style = metric_style
+        self.scale = scale if scale is not None else _work_scale(self.preset, *image.shape[:2])
+        self.palettes = palettes or {}
+        self.origin = origin
+        self.quantizer = quantizer
+        self.stats = stats
+        self.resolution = resolution
+        self.results = {}
+        self.timings = {}
+        self._reported = set()
+    
+    def run(self, key, function, style=None):
+        """Result of a stage, computed on first use"""
+        if key not in self.results:
+            start = time.time()
+            with _measure_stage(self.stats, key):
+                self.results[key] = function()
+            elapsed = time.time() - start
+            self.timings[key] = elapsed
+            FILTER_STAGE_SECONDS.observe(elapsed, style=style or self.metric_style, stage=key.split(':')[0])
+        return self.results[key]
+    
+    def report(self, stage):
+        """Pass a progress stage on once, however many styles reach it"""
+        if self.progress and stage not in self._reported:
+            self._reported.add(stage)
+            self.progress(stage)
 
 class AnimeMoodFilter:
     """Professional anime-style filter with multiple styles"""
     
-    def __init__(self, style='Hayao'):
+    def __init__(self, style='Hayao', quantizer=None, quality=None, max_memory_mb=None, output=None, smoother=None,
+                 roi=None, background_quality=None):
         """
         Initialize Anime MOOD Filter
         
         Args:
-            style (str): Animation style - 'Hayao', 'Shinkai', or 'Paprika'
+            style (str): Animation style - 'Hayao', 'Shinkai', 'Paprika' or one added to the registry
+            quantizer (str or ColorQuantizer): Color quantization backend (default: CHAT_QUANTIZER)
+            quality (str): Quality preset - 'fast', 'balanced' or 'max' (default: CHAT_FILTER_QUALITY)
+            max_memory_mb (float): Working memory cap; larger frames are filtered in tiles
+                                   (default: CHAT_FILTER_MAX_MEMORY_MB)
+            output (OutputFormat): Encoding of saved captures (default: CHAT_FILTER_FORMAT)
+            smoother (str or EdgeSmoother): Smoothing backend for every style (default:
+                                            CHAT_SMOOTHER, else each style's own)
+            roi (bool or FaceRegionDetector): Filter only the face and upper body at the
+                                              quality preset and the rest at background_quality
+                                              (default: CHAT_FILTER_ROI)
+            background_quality (str): Preset outside the face region (default:
+                                      CHAT_FILTER_ROI_BACKGROUND or 'fast')
         """
+        quality = quality or DEFAULT_QUALITY
+        background_quality = background_quality or DEFAULT_BACKGROUND_QUALITY
+        for preset in (quality, background_quality):
+            if preset not in QUALITY_PRESETS:
+                raise ValueError(f"Unknown quality preset '{preset}', expected one of {list(QUALITY_PRESETS)}")
         self.style = style
+        self.quality = quality
+        self.max_memory_mb = max_memory_mb or DEFAULT_MAX_MEMORY_MB
+        self.quantizer = quantizer if isinstance(quantizer, ColorQuantizer) else ColorQuantizer(quantizer)
+        self.smoother = smoother if isinstance(smoother, EdgeSmoother) or smoother is None else EdgeSmoother(smoother)
+        roi = DEFAULT_ROI if roi is None else roi
+        self.roi = roi if isinstance(roi, FaceRegionDetector) else (FaceRegionDetector() if roi else None)
+        self.background_quality = background_quality
+        self.last_roi = None  # Region and compute saved by the last ROI-aware call
+        self.output = output or OutputFormat()
         self.output_dir = os.path.join("static", "anime_captures")
         os.makedirs(self.output_dir, exist_ok=True)
         
-        # Style configurations
-        self.style_configs = {
-            'Hayao': {
-                'name': 'Studio Ghibli Style',
-                'description': 'Warm, soft colors inspired by Miyazaki films',
-                'color_temp': 1.1,
-                'saturation': 1.0,
-                'edge_strength': 0.1
-            },
-            'Shinkai': {
-                'name': 'Makoto Shinkai Style', 
-                'description': 'Vibrant, saturated colors with dramatic lighting',
-                'color_temp': 1.0,
-                'saturation': 1.3,
-                'edge_strength': 0.15
-            },
-            'Paprika': {
-                'name': 'Satoshi Kon Style',
-                'description': 'Psychedelic, intense colors with surreal effects',
-                'color_temp': 0.9,
-                'saturation': 1.4,
-                'edge_strength': 0.2
-            }
-        }
-        
+        # Style declarations (see style_registry.py), shared with the web routes
+        self.style_configs = style_registry
+
         print(f"✓ Anime MOOD Filter initialized with {style} style")
         print(f"Style: {self.style_configs[style]['name']}")
     
@@ -201,65 +463,37 @@ class AnimeMoodFilter:
         
         return captured_frame
     
-    def apply_anime_filter(self, image):
-        """Apply anime-style filter to image using advanced image processing"""
+    def apply_anime_filter(self, image, quality=None, progress=None, quantizer=None, stats=None):
+        """
+        Apply anime-style filter to image using advanced image processing
+        
+        Args:
+            image (np.ndarray): BGR image
+            quality (str): Quality preset for this call (default: the filter's preset)
+            progress (callable): Called with 'smoothed' and 'quantized' as those stages finish
+            quantizer (ColorQuantizer): Quantizer for this call, e.g. a TemporalQuantizer
+                                        holding a video's palette (default: the filter's)
+            stats (dict): Filled with per-stage timings and memory, keyed by stage, for the
+                          benchmarks (see _measure_stage)
+        """
         try:
-            print(f"Applying {self.style} anime filter...")
+            quality = quality or self.quality
+            print(f"Applying {self.style} anime filter ({quality})...")
             start_time = time.time()
             
-            # Get style configuration
-            config = self.style_configs[self.style]
-            
-            # Start with the original image
-            anime_image = image.copy()
-            
-            # Step 1: Bilateral Filter for smoothing while preserving edges
-            anime_image = cv2.bilateralFilter(anime_image, 15, 200, 200)
-            anime_image = cv2.bilateralFilter(anime_image, 15, 200, 200)  # Apply twice for stronger effect
-            
-            # Step 2: Color quantization to reduce color palette (anime-like effect)
-            data = anime_image.reshape((-1, 3))
-            data = np.float32(data)
-            
-            # K-means clustering for color reduction
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
-            k = 12 if self.style == 'Paprika' else 8  # More colors for Paprika style
-            _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-            
-            # Convert centers to uint8
-            centers = np.uint8(centers)
-            quantized = centers[labels.flatten()]
-            anime_image = quantized.reshape(image.shape)
-            
-            # Step 3: Edge detection and enhancement
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            edges = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 9, 10)
-            edges = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-            
-            # Step 4: Style-specific adjustments
-            if self.style == 'Hayao':
-                # Miyazaki style - warm, soft colors
-                anime_image = self._adjust_color_temperature(anime_image, config['color_temp'])
-                anime_image = cv2.addWeighted(anime_image, 0.9, edges, config['edge_strength'], 0)
-                
-            elif self.style == 'Shinkai':
-                # Shinkai style - vibrant, saturated colors
-                anime_image = self._enhance_saturation(anime_image, config['saturation'])
-                anime_image = cv2.addWeighted(anime_image, 0.85, edges, config['edge_strength'], 0)
-                
-            elif self.style == 'Paprika':
-                # Paprika style - psychedelic, intense colors
-                anime_image = self._apply_color_shift(anime_image)
-                anime_image = self._enhance_saturation(anime_image, config['saturation'])
-                anime_image = cv2.addWeighted(anime_image, 0.8, edges, config['edge_strength'], 0)
-            
-            # Step 5: Final smoothing and enhancement
-            anime_image = cv2.bilateralFilter(anime_image, 9, 300, 300)
-            
-            # Step 6: Brightness and contrast adjustment
-            anime_image = self._adjust_brightness_contrast(anime_image, brightness=10, contrast=1.1)
+            height, width = image.shape[:2]
+            max_memory = self.max_memory_mb * 1024 * 1024
+            if height * width * WORKING_BYTES_PER_PIXEL > max_memory:
+                anime_image = self._apply_tiled(image, quality, progress, max_memory, quantizer, stats)
+            else:
+                anime_image = self._apply_roi(image, quality, progress, quantizer, stats) if self.roi else None
+                if anime_image is None:
+                    graph = _StageGraph(image, quality, progress, metric_style=self.style, quantizer=quantizer,
+                                        stats=stats)
+                    anime_image = self._render_style(graph, self.style)
             
             process_time = time.time() - start_time
+            FILTER_STAGE_SECONDS.observe(process_time, style=self.style, stage='total')
             print(f"✓ {self.style} anime filter applied successfully in {process_time:.2f} seconds!")
             
             return anime_image
@@ -268,7 +502,271 @@ class AnimeMoodFilter:
             print(f"Error applying anime filter: {e}")
             return None
     
-    def _adjust_color_temperature(self, image, factor):
+    def render_styles(self, image, styles=None, quality=None, progress=None):
+        """
+        Render several styles from one image, running the shared stages once
+        
+        Smoothing, guided upsampling, edge detection and (for styles with the same
+        number of colors) the palette do not depend on the style; only grading and
+        the final passes run per style.
+        
+        Args:
+            image (np.ndarray): BGR image
+            styles (list): Styles to render (default: every style)
+            quality (str): Quality preset (default: the filter's preset)
+            progress (callable): Called with 'smoothed' and 'quantized' as those stages finish
+        
+        Returns:
+            dict: {'variants': {style: image}, 'timings': {stage: seconds}, 'total': seconds},
+                  or None if filtering failed
+        """
+        styles = list(styles or self.style_configs)
+        unknown = [style for style in styles if style not in self.style_configs]
+        if unknown:
+            raise ValueError(f"Unknown styles {unknown}, expected some of {list(self.style_configs)}")
+        quality = quality or self.quality
+        if quality not in QUALITY_PRESETS:
+            raise ValueError(f"Unknown quality preset '{quality}', expected one of {list(QUALITY_PRESETS)}")
+        
+        try:
+            start_time = time.time()
+            graph = _StageGraph(image, quality, progress, metric_style='shared')
+            variants = {style: self._render_style(graph, style) for style in styles}
+            total = time.time() - start_time
+            print(f"✓ Rendered {', '.join(styles)} in {total:.2f} seconds ({len(graph.timings)} stages)")
+            return {'variants': variants, 'timings': dict(graph.timings), 'total': total}
+            
+        except Exception as e:
+            print(f"Error rendering anime styles: {e}")
+            return None
+    
+    def _render_style(self, graph, style):
+        """Run the filter pipeline for one style, reusing stages already in the graph"""
+        image = graph.image
+        preset = graph.preset
+        scale = graph.scale
+        quantizer = graph.quantizer or self.quantizer
+        compiled = _compile_style(style)
+        smoother = self.smoother or compiled.smoother
+        # Stages that depend on the smoothing backend are keyed by it (bilateral keeps the plain names)
+        variant = '' if smoother.backend == 'bilateral' else f':{smoother.backend}'
+        # Stages write into scratch buffers named after their graph key, reused by the next request
+        arena = get_arena()
+        height, width = image.shape[:2]
+        gray = graph.run('gray', lambda: cv2.cvtColor(
+            image, cv2.COLOR_BGR2GRAY, dst=arena.get('gray', (height, width))))
+        
+        # Step 1: Edge-preserving smoothing (bilateral unless the style picks another backend)
+        smoothed = graph.run(f'smoothing{variant}', lambda: self._smooth(image, scale, smoother, f'smoothing{variant}'))
+        graph.report('smoothed')
+        
+        # Step 2: Color quantization to reduce color palette (anime-like effect)
+        k = compiled.colors
+        if scale < 1.0:
+            upsampled = graph.run(f'upsample{variant}', lambda: _guided_upsample(
+                smoothed, gray, preset['guide_radius'], out=arena.get(f'upsample{variant}', image.shape)))
+        palette_key = self._palette_key(style, k) + variant
+        
+        def quantize():
+            # Tiles label against the palette of the whole frame
+            palette = graph.palettes.get(palette_key)
+            if palette is None:
+                if scale == 1.0 and quantizer.backend == 'kmeans':
+                    return quantizer.quantize(smoothed, k, style=style)  # Labels come from k-means itself
+                # Palette from the small image, labels at full resolution after guided upsampling
+                palette = quantizer.build_palette(smoothed, k, style=style)
+            labels = arena.get(f'labels:{palette_key}', (height, width))
+            return quantizer.label_pixels(upsampled if scale < 1.0 else smoothed, palette, out=labels), palette
+        
+        labels, palette = graph.run(palette_key, quantize)
+        graph.report('quantized')
+        
+        # Step 3: Edge detection and enhancement
+        edges = graph.run('edges', lambda: cv2.cvtColor(
+            cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 9, 10,
+                                  dst=arena.get('scratch:0', (height, width))),
+            cv2.COLOR_GRAY2BGR, dst=arena.get('edges', image.shape)))
+        
+        # Step 4: Style-specific adjustments
+        anime_image = graph.run(f'style:{style}', lambda: self._apply_style(
+            compiled, labels, palette, edges, graph.origin, graph.resolution), style)
+        
+        # Step 5: Final smoothing and enhancement
+        if preset['final_diameter']:
+            final = arena.get(f'final_smoothing:{style}', image.shape)
+            anime_image = graph.run(f'final_smoothing:{style}', lambda: smoother.finish(
+                anime_image, preset['final_diameter'], out=final), style)
+        
+        # Step 6: Brightness and contrast through the style's table (a new array: the result
+        # outlives the arena buffers)
+        return graph.run(f'brightness_contrast:{style}', lambda: cv2.LUT(anime_image, compiled.tone_table), style)
+    
+    def _apply_tiled(self, image, quality, progress, max_memory, quantizer=None, stats=None):
+        """
+        Filter a large frame in overlapping tiles
+        
+        Each tile carries a halo wide enough for every neighborhood stage, and all tiles are
+        labelled against one palette built from the whole frame, so tile borders do not show.
+        Working memory stays near max_memory bytes however large the frame is.
+        """
+        preset = QUALITY_PRESETS[quality]
+        height, width = image.shape[:2]
+        scale = _work_scale(preset, height, width)
+        compiled = _compile_style(self.style)
+        smoother = self.smoother or compiled.smoother
+        variant = '' if smoother.backend == 'bilateral' else f':{smoother.backend}'
+        halo = _tile_halo(preset, scale, smoother)
+        side = int(np.sqrt(max_memory / WORKING_BYTES_PER_PIXEL))
+        tile = max(_TILE_ALIGN, (side - 2 * halo) // _TILE_ALIGN * _TILE_ALIGN)
+        
+        # Global palette from a copy small enough for the cap, smoothed like the tiles
+        with FILTER_STAGE_SECONDS.time(style=self.style, stage='palette'), _measure_stage(stats, 'palette'):
+            k = compiled.colors
+            preview_scale = min(scale, side / np.sqrt(height * width))
+            preview = self._smooth(image, preview_scale, smoother)
+            palettes = {self._palette_key(self.style, k) + variant: (quantizer or self.quantizer).build_palette(
+                preview, k, style=self.style)}
+            del preview
+        if progress:
+            progress('smoothed')
+        
+        output = np.empty_like(image)
+        for top in range(0, height, tile):
+            for left in range(0, width, tile):
+                y0, x0 = max(0, top - halo), max(0, left - halo)
+                y1, x1 = min(height, top + tile + halo), min(width, left + tile + halo)
+                graph = _StageGraph(image[y0:y1, x0:x1], quality, metric_style=self.style,
+                                    scale=scale, palettes=palettes, origin=(y0, x0), stats=stats)
+                filtered = self._render_style(graph, self.style)
+                rows, cols = min(tile, height - top), min(tile, width - left)
+                output[top:top + rows, left:left + cols] = \
+                    filtered[top - y0:top - y0 + rows, left - x0:left - x0 + cols]
+                del graph, filtered
+        if progress:
+            progress('quantized')
+        return output
+    
+    def _apply_roi(self, image, quality, progress, quantizer=None, stats=None):
+        """
+        Filter the face and upper body at the quality preset and the rest at the background preset
+        
+        The background pass filters a half-size copy of the whole frame and builds the
+        palette; the face region, with a halo like a tile's, is labelled against the same
+        palette and feather-blended into the upscaled background across its margin. Returns None when there is no face, the
+        region covers most of the frame or the background preset is not cheaper, so the
+        caller filters the whole frame instead.
+        """
+        self.last_roi = None
+        presets = list(QUALITY_PRESETS)
+        if presets.index(self.background_quality) <= presets.index(quality):
+            return None
+        start_time = time.time()
+        with FILTER_STAGE_SECONDS.time(style=self.style, stage='roi_detect'), _measure_stage(stats, 'roi_detect'):
+            faces = self.roi.detect_faces(image)
+            region = self.roi.region(image, faces) if faces else None
+        if region is None:
+            return None
+        height, width = image.shape[:2]
+        top, left, bottom, right = region
+        share = (bottom - top) * (right - left) / (height * width)
+        if share > ROI_MAX_SHARE:
+            print(f"Face region covers {share:.0%} of the frame, filtering all of it at {quality}")
+            return None
+        
+        background_start = time.time()
+        small = cv2.resize(image, (round(width * ROI_BACKGROUND_SCALE), round(height * ROI_BACKGROUND_SCALE)),
+                           interpolation=cv2.INTER_AREA)
+        background = _StageGraph(small, self.background_quality, progress, metric_style=self.style,
+                                 quantizer=quantizer, stats=stats, resolution=ROI_BACKGROUND_SCALE)
+        output = cv2.resize(self._render_style(background, self.style), (width, height),
+                            interpolation=cv2.INTER_LINEAR)
+        palettes = {key: result[1] for key, result in background.results.items() if key.startswith('quantization:')}
+        background_seconds = time.time() - background_start
+        
+        # The region runs at the scale the whole frame would, so it looks the same as without ROI
+        roi_start = time.time()
+        preset = QUALITY_PRESETS[quality]
+        scale = _work_scale(preset, height, width)
+        halo = _tile_halo(preset, scale, self.smoother or _compile_style(self.style).smoother)
+        y0, x0 = max(0, top - halo), max(0, left - halo)
+        y1, x1 = min(height, bottom + halo), min(width, right + halo)
+        graph = _StageGraph(image[y0:y1, x0:x1], quality, metric_style=self.style, scale=scale,
+                            palettes=palettes, origin=(y0, x0), quantizer=quantizer, stats=stats)
+        filtered = self._render_style(graph, self.style)
+        with _measure_stage(stats, 'roi_blend'):
+            weights = feather_mask(region, image.shape, self.roi.feather_width(faces))
+            output[top:bottom, left:right] = cv2.blendLinear(
+                filtered[top - y0:bottom - y0, left - x0:right - x0], output[top:bottom, left:right],
+                weights, 1.0 - weights)
+        roi_seconds = time.time() - roi_start
+        
+        # The full preset costs about the same per pixel on the whole frame as on the region
+        elapsed = time.time() - start_time
+        full_estimate = roi_seconds * (height * width) / ((y1 - y0) * (x1 - x0))
+        saved = full_estimate - elapsed
+        if saved > 0:
+            FILTER_ROI_SAVED_SECONDS.inc(saved, style=self.style)
+        self.last_roi = {
+            'faces': len(faces),
+            'region': region,
+            'share': share,
+            'background_seconds': background_seconds,
+            'roi_seconds': roi_seconds,
+            'seconds': elapsed,
+            'full_estimate_seconds': full_estimate,
+            'saved_seconds': saved,
+        }
+        print(f"✓ Face region is {share:.0%} of the frame: {elapsed:.2f}s instead of about "
+              f"{full_estimate:.2f}s ({saved / full_estimate:.0%} saved)")
+        return output
+    
+    def _palette_key(self, style, k):
+        """Quantization stage key: fixed palettes differ per style, computed ones only depend on k"""
+        return f'quantization:{k}:{style}' if self.quantizer.backend == 'palette' else f'quantization:{k}'
+    
+    def _smooth(self, image, scale, smoother, name='smoothing'):
+        """Downscale for the lower presets, then smooth with the backend (into arena buffer name)"""
+        arena = get_arena()
+        if scale < 1.0:
+            height, width = image.shape[:2]
+            work_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            smoothed = cv2.resize(image, work_size, dst=arena.get('smoothing:resized', work_size[::-1] + (3,)),
+                                  interpolation=cv2.INTER_AREA)
+        else:
+            smoothed = image
+        return smoother.smooth(smoothed, _smoothing_diameter(scale), name)
+    
+    def _apply_style(self, compiled, labels, palette, edges, origin=(0, 0), resolution=1.0):
+        """Grade the palette, paint the labels, run the effects and blend in the edges for one style"""
+        style = compiled.name
+        arena = get_arena()
+        blended = arena.get(f'style:{style}', edges.shape)
+        
+        # Point-wise grading runs through the style LUT on the palette colors only
+        if compiled.grading_lut is not None:
+            palette = apply_lut(palette[None], compiled.grading_lut)[0]
+        anime_image = apply_palette(labels, palette, out=arena.get(f'style:{style}:painted', edges.shape))
+        
+        # Position-dependent effects (e.g. Paprika's psychedelic hue wave) are not in the LUT
+        for index, effect in enumerate(compiled.effects):
+            if effect['op'] == 'hue_wave':
+                anime_image = self._apply_color_shift(
+                    anime_image, saturation=effect['saturation'], origin=origin,
+                    out=arena.get(f'style:{style}:effect:{index}', edges.shape),
+                    amplitude=effect['amplitude'], frequency=effect['frequency'] / resolution)
+        
+        return cv2.addWeighted(anime_image, compiled.image_weight, edges, compiled.edge_strength, 0, dst=blended)
+    
+    def _grading_operations(self, style=None):
+        """Point-wise color operations of a style (default: this filter's), in pipeline order"""
+        return _compile_style(style or self.style).grading
+    
+    def _get_style_lut(self, style=None):
+        """3D LUT of a style's point-wise grading, built once per style"""
+        return _compile_style(style or self.style).grading_lut
+    
+    @staticmethod
+    def _adjust_color_temperature(image, factor):
         """Adjust color temperature of image"""
         try:
             # Convert to float for processing
@@ -290,7 +788,8 @@ class AnimeMoodFilter:
             print(f"Error adjusting color temperature: {e}")
             return image
     
-    def _enhance_saturation(self, image, factor):
+    @staticmethod
+    def _enhance_saturation(image, factor):
         """Enhance saturation of image"""
         try:
             # Convert to HSV
@@ -309,31 +808,48 @@ class AnimeMoodFilter:
             print(f"Error enhancing saturation: {e}")
             return image
     
-    def _apply_color_shift(self, image):
-        """Apply psychedelic color shift for Paprika style"""
+    def _apply_color_shift(self, image, saturation=1.0, origin=(0, 0), out=None, amplitude=30, frequency=0.01):
+        """
+        Apply psychedelic color shift (the hue_wave effect, used by Paprika style)
+        
+        Args:
+            image (np.ndarray): BGR image
+            saturation (float): Saturation factor applied in the same HSV pass
+            origin (tuple): (row, column) of the image within the frame, for tiles
+            out (np.ndarray): Array to write the result into (default: a new one)
+            amplitude (float): Largest hue shift of the wave
+            frequency (float): Wave frequency in radians per pixel
+        """
         try:
-            # Convert to HSV for hue manipulation
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-            hsv = hsv.astype(np.float32)
+            # Convert to HSV for hue manipulation, in a scratch buffer
+            arena = get_arena()
+            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=arena.get('scratch:0', image.shape))
             
-            # Apply random hue shift to different regions
+            # Wave-pattern hue shift, cached per frame size (tiles take their part of the wave)
             h, w = hsv.shape[:2]
+            if origin == (0, 0):
+                wrap_at = _hue_shift_field(h, w, amplitude, frequency)
+            else:
+                wrap_at = _hue_wrap_at(*origin, h, w, amplitude, frequency)
             
-            # Create gradient hue shift
-            hue_shift = np.zeros((h, w), dtype=np.float32)
-            for i in range(h):
-                for j in range(w):
-                    # Create wave pattern for hue shift
-                    shift = 30 * np.sin(i * 0.01) * np.cos(j * 0.01)
-                    hue_shift[i, j] = shift
+            # Apply hue shift in place on the uint8 hue channel, wrapping around 180
+            hue = hsv[:, :, 0]
+            wraps = np.less(hue, wrap_at, out=arena.get('scratch:1', (h, w), np.bool_))
+            np.subtract(hue, wrap_at, out=hue)  # uint8 arithmetic wraps modulo 256
+            np.add(hue, 180, out=hue, where=wraps)
             
-            # Apply hue shift
-            hsv[:, :, 0] += hue_shift
-            hsv[:, :, 0] = np.mod(hsv[:, :, 0], 180)  # Wrap around hue values
+            # Saturation through a 256-entry table instead of a float copy; H and V map to
+            # themselves so the whole HSV image goes through cv2.LUT in place
+            if saturation != 1.0:
+                if saturation not in _saturation_tables:
+                    values = np.arange(256, dtype=np.float32) * np.float32(saturation)
+                    table = np.repeat(np.arange(256, dtype=np.uint8)[None, :, None], 3, axis=2)
+                    table[0, :, 1] = np.clip(values, 0, 255).astype(np.uint8)
+                    _saturation_tables[saturation] = table
+                cv2.LUT(hsv, _saturation_tables[saturation], dst=hsv)
             
             # Convert back to BGR
-            hsv = hsv.astype(np.uint8)
-            return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+            return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR, dst=out)
             
         except Exception as e:
             print(f"Error applying color shift: {e}")
@@ -490,8 +1006,14 @@ class AnimeMoodFilter:
                     pass
             return None
     
-    def apply_mood_filter(self):
-        """Main function to apply mood filter with camera capture"""
+    def apply_mood_filter(self, filter_function=None):
+        """
+        Main function to apply mood filter with camera capture
+        
+        Args:
+            filter_function (callable): Runs the filter on the captured frame
+                                        (default: apply_anime_filter in this process)
+        """
         try:
             print(f"Starting {self.style} MOOD Filter...")
             
@@ -510,25 +1032,27 @@ class AnimeMoodFilter:
                 }
             
             # Apply anime filter
-            filtered_image = self.apply_anime_filter(captured_image)
+            filtered_image = (filter_function or self.apply_anime_filter)(captured_image)
             if filtered_image is None:
                 return {
                     'success': False,
                     'message': 'Failed to apply anime filter'
                 }
             
-            # Save both original and filtered images
+            # Encode each image once; the filtered bytes are saved and returned for chat,
+            # and the background writer puts both on disk
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filtered_bytes = self.output.encode(filtered_image)
             
             # Save original
-            original_filename = f"original_{timestamp}.jpg"
+            original_filename = f"original_{timestamp}.{self.output.extension}"
             original_path = os.path.join(self.output_dir, original_filename)
-            cv2.imwrite(original_path, captured_image)
+            file_writer.write(original_path, self.output.encode(captured_image))
             
             # Save filtered
-            filtered_filename = f"anime_{self.style.lower()}_{timestamp}.jpg"
+            filtered_filename = f"anime_{self.style.lower()}_{timestamp}.{self.output.extension}"
             filtered_path = os.path.join(self.output_dir, filtered_filename)
-            cv2.imwrite(filtered_path, filtered_image)
+            file_writer.write(filtered_path, filtered_bytes)
             
             # Show result for 3 seconds
             result_display = np.hstack([
@@ -551,10 +1075,9 @@ class AnimeMoodFilter:
             
             style_info = self.style_configs[self.style]
             
-            # Convert filtered image to base64 for chat sharing
+            # Base64 of the bytes saved above for chat sharing
             import base64
-            _, buffer = cv2.imencode('.jpg', filtered_image)
-            image_base64 = base64.b64encode(buffer).decode('utf-8')
+            image_base64 = base64.b64encode(filtered_bytes).decode('utf-8')
             
             return {
                 'success': True,
@@ -565,6 +1088,7 @@ class AnimeMoodFilter:
                 'filtered_path': filtered_path,
                 'image_url': f'/static/anime_captures/{filtered_filename}',
                 'image_data': image_base64,  # Base64 for chat sharing
+                'mime_type': self.output.mime_type,
                 'description': style_info['description']
             }
             
@@ -577,15 +1101,15 @@ class AnimeMoodFilter:
 
 def test_anime_filter():
     """Test the anime filter"""
-    styles = ['Hayao', 'Shinkai', 'Paprika']
+    styles = style_registry.names()
     
     print("Available styles:")
     for i, style in enumerate(styles, 1):
         print(f"{i}. {style}")
     
-    choice = input("Choose style (1-3): ").strip()
+    choice = input(f"Choose style (1-{len(styles)}): ").strip()
     
-    if choice in ['1', '2', '3']:
+    if choice in [str(i) for i in range(1, len(styles) + 1)]:
         style = styles[int(choice) - 1]
         filter_app = AnimeMoodFilter(style)
         result = filter_app.apply_mood_filter()
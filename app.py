@@ -3,23 +3,34 @@ Real-Time Chat Website with Emotion Detection and Mood Filters
 Features: Real-time chat, Authentication, Online status, Emotion detection, AnimeGAN filters, Profile management
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, g, Response, send_from_directory
 from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 import os
 import json
 import uuid
 import base64
+import binascii
 import sqlite3
+import importlib
+import importlib.util
 from datetime import datetime
-import bcrypt
 from werkzeug.utils import secure_filename
-import cv2
-import numpy as np
 import threading
 import time
 import sys
+from db_backup import DatabaseBackup
+from message_retention import MessageRetention
+from metrics import registry, TimedConnection, timed_handler, EMOTION_STAGE_SECONDS
+from query_tracer import tracer as query_tracer
+from filter_workers import filter_pool, FilterPoolBusy
+from filter_jobs import FilterJobManager, FilterJobLimit
+from filter_cache import filter_cache, cache_key
+from image_output import OutputFormat, file_writer, mime_type_for
+from live_filter import LiveFilterManager, LiveFilterLimit
+from clip_filter import ClipFilter, ClipFilterLimit
+from style_registry import BUILTIN_STYLES, STYLES_FILE, styles as style_registry
 
-# AI Features - Import modules with intelligent fallback
+# AI Features - configuration is cheap to read, the modules themselves load lazily
 try:
     # Load configuration if available
     from ai_config import EMOTION_MODE, ANIME_FILTER_AVAILABLE
@@ -28,25 +39,90 @@ except ImportError:
     EMOTION_MODE = 'auto'
     ANIME_FILTER_AVAILABLE = True
 
-try:
-    if EMOTION_MODE == 'advanced':
-        # Try advanced version with DeepFace
-        from emotion_detector import EmotionDetector
-        print("✓ Advanced emotion detection loaded!")
-    else:
-        # Use simplified version
-        from simple_emotion_detector import EmotionDetector
-        print("✓ Simplified emotion detection loaded!")
+# OpenCV, NumPy and the AI modules (DeepFace/TensorFlow in advanced mode) take seconds to
+# import, so they are loaded by load_ai_modules() in a background thread once the server
+# is up, or on first use. Until then EMOTION_AVAILABLE only says whether they are installed.
+EMOTION_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ('cv2', 'numpy'))
+EmotionDetector = None
+AnimeMoodFilter = None
+
+ai_ready = threading.Event()
+ai_status = {'state': 'not_loaded', 'load_seconds': None, 'error': None}
+_ai_load_lock = threading.Lock()
+AI_READY_TIMEOUT = 5.0  # Seconds an AI request waits for a warm-up in progress
+
+def load_ai_modules():
+    """Import the AI modules once; safe to call from any thread"""
+    global EmotionDetector, AnimeMoodFilter, EMOTION_AVAILABLE
     
-    # Always try to load anime filter
-    from anime_mood_filter import AnimeMoodFilter
-    print("✓ Anime mood filter loaded!")
+    with _ai_load_lock:
+        if ai_ready.is_set():
+            return EMOTION_AVAILABLE
+        
+        ai_status['state'] = 'loading'
+        start_time = time.time()
+        try:
+            if EMOTION_MODE == 'advanced':
+                # Try advanced version with DeepFace
+                from emotion_detector import EmotionDetector as detector_class
+                print("✓ Advanced emotion detection loaded!")
+            else:
+                # Use simplified version
+                from simple_emotion_detector import EmotionDetector as detector_class
+                print("✓ Simplified emotion detection loaded!")
+            
+            # Always try to load anime filter
+            from anime_mood_filter import AnimeMoodFilter as filter_class
+            print("✓ Anime mood filter loaded!")
+            
+            # First choice of /emotion_detect; it has its own fallback if missing
+            try:
+                importlib.import_module('quick_emotion_detector')
+            except Exception as e:
+                print(f"⚠ Quick emotion detector not available: {e}")
+            
+            EmotionDetector = detector_class
+            AnimeMoodFilter = filter_class
+            EMOTION_AVAILABLE = True
+            ai_status['state'] = 'ready'
+            
+        except Exception as e:
+            print(f"⚠ AI features not available: {e}")
+            EMOTION_AVAILABLE = False
+            ai_status['state'] = 'unavailable'
+            ai_status['error'] = str(e)
+        
+        ai_status['load_seconds'] = time.time() - start_time
+        ai_ready.set()
+        return EMOTION_AVAILABLE
+
+def warm_ai_modules_async(delay=1.0):
+    """Load the AI modules in a background thread after giving the server time to start listening"""
+    if ai_ready.is_set() or ai_status['state'] != 'not_loaded':
+        return
+    ai_status['state'] = 'warming'
     
-    EMOTION_AVAILABLE = True
+    def warm_up():
+        time.sleep(delay)
+        load_ai_modules()
     
-except Exception as e:
-    print(f"⚠ AI features not available: {e}")
-    EMOTION_AVAILABLE = False
+    threading.Thread(target=warm_up, name='ai-warmup', daemon=True).start()
+
+def ai_features_ready(timeout=AI_READY_TIMEOUT):
+    """Check AI readiness, waiting briefly for a warm-up or loading now if none was started"""
+    if ai_ready.is_set():
+        return EMOTION_AVAILABLE
+    if ai_status['state'] == 'not_loaded':
+        return load_ai_modules()
+    ai_ready.wait(timeout)
+    return ai_ready.is_set() and EMOTION_AVAILABLE
+
+def ai_unavailable_response(feature):
+    """JSON body for AI endpoints that cannot serve yet"""
+    if not ai_ready.is_set():
+        return {'success': False, 'warming_up': True,
+                'message': 'AI features are still loading, please try again in a moment'}
+    return {'success': False, 'message': f'{feature} not available'}
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this'
@@ -61,19 +137,84 @@ os.makedirs('static/profiles', exist_ok=True)
 os.makedirs('static/anime_captures', exist_ok=True)
 os.makedirs('static/emotion_captures', exist_ok=True)
 
+DATABASE_PATH = 'chat_app.db'
+
+# Users allowed to run maintenance actions such as backups (CHAT_ADMIN_USER_IDS, comma-separated
+# user ids; ids rather than usernames because users can rename themselves)
+ADMIN_USER_IDS = {user_id.strip() for user_id in os.environ.get('CHAT_ADMIN_USER_IDS', '').split(',')
+                  if user_id.strip()}
+
+# Online backups of the chat database (see db_backup.py)
+db_backup = DatabaseBackup(DATABASE_PATH, backup_dir='backups', keep=5)
+
+# Old private messages move to an archive database (see message_retention.py)
+message_retention = MessageRetention(DATABASE_PATH, archive_path='chat_archive.db', max_age_days=90)
+
 # Global variables for tracking online users and chat rooms
 online_users = {}  # {user_id: {'username': str, 'room': str, 'socket_id': str}}
 chat_rooms = {'general': {'users': [], 'messages': []}}
 
+def notify_user(user_id, event, payload):
+    """Push an event to a user's socket if they are online"""
+    user = online_users.get(str(user_id))
+    if user:
+        socketio.emit(event, payload, room=user['socket_id'])
+
+# Filtered images are encoded once in this format (CHAT_FILTER_FORMAT, see image_output.py)
+filter_output = OutputFormat()
+
+# Asynchronous mood filter jobs (see filter_jobs.py)
+filter_jobs = FilterJobManager(filter_pool, notify_user, max_per_user=2, cache=filter_cache, output=filter_output)
+
+# Live video mood filter sessions (see live_filter.py)
+live_filters = LiveFilterManager(filter_pool, lambda sid, event, payload: socketio.emit(event, payload, room=sid))
+
+# Short clip and GIF mood filtering (see clip_filter.py)
+clip_filters = ClipFilter(filter_pool)
+
+# Metrics exposed at /metrics (see metrics.py)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'chat_http_request_duration_seconds', 'Flask route latency', ['endpoint', 'method', 'status'])
+SOCKET_EVENT_SECONDS = registry.histogram(
+    'chat_socketio_event_duration_seconds', 'Socket.IO event handler latency', ['event'])
+SOCKET_EVENTS_TOTAL = registry.counter(
+    'chat_socketio_events_total', 'Socket.IO events handled', ['event', 'outcome'])
+SOCKET_CONNECTIONS = registry.gauge(
+    'chat_socket_connections', 'Currently connected Socket.IO clients')
+registry.gauge('chat_online_users', 'Authenticated users currently online',
+               callback=lambda: len(online_users))
+registry.gauge('chat_db_backup_pages_remaining', 'Pages left to copy in the running backup',
+               callback=lambda: db_backup.status['pages_remaining'])
+registry.gauge('chat_db_backup_pages_total', 'Pages in the database at the last backup step',
+               callback=lambda: db_backup.status['pages_total'])
+registry.gauge('chat_db_backups_completed', 'Backups completed since start',
+               callback=lambda: db_backup.status['backups_completed'])
+registry.gauge('chat_db_backups_failed', 'Backups failed since start',
+               callback=lambda: db_backup.status['backups_failed'])
+registry.gauge('chat_db_backup_last_duration_seconds', 'Duration of the last successful backup',
+               callback=lambda: db_backup.status['last_duration'] or 0)
+registry.gauge('chat_messages_archived', 'Private messages moved to the archive since start',
+               callback=lambda: message_retention.status['total_moved'])
+
+def socket_event(event):
+    """Register a Socket.IO event handler with call counts and latency metrics"""
+    def decorator(handler):
+        return socketio.on(event)(timed_handler(SOCKET_EVENT_SECONDS, SOCKET_EVENTS_TOTAL, event=event)(handler))
+    return decorator
+
 # Initialize emotion detector if available
 # AI systems will be initialized per request to avoid conflicts
 
 # Database initialization
 def init_db():
     """Initialize the SQLite database"""
-    conn = sqlite3.connect('chat_app.db')
+    conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     
+    # Takes effect only on a new, empty database; existing ones need the one-off migration
+    # in message_retention.py, whose full VACUUM is too slow for startup
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -129,25 +270,109 @@ def init_db():
         )
     ''')
     
+    # Private messages table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS private_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL,
+            sender_username TEXT NOT NULL,
+            recipient_username TEXT NOT NULL,
+            message TEXT NOT NULL,
+            message_type TEXT DEFAULT 'text',
+            extra_data TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (sender_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Retention scans by age
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_private_messages_timestamp
+        ON private_messages (timestamp)
+    ''')
+    
     conn.commit()
     conn.close()
     print("✓ Database initialized")
 
+def start_background_jobs(ai_preload=None):
+    """
+    Start background jobs once the database exists
+    
+    Args:
+        ai_preload (str): 'background' warms the AI modules after startup (default),
+                          'eager' loads them before serving, 'lazy' waits for first use
+    """
+    db_backup.start()
+    message_retention.start()
+    
+    ai_preload = ai_preload or os.environ.get('CHAT_AI_PRELOAD', 'background')
+    if ai_preload == 'eager':
+        load_ai_modules()
+    elif ai_preload == 'background':
+        warm_ai_modules_async()
+    
+    # Anime filter worker processes load OpenCV on their own, off the server process
+    if ai_preload != 'lazy' and EMOTION_AVAILABLE:
+        filter_pool.start()
+
 # Helper functions
 def get_db_connection():
     """Get database connection"""
-    conn = sqlite3.connect('chat_app.db')
+    factory = query_tracer.connection_factory() if query_tracer.enabled else TimedConnection
+    conn = sqlite3.connect(DATABASE_PATH, factory=factory)
     conn.row_factory = sqlite3.Row
     return conn
 
 def hash_password(password):
     """Hash password using bcrypt"""
+    import bcrypt
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
 
 def verify_password(password, hashed):
     """Verify password against hash"""
+    import bcrypt
     return bcrypt.checkpw(password.encode('utf-8'), hashed)
 
+def decode_image_upload(image_data):
+    """Decode a base64 image (with or without a data: URL prefix), or None if it is invalid"""
+    if 'base64,' in image_data:
+        image_data = image_data.split('base64,')[1]
+    try:
+        return base64.b64decode(image_data, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+def save_filtered_capture(user_id, style, encoded_image, source, extension=None):
+    """
+    Queue an encoded filtered image for static/anime_captures and record it; returns the filename
+
+    The file is written by the background writer; serve_anime_capture() serves it from
+    memory until it is on disk. extension defaults to the filter output format's.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    filename = f"{source}_{style.lower()}_{user_id}_{timestamp}.{extension or filter_output.extension}"
+    file_writer.write(os.path.join('static', 'anime_captures', filename), encoded_image)
+    
+    conn = get_db_connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mood_filter_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            filtered_image TEXT NOT NULL,
+            filter_style TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO mood_filter_records (user_id, filtered_image, filter_style)
+        VALUES (?, ?, ?)
+    ''', (user_id, filename, style))
+    conn.commit()
+    conn.close()
+    return filename
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
@@ -268,6 +493,77 @@ def get_user_socket(username):
             return user_data['socket_id']
     return None
 
+def is_admin():
+    """Check whether the logged-in user is listed in CHAT_ADMIN_USER_IDS"""
+    return 'user_id' in session and str(session['user_id']) in ADMIN_USER_IDS
+
+def is_local_request():
+    """Check whether the request comes from this machine (a local scraper or operator)"""
+    # The app is served directly, not behind a proxy, so remote_addr is the real client
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+# Request metrics
+@app.before_request
+def start_request_timer():
+    """Remember when the request started"""
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record route latency once the response is ready"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                     endpoint=request.endpoint or 'unmatched',
+                                     method=request.method,
+                                     status=response.status_code)
+    return response
+
+@app.teardown_request
+def record_failed_request(error):
+    """Record requests that ended in an unhandled exception"""
+    start = g.pop('request_start', None)
+    if start is not None and error is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                     endpoint=request.endpoint or 'unmatched',
+                                     method=request.method,
+                                     status=500)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of all metrics (admins and local scrapers only)"""
+    if not (is_admin() or is_local_request()):
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/slow_queries', methods=['GET', 'POST'])
+def debug_slow_queries():
+    """Top slow SQL statements by total time, or toggle the tracer with POST (admins and local requests only)"""
+    if not (is_admin() or is_local_request()):
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if data.get('reset'):
+            query_tracer.reset()
+        if 'enabled' in data:
+            if data['enabled']:
+                query_tracer.enable(data.get('threshold_ms'))
+            else:
+                query_tracer.disable()
+    
+    limit = request.args.get('limit', 20, type=int)
+    order_by = request.args.get('order', 'total_ms')
+    if order_by not in ('total_ms', 'max_ms', 'count', 'avg_ms'):
+        order_by = 'total_ms'
+    
+    return jsonify({
+        'success': True,
+        'enabled': query_tracer.enabled,
+        'threshold_ms': query_tracer.threshold * 1000.0,
+        'statements': query_tracer.top_statements(limit, order_by)
+    })
+
 # Authentication routes
 @app.route('/')
 def index():
@@ -386,7 +682,8 @@ def dashboard():
     return render_template('dashboard.html', 
                          user=dict(user), 
                          online_users=get_online_users_list(),
-                         emotion_available=EMOTION_AVAILABLE)
+                         emotion_available=EMOTION_AVAILABLE,
+                         anime_styles=style_registry.list_info())
 
 @app.route('/profile', methods=['GET', 'POST'])
 def profile():
@@ -441,20 +738,22 @@ def emotion_detect():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
     
-    if not EMOTION_AVAILABLE:
-        return jsonify({'success': False, 'message': 'Emotion detection not available'})
+    if not ai_features_ready():
+        return jsonify(ai_unavailable_response('Emotion detection'))
     
     try:
         # Try quick detector first (more reliable)
         try:
             from quick_emotion_detector import QuickEmotionDetector
             detector = QuickEmotionDetector()
-            result = detector.detect_emotion_quick()
+            with EMOTION_STAGE_SECONDS.time(detector='quick', stage='total'):
+                result = detector.detect_emotion_quick()
         except Exception as quick_error:
             print(f"Quick detector failed, trying standard: {quick_error}")
             # Fallback to standard detector
             detector = EmotionDetector()
-            result = detector.detect_emotion_from_camera()
+            with EMOTION_STAGE_SECONDS.time(detector=EMOTION_MODE, stage='total'):
+                result = detector.detect_emotion_from_camera()
         
         if result['success']:
             emotion = result['emotion']
@@ -639,52 +938,30 @@ def mood_filter_image():
         data = request.get_json()
         image_data = data.get('image')
         style = data.get('style', 'Shinkai')
+        quality = data.get('quality')  # fast, balanced or max (default: CHAT_FILTER_QUALITY)
         
         if not image_data:
             return jsonify({'success': False, 'message': 'No image data received'})
         
-        # Extract base64 image data (remove data:image/jpeg;base64, prefix)
-        if 'base64,' in image_data:
-            base64_image = image_data.split('base64,')[1]
-        else:
-            base64_image = image_data
-        
-        # Simulate mood filter processing
-        style_configs = {
-            'Shinkai': {
-                'name': 'Makoto Shinkai Style',
-                'description': 'Vibrant, saturated colors with dramatic lighting'
-            },
-            'Hayao': {
-                'name': 'Studio Ghibli Style', 
-                'description': 'Warm, soft colors inspired by Miyazaki films'
-            },
-            'Paprika': {
-                'name': 'Satoshi Kon Style',
-                'description': 'Psychedelic, intense colors with surreal effects'
-            }
-        }
+        # Decode base64 image data (with or without the data:image/jpeg;base64, prefix)
+        encoded_image = decode_image_upload(image_data)
+        if encoded_image is None:
+            return jsonify({'success': False, 'message': 'Invalid image data'})
         
-        style_info = style_configs.get(style, style_configs['Shinkai'])
+        style = style_registry.resolve(style)
+        style_info = style_registry.get(style)
         
-        # Save to database
-        conn = get_db_connection()
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS mood_filter_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                filtered_image TEXT NOT NULL,
-                filter_style TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        conn.execute('''
-            INSERT INTO mood_filter_records (user_id, filtered_image, filter_style)
-            VALUES (?, ?, ?)
-        ''', (session['user_id'], 'browser_capture.jpg', style))
-        conn.commit()
-        conn.close()
+        # Filter in a worker process (unless the same upload was filtered before);
+        # rejected right away when the queue is full
+        try:
+            filtered_image = filter_cache.get_or_compute(
+                cache_key(encoded_image, style, quality, output=filter_output),
+                lambda: filter_pool.filter_encoded(encoded_image, style, quality, output=filter_output),
+                timeout=filter_pool.job_timeout)
+        except FilterPoolBusy as e:
+            return jsonify({'success': False, 'message': str(e), 'busy': True}), 503
+        
+        filtered_filename = save_filtered_capture(session['user_id'], style, filtered_image, 'browser')
         
         return jsonify({
             'success': True,
@@ -692,8 +969,9 @@ def mood_filter_image():
             'style_name': style_info['name'],
             'description': style_info['description'],
             'message': f'Browser-based {style_info["name"]} filter applied successfully!',
-            'image_url': '/static/anime_captures/browser_capture.jpg',
-            'image_data': base64_image,  # Include actual image data for chat
+            'image_url': f'/static/anime_captures/{filtered_filename}',
+            'image_data': base64.b64encode(filtered_image).decode('utf-8'),  # Filtered image for chat
+            'mime_type': filter_output.mime_type,
             'method': 'browser'
         })
         
@@ -701,6 +979,172 @@ def mood_filter_image():
         print(f"Browser mood filter error: {e}")
         return jsonify({'success': False, 'message': f'Filter failed: {str(e)}'})
 
+@app.route('/mood_filter_compare', methods=['POST'])
+def mood_filter_compare():
+    """Render one browser image in several styles side by side"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    if not EMOTION_AVAILABLE:
+        return jsonify({'success': False, 'message': 'Mood filter not available'})
+    
+    try:
+        data = request.get_json() or {}
+        styles = [style for style in data.get('styles') or style_registry.names() if style in style_registry]
+        quality = data.get('quality')
+        
+        encoded_image = decode_image_upload(data.get('image') or '')
+        if not encoded_image:
+            return jsonify({'success': False, 'message': 'Invalid image data'})
+        if not styles:
+            return jsonify({'success': False, 'message': 'No valid styles requested'})
+        
+        # Shared stages (smoothing, edges, palette) run once for all styles
+        try:
+            rendered = filter_pool.render_styles_encoded(encoded_image, styles, quality, output=filter_output)
+        except FilterPoolBusy as e:
+            return jsonify({'success': False, 'message': str(e), 'busy': True}), 503
+        
+        variants = {
+            style: {
+                'style_name': style_registry.get(style)['name'],
+                'description': style_registry.get(style)['description'],
+                'image_data': base64.b64encode(encoded).decode('utf-8')
+            }
+            for style, encoded in rendered['variants'].items()
+        }
+        return jsonify({
+            'success': True,
+            'variants': variants,
+            'mime_type': filter_output.mime_type,
+            'timings_ms': {stage: round(seconds * 1000, 1) for stage, seconds in rendered['timings'].items()}
+        })
+        
+    except Exception as e:
+        print(f"Mood filter compare error: {e}")
+        return jsonify({'success': False, 'message': f'Filter failed: {str(e)}'})
+
+@app.route('/mood_filter_clip', methods=['POST'])
+def mood_filter_clip():
+    """Filter a short browser clip or GIF and return it as an animated WebP, GIF or MP4"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    if not EMOTION_AVAILABLE:
+        return jsonify({'success': False, 'message': 'Mood filter not available'})
+    
+    try:
+        # A multipart 'clip' file (MediaRecorder blob, GIF), or base64 'clip' data in JSON
+        upload = request.files.get('clip')
+        if upload is not None:
+            fields = request.form
+            clip_data = upload.read()
+        else:
+            fields = request.get_json(silent=True) or {}
+            clip_data = decode_image_upload(fields.get('clip') or '')
+        if not clip_data:
+            return jsonify({'success': False, 'message': 'No clip received'})
+        
+        style = style_registry.resolve(fields.get('style', 'Shinkai'))
+        style_info = style_registry.get(style)
+        
+        # Frames are filtered in parallel in the worker pool and written in order
+        try:
+            clip = clip_filters.filter(clip_data, style, fields.get('quality'), fields.get('format'))
+        except (FilterPoolBusy, ClipFilterLimit) as e:
+            return jsonify({'success': False, 'message': str(e), 'busy': True}), 503
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
+        
+        filename = save_filtered_capture(session['user_id'], style, clip['data'], 'clip', extension=clip['extension'])
+        
+        return jsonify({
+            'success': True,
+            'style': style,
+            'style_name': style_info['name'],
+            'description': style_info['description'],
+            'message': f'{style_info["name"]} filter applied to {clip["frames"]} frames!',
+            'clip_url': f'/static/anime_captures/{filename}',
+            'mime_type': clip['mime_type'],
+            'format': clip['format'],
+            'frames': clip['frames'],
+            'fps': clip['fps'],
+            'truncated': clip['truncated'],
+            'method': 'clip'
+        })
+        
+    except Exception as e:
+        print(f"Clip mood filter error: {e}")
+        return jsonify({'success': False, 'message': f'Filter failed: {str(e)}'})
+
+@app.route('/mood_filter_jobs', methods=['POST'])
+def submit_mood_filter_job():
+    """Start a mood filter job; progress and the result arrive over Socket.IO"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    if not EMOTION_AVAILABLE:
+        return jsonify({'success': False, 'message': 'Mood filter not available'})
+    
+    data = request.get_json() or {}
+    style = style_registry.resolve(data.get('style'))
+    quality = data.get('quality')
+    user_id = session['user_id']
+    
+    capture = upload = None
+    if data.get('image'):
+        # Frame captured by the browser
+        upload = decode_image_upload(data['image'])
+        if upload is None:
+            return jsonify({'success': False, 'message': 'Invalid image data'})
+        source = 'browser'
+    else:
+        # Server camera; the capture countdown runs in the job thread, not the request
+        if not ai_features_ready():
+            return jsonify(ai_unavailable_response('Mood filter'))
+        capture = lambda: AnimeMoodFilter(style).capture_image_improved(web_mode=True)
+        source = 'anime'
+    
+    def on_complete(job, encoded_image):
+        filename = save_filtered_capture(user_id, style, encoded_image, source)
+        style_info = style_registry.get(style)
+        return {
+            'style': style,
+            'style_name': style_info['name'],
+            'description': style_info['description'],
+            'message': f'Successfully applied {style_info["name"]} filter!',
+            'image_url': f'/static/anime_captures/{filename}',
+            'mime_type': filter_output.mime_type
+        }
+    
+    try:
+        job = filter_jobs.submit(user_id, style, quality, capture=capture, upload=upload, on_complete=on_complete)
+    except FilterJobLimit as e:
+        return jsonify({'success': False, 'message': str(e)}), 429
+    
+    return jsonify({'success': True, **job.to_dict()})
+
+@app.route('/mood_filter_jobs/<job_id>')
+def mood_filter_job_status(job_id):
+    """Current state of a mood filter job"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    job = filter_jobs.get(job_id, session['user_id'])
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, **job.to_dict()})
+
+@app.route('/mood_filter_jobs/<job_id>/cancel', methods=['POST'])
+def cancel_mood_filter_job(job_id):
+    """Cancel a queued or running mood filter job"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    if not filter_jobs.cancel(job_id, session['user_id']):
+        return jsonify({'success': False, 'message': 'Job not found or already finished'})
+    return jsonify({'success': True, 'message': 'Job cancelled'})
+
 @app.route('/mood_filter_simulate', methods=['POST'])
 def mood_filter_simulate():
     """Simulate mood filter without camera"""
@@ -824,19 +1268,21 @@ def mood_filter_route():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
     
-    if not EMOTION_AVAILABLE:
-        return jsonify({'success': False, 'message': 'Mood filter not available'})
+    if not ai_features_ready():
+        return jsonify(ai_unavailable_response('Mood filter'))
     
     try:
         data = request.get_json()
-        style = data.get('style', 'Shinkai')  # Default to Shinkai
+        style = style_registry.resolve(data.get('style'))  # Default to Shinkai
+        quality = data.get('quality')  # fast, balanced or max (default: CHAT_FILTER_QUALITY)
         
         # Create mood filter instance
-        mood_filter = AnimeMoodFilter(style)
+        mood_filter = AnimeMoodFilter(style, quality=quality, output=filter_output)
         
         # Apply mood filter with debugging
         print(f"🎨 Attempting mood filter with {style} style...")
-        result = mood_filter.apply_mood_filter()
+        result = mood_filter.apply_mood_filter(
+            filter_function=lambda image: filter_pool.filter_array(image, style, quality))
         print(f"🎨 Mood filter result: {result.get('success', False)}")
         if not result['success']:
             print(f"🎨 Mood filter failed: {result.get('message', 'Unknown error')}")
@@ -868,6 +1314,7 @@ def mood_filter_route():
                 'style_name': result['style_name'],
                 'message': result['message'],
                 'description': result['description'],
+                'mime_type': result.get('mime_type'),
                 'fallback': result.get('fallback', False)
             })
         else:
@@ -905,10 +1352,57 @@ def mood_filter_route():
         except Exception as fallback_error:
             return jsonify({'success': False, 'message': f'Camera error and fallback failed: {str(e)}'})
 
+@app.route('/static/anime_captures/<filename>')
+def serve_anime_capture(filename):
+    """Filtered images, served from memory while the background writer still has them queued"""
+    pending = file_writer.read(os.path.join('static', 'anime_captures', filename))
+    if pending is not None:
+        return Response(pending, mimetype=mime_type_for(filename) or 'application/octet-stream')
+    return send_from_directory(os.path.join(app.root_path, 'static', 'anime_captures'), filename)
+
+@app.route('/filter_pool_status')
+def filter_pool_status():
+    """Anime filter worker pool size and load"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    return jsonify({'success': True, **filter_pool.get_status(), 'cache': filter_cache.get_stats(),
+                    'output': filter_output.key(), 'writer': file_writer.get_stats(),
+                    'live': live_filters.get_status(), 'clips': clip_filters.get_status()})
+
+@app.route('/ai_status')
+def ai_status_route():
+    """Readiness of the lazily loaded AI modules"""
+    return jsonify({
+        'success': True,
+        'ready': ai_ready.is_set(),
+        'available': EMOTION_AVAILABLE,
+        'state': ai_status['state'],
+        'load_seconds': ai_status['load_seconds'],
+        'error': ai_status['error']
+    })
+
+@app.route('/backup_status', methods=['GET', 'POST'])
+def backup_status():
+    """Get database backup progress, or trigger a backup with POST"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    if request.method == 'POST':
+        if not is_admin():
+            return jsonify({'success': False, 'message': 'Admin access required'}), 403
+        if db_backup.is_running():
+            return jsonify({'success': False, 'message': 'Backup already running', 'status': db_backup.get_status()})
+        # Run in the background so the request returns immediately
+        threading.Thread(target=db_backup.run_backup, daemon=True).start()
+        return jsonify({'success': True, 'message': 'Backup started', 'status': db_backup.get_status()})
+    
+    return jsonify({'success': True, 'status': db_backup.get_status()})
+
 # Socket.IO events for real-time chat
-@socketio.on('connect')
+@socket_event('connect')
 def handle_connect():
     """Handle user connection"""
+    SOCKET_CONNECTIONS.inc()
     if 'user_id' in session:
         user_id = str(session['user_id'])
         username = session['username']
@@ -932,9 +1426,11 @@ def handle_connect():
         
         print(f"User {username} connected")
 
-@socketio.on('disconnect')
+@socket_event('disconnect')
 def handle_disconnect():
     """Handle user disconnection"""
+    SOCKET_CONNECTIONS.dec()
+    live_filters.stop(request.sid)
     if 'user_id' in session:
         user_id = str(session['user_id'])
         username = session['username']
@@ -952,7 +1448,7 @@ def handle_disconnect():
         
         print(f"User {username} disconnected")
 
-@socketio.on('send_private_message')
+@socket_event('send_private_message')
 def handle_private_message(data):
     """Handle private chat message"""
     if 'user_id' not in session:
@@ -999,7 +1495,7 @@ def handle_private_message(data):
         if recipient_socket:
             emit('receive_private_message', message_data, room=recipient_socket)
 
-@socketio.on('get_chat_history')
+@socket_event('get_chat_history')
 def handle_get_chat_history(data):
     """Get chat history between two users"""
     if 'user_id' not in session:
@@ -1016,7 +1512,22 @@ def handle_get_chat_history(data):
     
     emit('chat_history', {'messages': messages})
 
-@socketio.on('join_room')
+@socket_event('get_archived_history')
+def handle_get_archived_history(data):
+    """Get older, archived messages between two users for scrollback"""
+    if 'user_id' not in session:
+        return
+    
+    recipient = data.get('recipient', '')
+    if not recipient:
+        return
+    
+    username = session['username']
+    messages = message_retention.get_archived_history(username, recipient, before=data.get('before'))
+    
+    emit('archived_history', {'recipient': recipient, 'messages': messages})
+
+@socket_event('join_room')
 def handle_join_room(data):
     """Handle user joining a room"""
     if 'user_id' not in session:
@@ -1037,9 +1548,54 @@ def handle_join_room(data):
     
     emit('room_joined', {'room': room, 'username': username}, room=room)
 
+@socket_event('live_filter_start')
+def handle_live_filter_start(data=None):
+    """Start streaming camera frames through the mood filter"""
+    if 'user_id' not in session:
+        return
+    
+    if not EMOTION_AVAILABLE:
+        emit('live_filter_error', {'message': 'Mood filter not available'})
+        return
+    
+    data = data or {}
+    style = style_registry.resolve(data.get('style'))
+    
+    try:
+        live_session = live_filters.start(request.sid, session['user_id'], style, data.get('fps'))
+    except LiveFilterLimit as e:
+        emit('live_filter_error', {'message': str(e), 'busy': True})
+        return
+    
+    emit('live_filter_started', live_session.to_dict())
+
+@socket_event('live_filter_frame')
+def handle_live_filter_frame(data=None):
+    """One camera frame (binary JPEG, or a base64 data URL) for the running live filter"""
+    data = data or {}
+    frame = data.get('frame')
+    if isinstance(frame, str):
+        frame = decode_image_upload(frame)
+    live_filters.submit_frame(request.sid, data.get('seq'), frame)
+
+@socket_event('live_filter_style')
+def handle_live_filter_style(data=None):
+    """Switch the style of the running live filter"""
+    style = (data or {}).get('style')
+    if style in style_registry:
+        live_filters.set_style(request.sid, style)
+
+@socket_event('live_filter_stop')
+def handle_live_filter_stop(data=None):
+    """Stop the live filter"""
+    live_session = live_filters.stop(request.sid)
+    if live_session is not None:
+        emit('live_filter_stopped', live_session.to_dict())
+
 if __name__ == '__main__':
     # Initialize database
     init_db()
+    start_background_jobs()
     
     print("=" * 50)
     print("🚀 Real-Time Chat Website Starting...")
@@ -1052,6 +1608,9 @@ if __name__ == '__main__':
     if EMOTION_AVAILABLE:
         print("✓ Emotion detection with camera")
         print("✓ AnimeGAN mood filters")
+        extra_styles = [name for name in style_registry if name not in BUILTIN_STYLES]
+        if extra_styles:
+            print(f"✓ {len(extra_styles)} extra anime styles from {STYLES_FILE}")
     else:
         print("⚠ Emotion detection disabled")
     print("✓ Dark themed UI with animations")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Buffer Arena Benchmark
+Repeats filter requests with the scratch arena on and off, counting scratch allocations
+and the peak memory each request allocates (traced with tracemalloc)
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anime_mood_filter import AnimeMoodFilter, QUALITY_PRESETS
+from buffer_arena import get_arena
+from frame_fixtures import SIZES, make_frame
+
+
+def measure(mood_filter, frames, quality, arena_bytes):
+    """Average allocations, peak MB and time per request after one warm-up request"""
+    arena = get_arena()
+    arena.clear()
+    arena.max_bytes = arena_bytes
+    mood_filter.apply_anime_filter(frames[0], quality=quality)
+
+    allocations = arena.allocations
+    peak = 0.0
+    start = time.perf_counter()
+    for frame in frames:
+        tracemalloc.start()
+        mood_filter.apply_anime_filter(frame, quality=quality)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] / 2 ** 20)
+        tracemalloc.stop()
+    elapsed = time.perf_counter() - start
+    return {
+        'allocations': (arena.allocations - allocations) / len(frames),
+        'peak_mb': peak,
+        'ms': elapsed * 1000.0 / len(frames)
+    }
+
+
+def run(sizes, styles, quality, requests):
+    """One row per size, style and arena setting"""
+    results = []
+    default_bytes = get_arena().max_bytes
+    for name in sizes:
+        height, width = SIZES[name]
+        frames = [make_frame(height, width, seed=seed) for seed in range(requests)]
+        for style in styles:
+            mood_filter = AnimeMoodFilter(style)
+            for label, arena_bytes in [('off', 0), ('on', 1 << 40)]:
+                row = measure(mood_filter, frames, quality, arena_bytes)
+                results.append({'size': name, 'style': style, 'arena': label, **row})
+    get_arena().max_bytes = default_bytes
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the filter scratch buffer arena')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['720p', '1080p'])
+    parser.add_argument('--styles', nargs='+', default=['Hayao', 'Paprika'])
+    parser.add_argument('--quality', choices=list(QUALITY_PRESETS), default='balanced')
+    parser.add_argument('--requests', type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.styles, args.quality, args.requests)
+    print("=" * 72)
+    print(f"🧮 Scratch arena, {args.quality} preset, {args.requests} requests each")
+    print("=" * 72)
+    print(f"{'size':<6} {'style':<8} {'arena':<6} {'allocs/req':>10} {'peak':>9} {'time':>9}")
+    for row in results:
+        print(f"{row['size']:<6} {row['style']:<8} {row['arena']:<6} {row['allocations']:>10.1f} "
+              f"{row['peak_mb']:>7.1f}MB {row['ms']:>7.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
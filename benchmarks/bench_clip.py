@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Clip Filter Benchmark
+Filters a synthetic clip into every clip format with one or more worker processes and
+reports the time per clip, the frame rate reached, the output size and the server
+process's peak traced memory (which stays at a few frames however long the clip is)
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clip_filter import ClipFilter
+from filter_workers import FilterWorkerPool
+from frame_fixtures import make_clip_frames
+from image_output import CLIP_FORMATS
+
+
+def make_clip(seconds, fps, height, width):
+    """The synthetic clip encoded as MP4, as a browser upload would arrive"""
+    path = os.path.join(tempfile.mkdtemp(), 'clip.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for frame in make_clip_frames(int(seconds * fps), height, width):
+        writer.write(frame)
+    writer.release()
+    with open(path, 'rb') as f:
+        data = f.read()
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    return data
+
+
+def run(worker_counts, formats, style, quality, seconds, fps, height, width):
+    """One row per worker count and format"""
+    upload = make_clip(seconds, fps, height, width)
+    rows = []
+    for workers in worker_counts:
+        pool = FilterWorkerPool(max_workers=workers)
+        clip_filter = ClipFilter(pool)
+        try:
+            clip_filter.filter(upload, style, quality, formats[0], max_seconds=0.5)  # Start the workers
+            for clip_format in formats:
+                tracemalloc.start()
+                start = time.perf_counter()
+                clip = clip_filter.filter(upload, style, quality, clip_format)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                rows.append({'workers': workers, 'format': clip_format, 'frames': clip['frames'],
+                             'seconds': elapsed, 'kb': len(clip['data']) / 1024, 'peak_mb': peak / 2 ** 20})
+        finally:
+            pool.shutdown()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark clip filtering through the worker pool')
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, max(1, (os.cpu_count() or 2) - 1)])
+    parser.add_argument('--formats', nargs='+', choices=list(CLIP_FORMATS), default=list(CLIP_FORMATS))
+    parser.add_argument('--style', default='Hayao')
+    parser.add_argument('--quality', default=None, help='Quality preset (default: CHAT_CLIP_QUALITY)')
+    parser.add_argument('--seconds', type=float, default=4, help='Clip length')
+    parser.add_argument('--fps', type=int, default=30, help='Clip frame rate (the filter keeps CHAT_CLIP_FPS)')
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--width', type=int, default=640)
+    args = parser.parse_args()
+
+    rows = run(sorted(set(args.workers)), args.formats, args.style, args.quality, args.seconds, args.fps,
+               args.height, args.width)
+    print("=" * 60)
+    print(f"🎞 {args.seconds:.0f}s {args.width}x{args.height} clip at {args.fps} fps, {args.style}")
+    print("=" * 60)
+    print(f"{'workers':>7} {'format':<7} {'frames':>6} {'time':>8} {'fps':>6} {'size':>9} {'peak':>8}")
+    for row in rows:
+        print(f"{row['workers']:>7} {row['format']:<7} {row['frames']:>6} {row['seconds']:>7.2f}s "
+              f"{row['frames'] / row['seconds']:>6.1f} {row['kb']:>7.0f}KB {row['peak_mb']:>6.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
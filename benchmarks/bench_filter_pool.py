@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Filter Worker Pool Benchmark
+Measures anime filter throughput through FilterWorkerPool for 1..N worker processes
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filter_workers import FilterWorkerPool
+from frame_fixtures import SIZES, make_frame
+
+
+def measure(workers, upload, style, quality, jobs):
+    """Jobs per second with `workers` processes and one client thread per queue slot"""
+    pool = FilterWorkerPool(max_workers=workers, admission_timeout=60.0)
+    try:
+        # Start the processes and load OpenCV before timing
+        list(ThreadPoolExecutor(workers).map(lambda _: pool.filter_encoded(upload, style, quality), range(workers)))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(pool.max_workers + pool.max_pending) as clients:
+            list(clients.map(lambda _: pool.filter_encoded(upload, style, quality), range(jobs)))
+        return jobs / (time.perf_counter() - start)
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark filter throughput across worker processes')
+    parser.add_argument('--size', choices=list(SIZES), default='720p')
+    parser.add_argument('--style', default='Shinkai')
+    parser.add_argument('--quality', default='balanced')
+    parser.add_argument('--jobs', type=int, default=24)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    height, width = SIZES[args.size]
+    _, upload = cv2.imencode('.jpg', make_frame(height, width))
+    upload = upload.tobytes()
+
+    print("=" * 50)
+    print(f"🎨 Filter pool throughput ({args.size}, {args.style}, {args.quality})")
+    print("=" * 50)
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        rate = measure(workers, upload, args.style, args.quality, args.jobs)
+        baseline = baseline or rate
+        print(f"{workers:>2} workers: {rate:6.2f} jobs/s ({rate / baseline:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Live Filter Benchmark
+Streams synthetic camera frames from several sessions at a target rate and reports the
+delivered frame rate, latency and how many frames were dropped
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+
+from frame_fixtures import make_frame
+from filter_workers import FilterWorkerPool
+from live_filter import LiveFilterManager, LiveFilterLimit
+
+
+def run(sessions, fps, seconds, workers, style):
+    """Stream from each session for the given time; one result row per session"""
+    pool = FilterWorkerPool(max_workers=workers)
+    pool.start()
+    results = {}
+    latencies = {}
+
+    def emit(sid, event, payload):
+        results[sid] = payload
+        latencies.setdefault(sid, []).append(time.time() - sent_at[sid][payload['seq']])
+
+    manager = LiveFilterManager(pool, emit)
+    frame = cv2.imencode('.jpg', make_frame(480, 640), [cv2.IMWRITE_JPEG_QUALITY, 70])[1].tobytes()
+    sent_at = {}
+    started = []
+    for index in range(sessions):
+        sid = f'session-{index}'
+        try:
+            manager.start(sid, index, style, target_fps=fps)
+        except LiveFilterLimit as e:
+            print(f"⚠ {e}")
+            break
+        sent_at[sid] = {}
+        started.append(sid)
+
+    # Warm the workers up before measuring
+    manager.submit_frame(started[0], 0, frame)
+    sent_at[started[0]][0] = time.time()
+    time.sleep(2)
+    results.clear()
+    latencies.clear()
+
+    def stream(sid):
+        seq = 0
+        end = time.time() + seconds
+        interval = 1.0 / fps
+        while time.time() < end:
+            seq += 1
+            sent_at[sid][seq] = time.time()
+            manager.submit_frame(sid, seq, frame)
+            rate = results.get(sid, {}).get('fps', fps)
+            time.sleep(max(interval, 1.0 / rate))
+
+    threads = [threading.Thread(target=stream, args=(sid,)) for sid in started]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.5)
+
+    rows = []
+    for sid in started:
+        session = manager.stop(sid)
+        samples = sorted(latencies.get(sid, [0.0]))
+        rows.append({
+            'sid': sid,
+            'delivered_fps': session.stats['filtered'] / seconds,
+            'latency_ms': samples[len(samples) // 2] * 1000.0,
+            'p95_ms': samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0] * 1000.0,
+            'dropped': session.stats['dropped'] + session.stats['rejected'],
+            'received': session.stats['received'],
+            'worker_ms': (session.worker_seconds or 0.0) * 1000.0,
+            'max_side': session.max_side
+        })
+    pool.shutdown()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark live filter streaming')
+    parser.add_argument('--sessions', type=int, default=2)
+    parser.add_argument('--fps', type=int, default=12, help='Target frames per second per session')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--style', default='Hayao')
+    args = parser.parse_args()
+
+    rows = run(args.sessions, args.fps, args.seconds, args.workers, args.style)
+    print("=" * 60)
+    print(f"📹 {len(rows)} live sessions at {args.fps} fps target for {args.seconds:.0f}s")
+    print("=" * 60)
+    print(f"{'session':<11} {'fps':>6} {'median':>9} {'p95':>9} {'dropped':>9} {'worker':>8} {'side':>6}")
+    for row in rows:
+        print(f"{row['sid']:<11} {row['delivered_fps']:>6.1f} {row['latency_ms']:>7.0f}ms {row['p95_ms']:>7.0f}ms "
+              f"{row['dropped']:>4}/{row['received']:<4} {row['worker_ms']:>6.0f}ms {row['max_side']:>6}")
+
+
+if __name__ == '__main__':
+    main()
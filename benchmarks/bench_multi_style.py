@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Multi-Style Render Benchmark
+Compares one apply_anime_filter run per style against render_styles with shared stages
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anime_mood_filter import AnimeMoodFilter, QUALITY_PRESETS
+from frame_fixtures import SIZES, make_frame
+
+
+def run(sizes, styles, qualities):
+    """One row per size and preset, plus the stage timings of the shared render"""
+    results = []
+    filters = {style: AnimeMoodFilter(style) for style in styles}
+    for name in sizes:
+        height, width = SIZES[name]
+        frame = make_frame(height, width)
+        for quality in qualities:
+            start = time.perf_counter()
+            for style in styles:
+                filters[style].apply_anime_filter(frame, quality=quality)
+            separate_ms = (time.perf_counter() - start) * 1000.0
+
+            rendered = filters[styles[0]].render_styles(frame, styles, quality=quality)
+            results.append({'size': name, 'quality': quality, 'separate_ms': separate_ms,
+                            'shared_ms': rendered['total'] * 1000.0, 'timings': rendered['timings']})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multi-style rendering with shared stages')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['720p', '1080p'])
+    parser.add_argument('--styles', nargs='+', default=['Hayao', 'Shinkai', 'Paprika'])
+    parser.add_argument('--qualities', nargs='+', choices=list(QUALITY_PRESETS), default=['balanced', 'max'])
+    parser.add_argument('--stages', action='store_true', help='Print per-stage timings of the shared render')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.styles, args.qualities)
+    print("=" * 60)
+    print(f"🎨 Rendering {', '.join(args.styles)}")
+    print("=" * 60)
+    print(f"{'size':<6} {'preset':<9} {'separate':>10} {'shared':>10} {'speedup':>8}")
+    for row in results:
+        print(f"{row['size']:<6} {row['quality']:<9} {row['separate_ms']:>8.0f}ms {row['shared_ms']:>8.0f}ms "
+              f"{row['separate_ms'] / row['shared_ms']:>7.2f}x")
+        if args.stages:
+            for stage, seconds in row['timings'].items():
+                print(f"    {stage:<28} {seconds * 1000:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
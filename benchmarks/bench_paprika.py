@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Paprika Style Benchmark
+Times the Paprika hue shift and the full Paprika filter at 480p, 720p and 1080p,
+before (per-pixel loop) and after (cached outer-product field)
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anime_mood_filter
+from anime_mood_filter import AnimeMoodFilter
+from frame_fixtures import SIZES, make_frame
+
+def loop_color_shift(self, image):
+    """The original per-pixel Paprika hue shift, kept here as the "before" reference"""
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV).astype(np.float32)
+    h, w = hsv.shape[:2]
+    hue_shift = np.zeros((h, w), dtype=np.float32)
+    for i in range(h):
+        for j in range(w):
+            hue_shift[i, j] = 30 * np.sin(i * 0.01) * np.cos(j * 0.01)
+    hsv[:, :, 0] += hue_shift
+    hsv[:, :, 0] = np.mod(hsv[:, :, 0], 180)
+    return cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
+
+
+def best_of(fn, repeat):
+    """Fastest of `repeat` runs in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return min(timings)
+
+
+def run(sizes, repeat, include_before, full_filter):
+    """Benchmark each size and return one result row per size"""
+    mood_filter = AnimeMoodFilter('Paprika')
+    results = []
+
+    for name in sizes:
+        height, width = SIZES[name]
+        frame = make_frame(height, width)
+        row = {'size': name}
+
+        if include_before:
+            row['shift_before_ms'] = best_of(lambda: loop_color_shift(mood_filter, frame), 1)
+
+        anime_mood_filter._hue_shift_field.cache_clear()
+        row['shift_cold_ms'] = best_of(lambda: mood_filter._apply_color_shift(frame), 1)
+        row['shift_after_ms'] = best_of(lambda: mood_filter._apply_color_shift(frame), repeat)
+
+        if full_filter:
+            if include_before:
+                AnimeMoodFilter._apply_color_shift, original = loop_color_shift, AnimeMoodFilter._apply_color_shift
+                try:
+                    row['filter_before_ms'] = best_of(lambda: mood_filter.apply_anime_filter(frame), 1)
+                finally:
+                    AnimeMoodFilter._apply_color_shift = original
+            row['filter_after_ms'] = best_of(lambda: mood_filter.apply_anime_filter(frame), repeat)
+
+        results.append(row)
+    return results
+
+
+def print_results(results):
+    """Print a before/after table"""
+    def fmt(value):
+        return f"{value:>10.1f}" if value is not None else f"{'-':>10}"
+
+    print("=" * 78)
+    print("🎨 Paprika benchmark (best-of timings in ms)")
+    print("=" * 78)
+    print(f"{'size':<6} {'shift old':>10} {'shift cold':>10} {'shift new':>10} {'speedup':>8} "
+          f"{'filter old':>10} {'filter new':>10}")
+    for row in results:
+        before = row.get('shift_before_ms')
+        speedup = f"{before / row['shift_after_ms']:>7.0f}x" if before else f"{'-':>8}"
+        print(f"{row['size']:<6} {fmt(before)} {fmt(row['shift_cold_ms'])} {fmt(row['shift_after_ms'])} {speedup} "
+              f"{fmt(row.get('filter_before_ms'))} {fmt(row.get('filter_after_ms'))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Paprika hue shift before and after vectorization')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement for the new code')
+    parser.add_argument('--skip-before', action='store_true', help='Skip the slow per-pixel reference')
+    parser.add_argument('--shift-only', action='store_true', help='Time only the hue shift, not the whole filter')
+    args = parser.parse_args()
+
+    print_results(run(args.sizes, args.repeat, not args.skip_before, not args.shift_only))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Image Pipeline Benchmark Suite
+Runs every style and quality preset on synthetic and fixture images from 240p to 4K (no
+camera needed), records each stage's wall time, CPU time and peak memory, writes the
+results as JSON and compares them with a stored baseline
+
+The stored baseline keeps only each run's totals and the machine they were measured on;
+the per-stage numbers stay in the results files, which can also be passed as --baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from anime_mood_filter import AnimeMoodFilter, QUALITY_PRESETS
+from buffer_arena import get_arena
+from style_registry import styles as style_registry
+from frame_fixtures import DEFAULT_FIXTURE, fit_image
+
+# 16:9 frames from phone-thumbnail size up to 4K
+RESOLUTIONS = {
+    '240p': (240, 426),
+    '360p': (360, 640),
+    '480p': (480, 854),
+    '720p': (720, 1280),
+    '1080p': (1080, 1920),
+    '4k': (2160, 3840),
+}
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'pipeline.json')
+DEFAULT_RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Changes smaller than these are noise whatever the ratio
+MIN_TIME_CHANGE_MS = 5.0
+MIN_MEMORY_CHANGE_MB = 1.0
+
+# Machine fields that must match for a baseline's times to mean anything here
+FINGERPRINT_FIELDS = ('system', 'architecture', 'cpu_model', 'cpu_count', 'python', 'opencv', 'numpy',
+                      'opencv_threads')
+
+
+class MachineMismatch(Exception):
+    """The baseline was measured on a different machine, so its times are not comparable"""
+
+
+def load_images(names, fixtures):
+    """Source images by name: 'synthetic' plus one per fixture file"""
+    images = {}
+    if 'synthetic' in names:
+        images['synthetic'] = None  # Generated at each resolution, so its detail does not scale
+    if 'fixture' in names:
+        for path in fixtures:
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                raise SystemExit(f"Could not read fixture {path}")
+            images[os.path.splitext(os.path.basename(path))[0]] = image
+    return images
+
+
+def measure(mood_filter, frame, quality, repeat):
+    """
+    One warm-up run, `repeat` timed runs and one run under tracemalloc
+
+    Times are the median of the timed runs, with the scratch buffers warm as in a busy
+    worker. Memory comes from the traced run, which starts with the buffer arena emptied
+    so it shows what a cold worker needs; tracing does not slow the timed runs.
+    """
+    mood_filter.apply_anime_filter(frame, quality=quality)
+    walls, cpus, stage_runs = [], [], []
+    for _ in range(repeat):
+        stats = {}
+        start, cpu_start = time.perf_counter(), time.process_time()
+        result = mood_filter.apply_anime_filter(frame, quality=quality, stats=stats)
+        walls.append(time.perf_counter() - start)
+        cpus.append(time.process_time() - cpu_start)
+        if result is None:
+            raise RuntimeError(f'{mood_filter.style} filter failed at {quality}')
+        stage_runs.append(stats)
+
+    memory = {}
+    get_arena().clear()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        mood_filter.apply_anime_filter(frame, quality=quality, stats=memory)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    stages = {}
+    for stage in stage_runs[0]:
+        stages[stage] = {
+            'calls': stage_runs[0][stage]['calls'],
+            'wall_ms': statistics.median(run[stage]['wall_seconds'] for run in stage_runs) * 1000.0,
+            'cpu_ms': statistics.median(run[stage]['cpu_seconds'] for run in stage_runs) * 1000.0,
+            'peak_mb': (memory.get(stage, {}).get('peak_bytes') or 0) / 2 ** 20,
+        }
+    total = {
+        'wall_ms': statistics.median(walls) * 1000.0,
+        'cpu_ms': statistics.median(cpus) * 1000.0,
+        'peak_mb': peak / 2 ** 20,
+    }
+    return total, stages
+
+
+def run(images, resolutions, style_names, qualities, repeat):
+    """Results of every image, resolution, style and preset, keyed 'image/resolution/style/quality'"""
+    runs = {}
+    for image_name, image in images.items():
+        for resolution in resolutions:
+            height, width = RESOLUTIONS[resolution]
+            frame = fit_image(image, height, width)
+            for style in style_names:
+                mood_filter = AnimeMoodFilter(style)
+                for quality in qualities:
+                    total, stages = measure(mood_filter, frame, quality, repeat)
+                    key = f'{image_name}/{resolution}/{style}/{quality}'
+                    runs[key] = {'image': image_name, 'resolution': resolution, 'size': [height, width],
+                                 'style': style, 'quality': quality, 'total': total, 'stages': stages}
+                    print(f"  {key}: {total['wall_ms']:.0f}ms wall, {total['cpu_ms']:.0f}ms CPU, "
+                          f"{total['peak_mb']:.1f}MB peak")
+    return runs
+
+
+def cpu_model():
+    """The CPU's model name where the OS reports it, else the processor or architecture"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_info():
+    """
+    What the numbers were measured on
+
+    The fingerprint fields identify the hardware and the libraries doing the work; the
+    kernel build and other details that change without moving the numbers are left out.
+    """
+    return {
+        'system': platform.system(),
+        'architecture': platform.machine(),
+        'cpu_model': cpu_model(),
+        'cpu_count': os.cpu_count(),
+        'python': '.'.join(platform.python_version_tuple()[:2]),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+    }
+
+
+def machine_differences(results, baseline):
+    """Fingerprint fields that differ between the machines of the results and the baseline"""
+    current, previous = results.get('machine', {}), baseline.get('machine', {})
+    return [field for field in FINGERPRINT_FIELDS if current.get(field) != previous.get(field)]
+
+
+def trim_baseline(results):
+    """The part of a results file worth storing as the baseline: the machine and each run's totals"""
+    return {
+        'created': results['created'],
+        'machine': results['machine'],
+        'settings': results['settings'],
+        'runs': {key: {'total': {'wall_ms': round(row['total']['wall_ms'], 1),
+                                 'cpu_ms': round(row['total']['cpu_ms'], 1),
+                                 'peak_mb': round(row['total']['peak_mb'], 2)}}
+                 for key, row in results['runs'].items()},
+    }
+
+
+def write_baseline(baseline, path):
+    """Write a trimmed baseline with one run per line, so a recalibration diff shows which runs moved"""
+    header = json.dumps({key: value for key, value in baseline.items() if key != 'runs'}, indent=1)
+    runs = ',\n'.join(f'  {json.dumps(key)}: {json.dumps(row)}' for key, row in baseline['runs'].items())
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(f'{header[:-2]},\n "runs": {{\n{runs}\n }}\n}}\n')
+
+
+def compare(results, baseline, time_tolerance=0.25, memory_tolerance=0.25, allow_other_machine=False):
+    """
+    Regressions of results against a baseline
+
+    A total or stage regresses when its wall time or peak memory grows by more than the
+    tolerance (0.25 = 25%) and by more than the noise floor. Runs or stages missing from
+    either side are skipped: a renamed stage is a change, not a regression. A trimmed
+    baseline has no stages, so only the totals are compared.
+
+    Args:
+        allow_other_machine: Compare against a baseline from a different machine with a
+            warning instead of raising MachineMismatch
+
+    Returns:
+        list: {'run', 'stage', 'metric', 'baseline', 'current', 'change'} dicts
+    """
+    differences = machine_differences(results, baseline)
+    if differences:
+        message = f"Baseline was measured on a different machine (differs in {', '.join(differences)})"
+        if not allow_other_machine:
+            raise MachineMismatch(message)
+        print(f"⚠ {message}; differences may not be regressions")
+
+    regressions = []
+    checks = (('wall_ms', time_tolerance, MIN_TIME_CHANGE_MS), ('peak_mb', memory_tolerance, MIN_MEMORY_CHANGE_MB))
+    for key, current in results['runs'].items():
+        previous = baseline.get('runs', {}).get(key)
+        if previous is None:
+            continue
+        pairs = [('total', current['total'], previous['total'])]
+        previous_stages = previous.get('stages', {})
+        pairs += [(stage, values, previous_stages[stage])
+                  for stage, values in current['stages'].items() if stage in previous_stages]
+        for stage, now, before in pairs:
+            for metric, tolerance, floor in checks:
+                if before[metric] <= 0:
+                    continue
+                change = now[metric] / before[metric] - 1.0
+                if change > tolerance and now[metric] - before[metric] > floor:
+                    regressions.append({'run': key, 'stage': stage, 'metric': metric,
+                                        'baseline': before[metric], 'current': now[metric], 'change': change})
+    return regressions
+
+
+def print_summary(results, baseline):
+    """Totals per run, with the change against the baseline"""
+    width = max([len(key) for key in results['runs']] + [3])
+    print(f"{'run':<{width}} {'wall':>9} {'CPU':>9} {'peak':>8} {'vs base':>8}")
+    for key, row in results['runs'].items():
+        total = row['total']
+        previous = baseline.get('runs', {}).get(key) if baseline else None
+        change = f"{(total['wall_ms'] / previous['total']['wall_ms'] - 1) * 100:+.0f}%" if previous else '-'
+        print(f"{key:<{width}} {total['wall_ms']:>7.0f}ms {total['cpu_ms']:>7.0f}ms {total['peak_mb']:>6.1f}MB {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the anime filter pipeline stage by stage')
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument('--styles', nargs='+', default=style_registry.names())
+    parser.add_argument('--qualities', nargs='+', choices=list(QUALITY_PRESETS), default=list(QUALITY_PRESETS))
+    parser.add_argument('--images', nargs='+', choices=['synthetic', 'fixture'], default=['synthetic', 'fixture'])
+    parser.add_argument('--fixtures', nargs='+', default=[DEFAULT_FIXTURE], help='Photos used as fixture images')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (the median is kept)')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='OpenCV threads (default 1, as in the filter workers)')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/pipeline_<time>.json)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline to compare against')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Store these results' totals and machine as the baseline")
+    parser.add_argument('--allow-other-machine', action='store_true',
+                        help='Compare against a baseline from a different machine instead of refusing')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='Allowed wall time growth (0.25 = 25%%)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='Allowed peak memory growth')
+    args = parser.parse_args()
+
+    unknown = [style for style in args.styles if style not in style_registry]
+    if unknown:
+        parser.error(f"Unknown styles {unknown}, expected some of {style_registry.names()}")
+    cv2.setNumThreads(args.threads)
+
+    print("=" * 60)
+    print("🎨 Anime filter pipeline benchmark")
+    print("=" * 60)
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'settings': {'repeat': args.repeat, 'quantizer': os.environ.get('CHAT_QUANTIZER'),
+                     'smoother': os.environ.get('CHAT_SMOOTHER')},
+        'runs': run(load_images(args.images, args.fixtures), args.resolutions, args.styles,
+                    args.qualities, args.repeat),
+    }
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"✓ Results written to {output}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(results, baseline)
+
+    if args.update_baseline:
+        write_baseline(trim_baseline(results), args.baseline)
+        print(f"✓ Baseline updated: {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"⚠ No baseline at {args.baseline}; run with --update-baseline to store one")
+        return 0
+
+    try:
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance,
+                              args.allow_other_machine)
+    except MachineMismatch as e:
+        print(f"⚠ {e}; not comparing. Record a baseline on this machine with --update-baseline, "
+              f"or pass --allow-other-machine")
+        return 2
+    for regression in regressions:
+        print(f"⚠ {regression['run']} {regression['stage']} {regression['metric']}: "
+              f"{regression['baseline']:.1f} -> {regression['current']:.1f} ({regression['change'] * 100:+.0f}%)")
+    if regressions:
+        print(f"⚠ {len(regressions)} regressions against the baseline")
+        return 1
+    print("✓ No regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Filter Quality Preset Benchmark
+Times apply_anime_filter for each style and preset (best of several runs) and scores
+fast/balanced against max with PSNR/SSIM; exits non-zero when a lower preset is slower
+than the preset above it by more than the margin
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anime_mood_filter import AnimeMoodFilter, QUALITY_PRESETS
+from image_quality import psnr, ssim
+from frame_fixtures import SIZES, make_frame
+from bench_paprika import best_of
+
+
+def timed_filter(mood_filter, frame, quality, repeat):
+    """Filtered frame and the best elapsed milliseconds of repeat runs"""
+    result = mood_filter.apply_anime_filter(frame, quality=quality)
+    return result, best_of(lambda: mood_filter.apply_anime_filter(frame, quality=quality), repeat)
+
+
+def run(sizes, styles, quantizer, repeat=5):
+    """One row per size, style and preset"""
+    results = []
+    for name in sizes:
+        height, width = SIZES[name]
+        frame = make_frame(height, width)
+        for style in styles:
+            mood_filter = AnimeMoodFilter(style, quantizer=quantizer)
+            reference, reference_ms = timed_filter(mood_filter, frame, 'max', repeat)
+            results.append({'size': name, 'style': style, 'quality': 'max', 'ms': reference_ms,
+                            'speedup': 1.0, 'psnr': float('inf'), 'ssim': 1.0})
+            for quality in QUALITY_PRESETS:
+                if quality == 'max':
+                    continue
+                result, elapsed = timed_filter(mood_filter, frame, quality, repeat)
+                results.append({'size': name, 'style': style, 'quality': quality, 'ms': elapsed,
+                                'speedup': reference_ms / elapsed,
+                                'psnr': psnr(reference, result), 'ssim': ssim(reference, result)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the anime filter quality presets')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--styles', nargs='+', default=['Hayao', 'Shinkai', 'Paprika'])
+    parser.add_argument('--quantizer', default=None, help='Quantizer backend (default: CHAT_QUANTIZER)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per timing (best is kept)')
+    parser.add_argument('--margin', type=float, default=0.15,
+                        help='How much slower than the preset above it a preset may measure (timing noise)')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.styles, args.quantizer, args.repeat)
+    print("=" * 60)
+    print("🎨 Anime filter presets (scored against max)")
+    print("=" * 60)
+    print(f"{'size':<6} {'style':<8} {'preset':<9} {'time':>10} {'speedup':>8} {'PSNR':>8} {'SSIM':>6}")
+    # Presets from the most to the least expensive; a style whose smoothing costs the same at
+    # every scale (guided) may run balanced as fast as max, but never slower
+    order = list(QUALITY_PRESETS)
+    timings = {(row['size'], row['style'], row['quality']): row['ms'] for row in results}
+    slow = []
+    for row in results:
+        mark = ''
+        index = order.index(row['quality'])
+        above = timings.get((row['size'], row['style'], order[index - 1])) if index else None
+        if above is not None and row['ms'] > above * (1 + args.margin):
+            slow.append(row)
+            mark = ' ⚠'
+        print(f"{row['size']:<6} {row['style']:<8} {row['quality']:<9} {row['ms']:>8.0f}ms {row['speedup']:>7.2f}x "
+              f"{row['psnr']:>6.2f}dB {row['ssim']:>6.3f}{mark}")
+    if slow:
+        print(f"⚠ {len(slow)} presets more than {args.margin:.0%} slower than the preset above them")
+        return 1
+    print(f"✓ No preset slower than the one above it (margin {args.margin:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Color Quantization Benchmark
+Times every quantizer backend at 480p, 720p and 1080p and compares its error with full k-means
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from color_quantization import ColorQuantizer, QUANTIZER_BACKENDS, apply_palette
+from image_quality import psnr
+from frame_fixtures import SIZES, make_frame
+
+
+def run(sizes, backends, k, style):
+    """Time each backend on a bilateral-smoothed frame, as apply_anime_filter sees it"""
+    results = []
+    for name in sizes:
+        height, width = SIZES[name]
+        frame = cv2.bilateralFilter(make_frame(height, width), 15, 200, 200)
+        for backend in backends:
+            quantizer = ColorQuantizer(backend)
+            start = time.perf_counter()
+            labels, palette = quantizer.quantize(frame, k, style=style)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            results.append({
+                'size': name,
+                'backend': backend,
+                'ms': elapsed,
+                'colors': len(palette),
+                'psnr': psnr(frame, apply_palette(labels, palette))
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the color quantization backends')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--backends', nargs='+', choices=QUANTIZER_BACKENDS, default=list(QUANTIZER_BACKENDS))
+    parser.add_argument('--k', type=int, default=8, help='Number of colors')
+    parser.add_argument('--style', default='Hayao', help='Style for the fixed palette backend')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"🎨 Color quantization benchmark (k={args.k})")
+    print("=" * 60)
+    print(f"{'size':<6} {'backend':<15} {'time':>10} {'colors':>7} {'PSNR':>8}")
+    for row in run(args.sizes, args.backends, args.k, args.style):
+        print(f"{row['size']:<6} {row['backend']:<15} {row['ms']:>8.1f}ms {row['colors']:>7} {row['psnr']:>6.2f}dB")
+
+
+if __name__ == '__main__':
+    main()
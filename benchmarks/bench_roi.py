@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+ROI-Aware Filtering Benchmark
+Times the whole-frame filter against ROI-aware filtering (full pipeline on the face and
+upper body, cheap preset on the rest) on a webcam portrait placed in a larger scene, and
+scores the face region against the whole-frame output with SSIM
+"""
+
+import argparse
+import os
+import sys
+
+import cv2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from anime_mood_filter import AnimeMoodFilter, QUALITY_PRESETS
+from image_quality import ssim
+from style_registry import styles as style_registry
+from frame_fixtures import DEFAULT_FIXTURE, SIZES, make_scene
+from bench_paprika import best_of
+
+
+def run(sizes, style_names, qualities, person_height, repeat):
+    """One row per size, style and preset"""
+    portrait = cv2.imread(DEFAULT_FIXTURE, cv2.IMREAD_COLOR)
+    results = []
+    for name in sizes:
+        height, width = SIZES[name]
+        scene = make_scene(height, width, portrait, person_height)
+        for style in style_names:
+            for quality in qualities:
+                whole = AnimeMoodFilter(style, quality=quality, roi=False)
+                roi = AnimeMoodFilter(style, quality=quality, roi=True)
+                reference = whole.apply_anime_filter(scene)
+                output = roi.apply_anime_filter(scene)
+                row = {'size': name, 'style': style, 'quality': quality,
+                       'whole_ms': best_of(lambda: whole.apply_anime_filter(scene), repeat),
+                       'roi_ms': best_of(lambda: roi.apply_anime_filter(scene), repeat)}
+                if roi.last_roi is None:
+                    row.update({'share': None, 'estimate': None, 'ssim': None})
+                else:
+                    top, left, bottom, right = roi.last_roi['region']
+                    row.update({'share': roi.last_roi['share'],
+                                'estimate': roi.last_roi['saved_seconds'] / roi.last_roi['full_estimate_seconds'],
+                                'ssim': ssim(reference[top:bottom, left:right], output[top:bottom, left:right])})
+                results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ROI-aware filtering against the whole-frame filter')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['720p', '1080p'])
+    parser.add_argument('--styles', nargs='+', default=style_registry.names())
+    parser.add_argument('--qualities', nargs='+', choices=list(QUALITY_PRESETS), default=['max', 'balanced'])
+    parser.add_argument('--person-height', type=float, default=0.5, help='Portrait height as a share of the frame')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per timing (best is kept)')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.styles, args.qualities, args.person_height, args.repeat)
+    print("=" * 60)
+    print("🎨 ROI-aware filtering (face region SSIM against the whole-frame filter)")
+    print("=" * 60)
+    print(f"{'size':<6} {'style':<10} {'preset':<9} {'whole':>8} {'ROI':>8} {'saved':>6} {'estimated':>9} "
+          f"{'region':>7} {'SSIM':>6}")
+    for row in results:
+        saved = 1.0 - row['roi_ms'] / row['whole_ms']
+        if row['share'] is None:
+            tail = f"{'-':>9} {'-':>7} {'-':>6}"
+        else:
+            tail = f"{row['estimate'] * 100:>8.0f}% {row['share'] * 100:>6.0f}% {row['ssim']:>6.3f}"
+        print(f"{row['size']:<6} {row['style']:<10} {row['quality']:<9} {row['whole_ms']:>6.0f}ms "
+              f"{row['roi_ms']:>6.0f}ms {saved * 100:>5.0f}% {tail}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Edge-Preserving Smoothing Benchmark
+Times every smoothing backend on its own and inside apply_anime_filter, and scores both
+outputs against the bilateral backend with SSIM
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anime_mood_filter import AnimeMoodFilter, QUALITY_PRESETS, _smoothing_diameter
+from edge_smoothing import EdgeSmoother, SMOOTHING_BACKENDS
+from image_quality import ssim
+from style_registry import styles as style_registry
+from frame_fixtures import SIZES, make_frame
+from bench_paprika import best_of
+
+
+def run(sizes, backends, style_names, quality, repeat):
+    """One row per size and backend: the smoothing pass alone, then the whole filter per style"""
+    results = []
+    diameter = _smoothing_diameter(1.0)
+    for name in sizes:
+        height, width = SIZES[name]
+        frame = make_frame(height, width)
+        reference = EdgeSmoother('bilateral').smooth(frame, diameter).copy()
+        references = {style: AnimeMoodFilter(style, quality=quality, smoother='bilateral').apply_anime_filter(frame)
+                      for style in style_names}
+        for backend in backends:
+            smoother = EdgeSmoother(backend)
+            row = {'size': name, 'backend': backend,
+                   'smooth_ms': best_of(lambda: smoother.smooth(frame, diameter), repeat),
+                   'smooth_ssim': ssim(reference, smoother.smooth(frame, diameter))}
+            for style in style_names:
+                mood_filter = AnimeMoodFilter(style, quality=quality, smoother=backend)
+                row[f'{style}_ms'] = best_of(lambda: mood_filter.apply_anime_filter(frame), repeat)
+                row[f'{style}_ssim'] = ssim(references[style], mood_filter.apply_anime_filter(frame))
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the edge-preserving smoothing backends')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['480p', '720p'])
+    parser.add_argument('--backends', nargs='+', choices=SMOOTHING_BACKENDS, default=list(SMOOTHING_BACKENDS))
+    parser.add_argument('--styles', nargs='+', default=style_registry.names())
+    parser.add_argument('--quality', choices=list(QUALITY_PRESETS), default='max',
+                        help='Preset for the whole-filter runs (max smooths at full resolution)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per timing (best is kept)')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.backends, args.styles, args.quality, args.repeat)
+    print("=" * 60)
+    print(f"🎨 Smoothing backends (SSIM against bilateral, filter preset {args.quality})")
+    print("=" * 60)
+    header = f"{'size':<6} {'backend':<22} {'smooth':>9} {'SSIM':>6}"
+    for style in args.styles:
+        header += f" {style:>10} {'SSIM':>6}"
+    print(header)
+    for row in results:
+        line = f"{row['size']:<6} {row['backend']:<22} {row['smooth_ms']:>7.1f}ms {row['smooth_ssim']:>6.3f}"
+        for style in args.styles:
+            line += f" {row[f'{style}_ms']:>8.0f}ms {row[f'{style}_ssim']:>6.3f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
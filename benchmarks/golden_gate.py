@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Golden-Image Quality Gate
+Renders a fixed corpus through every style with a seeded reference implementation and
+stores the outputs as golden images. A check run renders the same corpus through the
+optimized paths (every quality preset, tiling and the simulated AnimeGAN filter) and scores
+each output against its golden image with PSNR, SSIM and palette distance, so a speedup
+cannot silently change the look.
+
+    python benchmarks/golden_gate.py            # check against benchmarks/golden
+    python benchmarks/golden_gate.py --update   # re-record after an intended look change
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from anime_mood_filter import AnimeMoodFilter
+from color_quantization import ColorQuantizer
+from image_quality import palette_distance, psnr, ssim
+from style_registry import styles as style_registry
+from frame_fixtures import DEFAULT_FIXTURE, fit_image, make_frame
+
+GOLDEN_DIR = os.path.join(ROOT, 'benchmarks', 'golden')
+ANIMEGAN_PATH = os.path.join(ROOT, 'emotion_web', 'emotion_web', 'anime_mood_filter.py')
+
+# Large enough that the balanced and fast presets work on a downscaled copy
+CORPUS_SIZE = (480, 640)
+SEED = 0
+
+# Minimum PSNR (dB), minimum SSIM and maximum palette distance (Delta E) of every path
+# against the golden image, per filter and style: the worst corpus image when recorded,
+# less 2 dB and 0.03 SSIM, plus a quarter of the palette distance. Paprika's hue wave turns
+# small smoothing and palette differences into hue differences, so it gets more room.
+# For Hayao (guided smoothing) sampled k-means picks a worse palette than full k-means for
+# the portrait on balanced, and tiled starts from balanced, which sets their bounds; its
+# fast preset finishes with the bilateral pass (see edge_smoothing.py).
+TOLERANCES = {
+    'mood': {
+        'Shinkai': {'reference': (45.0, 0.99, 1.0), 'max': (26.5, 0.90, 4.2), 'balanced': (29.0, 0.91, 3.2),
+                    'fast': (27.0, 0.82, 3.2), 'tiled': (28.0, 0.91, 3.4)},
+        'Hayao': {'reference': (45.0, 0.99, 1.0), 'max': (31.5, 0.94, 2.7), 'balanced': (26.0, 0.90, 5.3),
+                  'fast': (25.5, 0.83, 3.1), 'tiled': (26.0, 0.90, 4.2)},
+        'Paprika': {'reference': (45.0, 0.99, 1.0), 'max': (19.0, 0.85, 14.0), 'balanced': (19.0, 0.80, 13.5),
+                    'fast': (17.0, 0.68, 10.5), 'tiled': (18.0, 0.79, 12.5)},
+    },
+    'animegan': {
+        style: {'reference': (45.0, 0.99, 1.0), 'default': (27.0, 0.93, 2.5)}
+        for style in ('Hayao', 'Shinkai', 'Paprika')
+    },
+}
+
+
+def corpus():
+    """The fixed test images: a noisy synthetic frame, a webcam portrait and a color chart"""
+    height, width = CORPUS_SIZE
+    # Six flat patches with soft shading and dark borders: a palette with one right answer
+    patches = np.uint8([[40, 40, 200], [60, 170, 60], [190, 110, 30], [60, 200, 230], [120, 150, 210],
+                        [220, 200, 150]])
+    y, x = np.mgrid[0:height, 0:width]
+    chart = patches[(y * 2 // height) * 3 + x * 3 // width].astype(np.int16)
+    chart += ((y % (height // 2)) * 40 // (height // 2) - 20)[:, :, None]
+    chart[(y % (height // 2) < 6) | (x % (width // 3) < 6)] = 20
+    chart = np.uint8(np.clip(chart, 0, 255))
+    return {
+        'synthetic': make_frame(height, width, seed=SEED),
+        'portrait': fit_image(cv2.imread(DEFAULT_FIXTURE, cv2.IMREAD_COLOR), height, width),
+        'chart': chart,
+    }
+
+
+def load_animegan():
+    """The AnimeGAN filter module, imported under its own name (it shares a file name with ours)"""
+    spec = importlib.util.spec_from_file_location('animegan_mood_filter', ANIMEGAN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def render_mood(style, path, image):
+    """One AnimeMoodFilter path; 'reference' is max quality, the style's own smoothing and full k-means"""
+    cv2.setRNGSeed(SEED)
+    if path == 'reference':
+        mood_filter = AnimeMoodFilter(style, quantizer=ColorQuantizer('kmeans', seed=SEED), quality='max')
+    elif path == 'tiled':
+        mood_filter = AnimeMoodFilter(style, quality='balanced', max_memory_mb=4)
+    else:
+        mood_filter = AnimeMoodFilter(style, quality=path)
+    return mood_filter.apply_anime_filter(image)
+
+
+def render_animegan(module, style, path, image):
+    """
+    One simulated AnimeGAN path; 'reference' quantizes with full k-means
+
+    The gate covers the CPU simulation, the part of AnimeGANMoodFilter this repo optimizes;
+    the TensorFlow model's output is not reproducible across installs.
+    """
+    cv2.setRNGSeed(SEED)
+    mood_filter = module.AnimeGANMoodFilter(style, quantizer='kmeans' if path == 'reference' else None)
+    return mood_filter._apply_simulated_anime_filter(image)
+
+
+def cases(filters=None, style_names=None):
+    """(filter, style) pairs to gate, in a stable order"""
+    return [(kind, style) for kind in TOLERANCES for style in TOLERANCES[kind]
+            if (filters is None or kind in filters) and (style_names is None or style in style_names)]
+
+
+def golden_path(kind, style, image_name, golden_dir=GOLDEN_DIR):
+    return os.path.join(golden_dir, f'{kind}_{style}_{image_name}.png')
+
+
+def record(golden_dir=GOLDEN_DIR, filters=None, style_names=None):
+    """Render the reference of every case and store the golden images and their manifest"""
+    os.makedirs(golden_dir, exist_ok=True)
+    manifest_path = os.path.join(golden_dir, 'manifest.json')
+    manifest = {'goldens': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    images = corpus()
+    animegan = load_animegan() if filters is None or 'animegan' in filters else None
+    for kind, style in cases(filters, style_names):
+        for image_name, image in images.items():
+            if kind == 'mood':
+                golden = render_mood(style, 'reference', image)
+            else:
+                golden = render_animegan(animegan, style, 'reference', image)
+            path = golden_path(kind, style, image_name, golden_dir)
+            cv2.imwrite(path, golden, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+            manifest['goldens'][f'{kind}/{style}/{image_name}'] = {
+                'file': os.path.basename(path),
+                'fingerprint': style_registry.fingerprint(style) if kind == 'mood' else None,
+            }
+            print(f"✓ Recorded {os.path.basename(path)}")
+    manifest.update({'created': datetime.now().isoformat(timespec='seconds'), 'size': list(CORPUS_SIZE),
+                     'seed': SEED, 'opencv': cv2.__version__, 'numpy': np.__version__})
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def check(golden_dir=GOLDEN_DIR, filters=None, style_names=None, paths=None, render=None):
+    """
+    Score every path of every case against the golden images
+
+    Args:
+        paths (list): Path names to check (default: all paths in TOLERANCES)
+        render (callable): render(kind, style, path, image) override, for testing the gate
+
+    Returns:
+        list: One {'case', 'path', 'psnr', 'ssim', 'palette', 'passed', 'failures'} dict per check
+    """
+    with open(os.path.join(golden_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('opencv') != cv2.__version__:
+        print(f"⚠ Golden images were recorded with OpenCV {manifest.get('opencv')}, running {cv2.__version__}")
+    images = corpus()
+    if render is None:
+        animegan = load_animegan() if filters is None or 'animegan' in filters else None
+
+        def render(kind, style, path, image):
+            if kind == 'mood':
+                return render_mood(style, path, image)
+            return render_animegan(animegan, style, path, image)
+
+    results = []
+    for kind, style in cases(filters, style_names):
+        colors = style_registry.get(style)['colors'] if kind == 'mood' else 8
+        for image_name, image in images.items():
+            case = f'{kind}/{style}/{image_name}'
+            entry = manifest['goldens'].get(case)
+            if entry is None:
+                results.append({'case': case, 'path': None, 'passed': False,
+                                'failures': ['no golden image; run with --update']})
+                continue
+            if kind == 'mood' and entry['fingerprint'] != style_registry.fingerprint(style):
+                results.append({'case': case, 'path': None, 'passed': False,
+                                'failures': ['style declaration changed since recording; run with --update']})
+                continue
+            golden = cv2.imread(os.path.join(golden_dir, entry['file']), cv2.IMREAD_COLOR)
+            for path, (min_psnr, min_ssim, max_palette) in TOLERANCES[kind][style].items():
+                if paths is not None and path not in paths:
+                    continue
+                output = render(kind, style, path, image)
+                scores = {'psnr': psnr(golden, output), 'ssim': ssim(golden, output),
+                          'palette': palette_distance(golden, output, colors)}
+                failures = []
+                if scores['psnr'] < min_psnr:
+                    failures.append(f"PSNR {scores['psnr']:.1f}dB < {min_psnr}")
+                if scores['ssim'] < min_ssim:
+                    failures.append(f"SSIM {scores['ssim']:.3f} < {min_ssim}")
+                if scores['palette'] > max_palette:
+                    failures.append(f"palette distance {scores['palette']:.2f} > {max_palette}")
+                results.append({'case': case, 'path': path, **scores, 'passed': not failures, 'failures': failures})
+    return results
+
+
+def print_report(results):
+    """One line per check; failures are listed with the tolerance they broke"""
+    width = max([len(result['case']) for result in results] + [4])
+    print(f"{'case':<{width}} {'path':<10} {'PSNR':>7} {'SSIM':>6} {'palette':>8}")
+    for result in results:
+        if result['path'] is None:
+            print(f"{result['case']:<{width}} ⚠ {result['failures'][0]}")
+            continue
+        mark = '✓' if result['passed'] else '⚠ ' + ', '.join(result['failures'])
+        print(f"{result['case']:<{width}} {result['path']:<10} {result['psnr']:>5.1f}dB "
+              f"{result['ssim']:>6.3f} {result['palette']:>8.2f} {mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the anime filters against stored golden images')
+    parser.add_argument('--update', action='store_true', help='Re-record the golden images with the reference')
+    parser.add_argument('--filters', nargs='+', choices=list(TOLERANCES), help='Filters to gate (default: all)')
+    parser.add_argument('--styles', nargs='+', help='Styles to gate (default: all)')
+    parser.add_argument('--golden-dir', default=GOLDEN_DIR)
+    parser.add_argument('--output', help='Also write the scores as JSON')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🎨 Golden-image quality gate")
+    print("=" * 60)
+    if args.update:
+        record(args.golden_dir, args.filters, args.styles)
+        return 0
+
+    results = check(args.golden_dir, args.filters, args.styles)
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    failed = [result for result in results if not result['passed']]
+    if failed:
+        print(f"⚠ {len(failed)} of {len(results)} checks outside their tolerance")
+        return 1
+    print(f"✓ All {len(results)} checks within tolerance")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Scratch Buffer Arena for the Anime MOOD Filter
+Reusable scratch arrays, one arena per thread, so repeated filter requests write into
+the same memory instead of allocating full-size frames
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Bytes of scratch buffers a thread keeps between requests (CHAT_FILTER_ARENA_MB, 0 disables)
+DEFAULT_ARENA_MB = float(os.environ.get('CHAT_FILTER_ARENA_MB',
+                                        os.environ.get('CHAT_FILTER_MAX_MEMORY_MB', '256')))
+
+
+class BufferArena:
+    """
+    Pool of scratch arrays reused across filter requests
+
+    Each name owns one block of bytes that grows to the largest array asked for; smaller
+    shapes and other dtypes get a view of its start. Frames of different sizes (and the
+    edge tiles of a tiled run) therefore share memory instead of each keeping their own.
+
+    Stage outputs that later stages read get their own names. The names 'scratch:0',
+    'scratch:1' and 'scratch:2' are for temporaries that only live while one stage runs,
+    so every stage shares the same few blocks for them.
+    """
+
+    def __init__(self, max_bytes=None):
+        """
+        Initialize the arena
+
+        Args:
+            max_bytes (int): Bytes of buffers kept; the least recently used go first
+                             (default: CHAT_FILTER_ARENA_MB)
+        """
+        self.max_bytes = int(DEFAULT_ARENA_MB * 1024 * 1024) if max_bytes is None else max_bytes
+        self._buffers = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.allocations = 0
+        self.evictions = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        """
+        C-contiguous scratch array for a pipeline stage, with undefined contents
+
+        The same name returns the same memory on the next request, so a stage must not
+        hand its buffer back to the caller as the final result, and one request must not
+        use a name for two arrays it needs at the same time.
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        block = self._buffers.get(name)
+        if block is not None and block.nbytes >= nbytes:
+            self._buffers.move_to_end(name)
+            self.hits += 1
+            return block[:nbytes].view(dtype).reshape(shape)
+
+        if block is not None:
+            del self._buffers[name]
+            self.bytes -= block.nbytes
+        self.allocations += 1
+        block = np.empty(nbytes, dtype=np.uint8)
+        if nbytes <= self.max_bytes:
+            while self.bytes + nbytes > self.max_bytes:
+                _, evicted = self._buffers.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+            self._buffers[name] = block
+            self.bytes += nbytes
+        return block.view(dtype).reshape(shape)
+
+    def clear(self):
+        """Release every buffer"""
+        self._buffers.clear()
+        self.bytes = 0
+
+    def get_stats(self):
+        """Buffers held and how often requests reused them"""
+        return {
+            'buffers': len(self._buffers),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'allocations': self.allocations,
+            'evictions': self.evictions
+        }
+
+
+_local = threading.local()
+
+
+def get_arena():
+    """The calling thread's arena (worker processes filter on one thread, so they share one)"""
+    arena = getattr(_local, 'arena', None)
+    if arena is None:
+        arena = _local.arena = BufferArena()
+    return arena
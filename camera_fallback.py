@@ -7,6 +7,8 @@ import random
 import os
 from datetime import datetime
 
+from style_registry import DEFAULT_STYLE, styles as style_registry
+
 class CameraFallback:
     """Fallback system when camera is not available"""
     
@@ -22,20 +24,9 @@ class CameraFallback:
             'neutral': '😐'
         }
         
-        self.anime_styles = {
-            'Shinkai': {
-                'name': 'Makoto Shinkai Style',
-                'description': 'Vibrant, saturated colors with dramatic lighting'
-            },
-            'Hayao': {
-                'name': 'Studio Ghibli Style',
-                'description': 'Warm, soft colors inspired by Miyazaki films'
-            },
-            'Paprika': {
-                'name': 'Satoshi Kon Style',
-                'description': 'Psychedelic, intense colors with surreal effects'
-            }
-        }
+        # Display text of the mood filter styles, style id -> name, label and description
+        # (see style_registry.py)
+        self.anime_styles = {info['id']: info for info in style_registry.list_info()}
     
     def simulate_emotion_detection(self):
         """Simulate emotion detection when camera is not available"""
@@ -53,7 +44,7 @@ class CameraFallback:
     
     def simulate_mood_filter(self, style='Shinkai'):
         """Simulate mood filter when camera is not available"""
-        style_info = self.anime_styles.get(style, self.anime_styles['Shinkai'])
+        style_info = self.anime_styles.get(style, self.anime_styles[DEFAULT_STYLE])
         
         # Create a placeholder image path
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -0,0 +1,359 @@
+"""
+Clip Mood Filter for ChatApp
+Filters short browser clips and GIFs: frames are decoded one at a time, filtered in
+parallel by the worker pool with one palette for the whole clip, and written in order to
+an animated WebP, GIF or MP4, so no step holds every frame of the clip at once
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+
+from image_output import CLIP_FORMATS
+from metrics import registry
+
+CLIP_FILTER_SECONDS = registry.histogram(
+    'chat_clip_filter_seconds', 'Time to filter and encode a clip', ['format'])
+CLIP_FILTER_FRAMES = registry.counter(
+    'chat_clip_filter_frames_total', 'Clip frames filtered', ['format'])
+
+# Frames per second kept from a clip (CHAT_CLIP_FPS); faster clips drop frames evenly
+CLIP_FPS = float(os.environ.get('CHAT_CLIP_FPS', '12'))
+
+# Longest clip filtered (CHAT_CLIP_MAX_SECONDS); longer clips are cut
+CLIP_MAX_SECONDS = float(os.environ.get('CHAT_CLIP_MAX_SECONDS', '6'))
+
+# Frames are scaled down so their longer side is at most this (CHAT_CLIP_MAX_SIDE)
+CLIP_MAX_SIDE = int(os.environ.get('CHAT_CLIP_MAX_SIDE', '480'))
+
+# Quality preset clips are filtered with (CHAT_CLIP_QUALITY), and the default format
+CLIP_QUALITY = os.environ.get('CHAT_CLIP_QUALITY', 'fast')
+DEFAULT_CLIP_FORMAT = os.environ.get('CHAT_CLIP_FORMAT', 'webp')
+
+# WebP quality of animated WebP frames
+CLIP_OUTPUT_QUALITY = 75
+
+# Clips filtered at the same time (CHAT_CLIP_MAX_CONCURRENT)
+CLIP_MAX_CONCURRENT = int(os.environ.get('CHAT_CLIP_MAX_CONCURRENT', '2'))
+
+# MP4 codecs in order of preference: H.264 where OpenCV's FFmpeg has an encoder for it,
+# otherwise MPEG-4 Part 2
+MP4_CODECS = ('avc1', 'mp4v')
+
+# The first of MP4_CODECS that opened, so the unavailable ones are not retried for every clip
+_mp4_codec = None
+
+
+class ClipFilterLimit(Exception):
+    """Raised when every clip slot is taken"""
+
+
+def _fit_clip_frame(image, max_side):
+    """Scale a frame to fit max_side, with even sides for the video encoders"""
+    import cv2
+    height, width = image.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+    if size == (width, height):
+        return image
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+class ClipReader:
+    """Decodes a clip (MP4, WebM, GIF, anything OpenCV's FFmpeg reads) one frame at a time"""
+
+    def __init__(self, path, fps=CLIP_FPS, max_seconds=CLIP_MAX_SECONDS, max_side=CLIP_MAX_SIDE):
+        """
+        Open a clip
+
+        Args:
+            path (str): Clip file
+            fps (float): Frames per second to keep; a slower clip keeps all of its frames
+            max_seconds (float): Frames past this are not read
+            max_side (int): Frames are scaled down to fit this
+        """
+        import cv2
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise ValueError('Could not read the clip')
+        source_fps = self._capture.get(cv2.CAP_PROP_FPS)
+        # GIFs and some WebM files report no (or a nonsense) frame rate
+        self.source_fps = source_fps if 0 < source_fps <= 240 else fps
+        self.fps = min(fps, self.source_fps)
+        self.max_frames = max(1, int(max_seconds * self.fps))
+        self.max_side = max_side
+        self.truncated = False
+
+    def __iter__(self):
+        """BGR frames, evenly sampled down to fps"""
+        step = self.source_fps / self.fps
+        index, kept, next_kept = 0, 0, 0.0
+        while True:
+            ok, frame = self._capture.read()
+            if not ok:
+                return
+            if index >= next_kept - 1e-6:
+                if kept == self.max_frames:
+                    self.truncated = True
+                    return
+                yield _fit_clip_frame(frame, self.max_side)
+                kept += 1
+                next_kept += step
+            index += 1
+
+    def close(self):
+        self._capture.release()
+
+
+def gif_palette_for(image):
+    """768-byte RGB color table for a clip's GIF, from one filtered BGR frame"""
+    import cv2
+    from PIL import Image
+    indexed = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)).quantize(256, method=Image.Quantize.MEDIANCUT)
+    return bytes(indexed.getpalette()[:768]).ljust(768, b'\0')
+
+
+def encode_clip_frame(image, clip_format, quality=CLIP_OUTPUT_QUALITY, gif_palette=None):
+    """
+    One filtered BGR frame, ready for its clip writer (runs in the filter workers)
+
+    Returns:
+        webp: a still WebP; gif: the frame's LZW image data, indexed into gif_palette;
+        mp4: the frame itself, as the video encoder needs the frames in order
+    """
+    if clip_format == 'mp4':
+        return image
+    import cv2
+    if clip_format == 'webp':
+        ok, buffer = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+        if not ok:
+            raise RuntimeError('Could not encode clip frame as WebP')
+        return buffer.tobytes()
+    from PIL import GifImagePlugin, Image
+    table = Image.new('P', (1, 1))
+    table.putpalette(gif_palette)
+    indexed = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)).quantize(
+        palette=table, dither=Image.Dither.NONE)
+    return b''.join(GifImagePlugin.getdata(indexed))
+
+
+def _uint24(value):
+    return struct.pack('<I', value)[:3]
+
+
+def _riff_chunk(fourcc, payload):
+    return fourcc + struct.pack('<I', len(payload)) + payload + b'\0' * (len(payload) & 1)
+
+
+class WebPClipWriter:
+    """
+    Animated WebP written as frames arrive: each still WebP frame's bitstream is wrapped
+    in an ANMF chunk (see the WebP container specification) and the RIFF size is filled in
+    on close, so frames are never decoded or re-encoded
+    """
+
+    def __init__(self, path, size, fps, loop=0):
+        self.size = size
+        self.duration = round(1000 / fps)
+        self._file = open(path, 'wb')
+        width, height = size
+        self._file.write(b'RIFF\0\0\0\0WEBP')
+        self._file.write(_riff_chunk(b'VP8X', bytes([0x02, 0, 0, 0]) + _uint24(width - 1) + _uint24(height - 1)))
+        self._file.write(_riff_chunk(b'ANIM', struct.pack('<IH', 0, loop)))
+
+    def add(self, frame):
+        """Append a still WebP frame of the clip's size"""
+        if frame[:4] != b'RIFF' or frame[8:12] != b'WEBP':
+            raise ValueError('Clip frame is not a WebP image')
+        bitstream = bytearray()
+        offset = 12
+        while offset + 8 <= len(frame):
+            size = struct.unpack('<I', frame[offset + 4:offset + 8])[0]
+            end = offset + 8 + size + (size & 1)
+            if frame[offset:offset + 4] in (b'ALPH', b'VP8 ', b'VP8L'):
+                bitstream += frame[offset:end]
+            offset = end
+        width, height = self.size
+        # Frame at the origin covering the canvas, shown for the frame duration, not blended
+        header = _uint24(0) + _uint24(0) + _uint24(width - 1) + _uint24(height - 1) + _uint24(self.duration) + b'\x02'
+        self._file.write(_riff_chunk(b'ANMF', header + bytes(bitstream)))
+
+    def close(self):
+        if self._file.closed:
+            return
+        size = self._file.tell() - 8
+        self._file.seek(4)
+        self._file.write(struct.pack('<I', size))
+        self._file.close()
+
+
+class GifClipWriter:
+    """Animated GIF written as frames arrive, every frame indexed into one global color table"""
+
+    def __init__(self, path, size, fps, palette, loop=0):
+        self.delay = max(2, round(100 / fps))  # Centiseconds; browsers slow down anything shorter
+        self._file = open(path, 'wb')
+        width, height = size
+        # Logical screen with a 256-color global table, then the looping extension
+        self._file.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0) + palette)
+        self._file.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\0')
+
+    def add(self, frame):
+        """Append a frame's image data (from encode_clip_frame) after its frame delay"""
+        self._file.write(b'!\xf9\x04\x00' + struct.pack('<H', self.delay) + b'\0\0')
+        self._file.write(frame)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.write(b';')
+            self._file.close()
+
+
+class Mp4ClipWriter:
+    """MP4 written as frames arrive through OpenCV's VideoWriter"""
+
+    def __init__(self, path, size, fps):
+        import cv2
+        global _mp4_codec
+        for codec in (_mp4_codec,) if _mp4_codec else MP4_CODECS:
+            self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+            if self._writer.isOpened():
+                self.codec = _mp4_codec = codec
+                break
+        else:
+            raise RuntimeError('No MP4 encoder available')
+
+    def add(self, frame):
+        self._writer.write(frame)
+
+    def close(self):
+        self._writer.release()
+
+
+def open_clip_writer(clip_format, path, size, fps, gif_palette=None):
+    """Writer for a clip format; size is (width, height)"""
+    if clip_format == 'webp':
+        return WebPClipWriter(path, size, fps)
+    if clip_format == 'gif':
+        return GifClipWriter(path, size, fps, gif_palette)
+    return Mp4ClipWriter(path, size, fps)
+
+
+class ClipFilter:
+    """Filters uploaded clips through the worker pool, a few clips at a time"""
+
+    def __init__(self, pool, max_concurrent=CLIP_MAX_CONCURRENT):
+        """
+        Initialize the clip filter
+
+        Args:
+            pool (FilterWorkerPool): Pool the frames are filtered in
+            max_concurrent (int): Clips filtered at once before ClipFilterLimit
+        """
+        self.pool = pool
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def filter(self, data, style, quality=None, clip_format=None, fps=CLIP_FPS, max_seconds=CLIP_MAX_SECONDS,
+               max_side=CLIP_MAX_SIDE):
+        """
+        Filter an encoded clip
+
+        Args:
+            data (bytes): The uploaded clip (MP4, WebM, GIF, ...)
+            style (str): Style name
+            quality (str): Quality preset (default: CHAT_CLIP_QUALITY)
+            clip_format (str): 'webp', 'gif' or 'mp4' (default: CHAT_CLIP_FORMAT)
+            fps, max_seconds, max_side: Sampling and size limits (see ClipReader)
+
+        Returns:
+            dict: {'data', 'format', 'extension', 'mime_type', 'frames', 'fps', 'truncated', 'seconds'}
+        """
+        clip_format = (clip_format or DEFAULT_CLIP_FORMAT).lower()
+        if clip_format not in CLIP_FORMATS:
+            raise ValueError(f"Unknown clip format '{clip_format}', expected one of {', '.join(CLIP_FORMATS)}")
+        if self._slots is None or not self._slots.acquire(blocking=False):
+            raise ClipFilterLimit('Too many clips are being filtered, please try again in a moment')
+        with self._lock:
+            self.active += 1
+        try:
+            return self._filter(data, style, quality or CLIP_QUALITY, clip_format, fps, max_seconds, max_side)
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def _filter(self, data, style, quality, clip_format, fps, max_seconds, max_side):
+        start = time.time()
+        workdir = tempfile.mkdtemp(prefix='chat_clip_')
+        source_path = os.path.join(workdir, 'source')
+        output_path = os.path.join(workdir, 'filtered.' + CLIP_FORMATS[clip_format]['extension'])
+        with open(source_path, 'wb') as f:
+            f.write(data)
+
+        reader = writer = None
+        pending = deque()
+        try:
+            reader = ClipReader(source_path, fps, max_seconds, max_side)
+            frames = iter(reader)
+            first = next(frames, None)
+            if first is None:
+                raise ValueError('The clip has no frames')
+
+            # The first frame fixes the palettes (and the GIF color table) of the whole clip
+            encoded, palettes, gif_palette = self._result(
+                self.pool.submit_clip_frame(first, style, quality, None, clip_format))
+            writer = open_clip_writer(clip_format, output_path, (first.shape[1], first.shape[0]), reader.fps,
+                                      gif_palette)
+            writer.add(encoded)
+            count = 1
+
+            # Keep every worker busy plus one frame queued; results are written in order
+            window = self.pool.max_workers + 1
+            for frame in frames:
+                pending.append(self.pool.submit_clip_frame(frame, style, quality, palettes, clip_format, gif_palette))
+                if len(pending) >= window:
+                    writer.add(self._result(pending.popleft())[0])
+                    count += 1
+            while pending:
+                writer.add(self._result(pending.popleft())[0])
+                count += 1
+            writer.close()
+            with open(output_path, 'rb') as f:
+                output = f.read()
+        finally:
+            for future in pending:
+                future.cancel()
+            if writer is not None:
+                writer.close()
+            if reader is not None:
+                reader.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        elapsed = time.time() - start
+        CLIP_FILTER_SECONDS.observe(elapsed, format=clip_format)
+        CLIP_FILTER_FRAMES.inc(count, format=clip_format)
+        print(f"✓ {style} clip filtered: {count} frames as {clip_format} in {elapsed:.2f} seconds")
+        return {
+            'data': output,
+            'format': clip_format,
+            'extension': CLIP_FORMATS[clip_format]['extension'],
+            'mime_type': CLIP_FORMATS[clip_format]['mime_type'],
+            'frames': count,
+            'fps': reader.fps,
+            'truncated': reader.truncated,
+            'seconds': elapsed
+        }
+
+    def _result(self, future):
+        """A frame's result, waiting at most the pool's job timeout"""
+        return future.result(timeout=self.pool.job_timeout)[0]
+
+    def get_status(self):
+        return {'active': self.active, 'max_concurrent': self.max_concurrent}
@@ -0,0 +1,68 @@
+"""
+Color Lookup Tables for the Anime MOOD Filter
+Compiles a style's point-wise color operations into one 3D LUT applied with trilinear interpolation
+"""
+
+import numpy as np
+
+LUT_SIZE = 33
+
+
+def lattice_image(size=LUT_SIZE):
+    """Every lattice point of a size^3 BGR cube as a uint8 image, indexed [b, g, r]"""
+    levels = np.round(np.linspace(0, 255, size)).astype(np.uint8)
+    b, g, r = np.meshgrid(levels, levels, levels, indexing='ij')
+    return np.stack([b, g, r], axis=-1).reshape(size * size, size, 3)
+
+
+def build_lut(operations, size=LUT_SIZE):
+    """
+    Run a chain of point-wise operations once over the lattice and keep the result
+
+    Args:
+        operations (list): Callables taking and returning a uint8 BGR image
+        size (int): Lattice points per channel
+
+    Returns:
+        np.ndarray: (size, size, size, 3) float32 table indexed [b, g, r]
+    """
+    graded = lattice_image(size)
+    for operation in operations:
+        graded = operation(graded)
+    lut = graded.reshape(size, size, size, 3).astype(np.float32)
+    lut.flags.writeable = False
+    return lut
+
+
+def apply_lut(image, lut, chunk_rows=128):
+    """
+    Apply a 3D LUT with trilinear interpolation
+
+    Works through the image in row chunks so the float temporaries stay small.
+    """
+    size = lut.shape[0]
+    scale = (size - 1) / 255.0
+    flat_lut = lut.reshape(-1, 3)
+    output = np.empty_like(image)
+
+    for start in range(0, image.shape[0], chunk_rows):
+        block = image[start:start + chunk_rows].astype(np.float32) * scale
+        base = np.minimum(block.astype(np.int32), size - 2)
+        fraction = block - base
+        index = (base[..., 0] * size + base[..., 1]) * size + base[..., 2]
+        fb, fg, fr = fraction[..., 0:1], fraction[..., 1:2], fraction[..., 2:3]
+
+        def corner(db, dg, dr):
+            return flat_lut[index + (db * size + dg) * size + dr]
+
+        c00 = corner(0, 0, 0) * (1 - fr) + corner(0, 0, 1) * fr
+        c01 = corner(0, 1, 0) * (1 - fr) + corner(0, 1, 1) * fr
+        c10 = corner(1, 0, 0) * (1 - fr) + corner(1, 0, 1) * fr
+        c11 = corner(1, 1, 0) * (1 - fr) + corner(1, 1, 1) * fr
+        c0 = c00 * (1 - fg) + c01 * fg
+        c1 = c10 * (1 - fg) + c11 * fg
+        result = c0 * (1 - fb) + c1 * fb
+        output[start:start + chunk_rows] = np.clip(result + 0.5, 0, 255).astype(np.uint8)
+
+    return output
+
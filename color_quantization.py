@@ -0,0 +1,350 @@
+"""
+Color Quantization Engine for the Anime MOOD Filter
+Pluggable backends that reduce an image to a small palette: full k-means, subsampled k-means,
+median cut, octree and fixed per-style palettes, plus stateful quantizers for video frames and clips
+"""
+
+import os
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from buffer_arena import get_arena
+from style_registry import styles as style_registry
+
+QUANTIZER_BACKENDS = ('kmeans', 'kmeans_sampled', 'median_cut', 'octree', 'palette')
+
+# Pick the backend with CHAT_QUANTIZER; kmeans reproduces the original full-image clustering
+DEFAULT_QUANTIZER = os.environ.get('CHAT_QUANTIZER', 'kmeans_sampled')
+
+
+def palette_for_style(style):
+    """
+    Fixed palette for a style as a (k, 3) uint8 BGR array
+
+    Palettes come from the style declarations (see style_registry.py); styles that do
+    not declare one use Hayao's.
+    """
+    colors = style_registry.get(style)['palette'] if style in style_registry else None
+    colors = colors or style_registry.get('Hayao')['palette']
+    rgb = [[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in colors]
+    return np.array(rgb, dtype=np.uint8)[:, ::-1].copy()
+
+
+def apply_palette(labels, palette, out=None):
+    """Turn a label map back into a BGR image (into out if given)"""
+    return np.take(palette, labels, axis=0, out=out)
+
+
+@lru_cache(maxsize=32)
+def _nearest_color_lut(palette_bytes, bits):
+    """Label of the nearest palette color for every cell of a 2^bits per channel RGB cube"""
+    palette = np.frombuffer(palette_bytes, dtype=np.uint8).reshape(-1, 3).astype(np.float32)
+    shift = 8 - bits
+    # Cell centers, ordered the same way as the index built in _lut_index
+    levels = (np.arange(1 << bits, dtype=np.float32) * (1 << shift)) + (1 << shift) / 2.0
+    cells = np.stack(np.meshgrid(levels, levels, levels, indexing='ij'), axis=-1).reshape(-1, 3)
+    # |x - c|^2 without the |x|^2 term, which does not change the argmin
+    distances = (palette * palette).sum(axis=1) - 2.0 * cells @ palette.T
+    lut = np.argmin(distances, axis=1).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def _lut_index(image, bits):
+    """Flat LUT cell index for every pixel, built in the thread's scratch buffers"""
+    arena = get_arena()
+    index = arena.get('scratch:0', image.shape[:2], np.int32)
+    channel = arena.get('scratch:1', image.shape[:2], np.int32)
+    shift = np.uint8(8 - bits)
+    np.right_shift(image[:, :, 0], shift, out=index)
+    np.left_shift(index, 2 * bits, out=index)
+    np.right_shift(image[:, :, 1], shift, out=channel)
+    np.left_shift(channel, bits, out=channel)
+    np.bitwise_or(index, channel, out=index)
+    np.right_shift(image[:, :, 2], shift, out=channel)
+    return np.bitwise_or(index, channel, out=index)
+
+
+class ColorQuantizer:
+    """Reduce an image to a small palette and return per-pixel labels"""
+
+    def __init__(self, backend=None, sample_size=20000, sampling='random', lut_bits=5, attempts=3, seed=0):
+        """
+        Initialize the quantizer
+
+        Args:
+            backend (str): One of QUANTIZER_BACKENDS (default: CHAT_QUANTIZER or 'kmeans_sampled')
+            sample_size (int): Pixels used to build the palette in the sampled backends
+            sampling (str): 'random' or 'strided' pixel sampling
+            lut_bits (int): Bits per channel of the nearest-color LUT used to label pixels
+            attempts (int): k-means restarts for the sampled backend
+            seed (int): Seed for sampling and k-means, so the same image gives the same palette
+        """
+        backend = backend or DEFAULT_QUANTIZER
+        if backend not in QUANTIZER_BACKENDS:
+            raise ValueError(f"Unknown quantizer backend '{backend}', expected one of {QUANTIZER_BACKENDS}")
+        if sampling not in ('random', 'strided'):
+            raise ValueError(f"Unknown sampling '{sampling}', expected 'random' or 'strided'")
+        self.backend = backend
+        self.sample_size = sample_size
+        self.sampling = sampling
+        self.lut_bits = lut_bits
+        self.attempts = attempts
+        self.seed = seed
+
+    def quantize(self, image, k=8, style=None):
+        """
+        Quantize a BGR image
+
+        Args:
+            image (np.ndarray): uint8 BGR image
+            k (int): Number of colors (the palette backend uses the style palette size)
+            style (str): Style name for the palette backend
+
+        Returns:
+            tuple: (labels as an HxW uint8 array, palette as a (n, 3) uint8 BGR array)
+        """
+        if self.backend == 'kmeans':
+            return self._kmeans_full(image, k)
+
+        palette = self.build_palette(image, k, style)
+        return self.label_pixels(image, palette), palette
+
+    def build_palette(self, image, k=8, style=None):
+        """Palette for an image using the configured backend"""
+        if self.backend == 'palette':
+            return palette_for_style(style)
+        if self.backend == 'kmeans':
+            return self._kmeans_full(image, k)[1]
+
+        sample = self._sample_pixels(image)
+        if self.backend == 'kmeans_sampled':
+            return self._kmeans_palette(sample, k, self.attempts)
+        if self.backend == 'median_cut':
+            return self._median_cut_palette(sample, k)
+        return self._octree_palette(sample, k)
+
+    def label_pixels(self, image, palette, out=None):
+        """Map every pixel to its nearest palette color through a precomputed 3D LUT (into out if given)"""
+        palette = np.ascontiguousarray(palette, dtype=np.uint8)
+        lut = _nearest_color_lut(palette.tobytes(), self.lut_bits)
+        return np.take(lut, _lut_index(image, self.lut_bits), out=out)
+
+    def _sample_pixels(self, image):
+        """Random or strided subsample of the image pixels as an (n, 3) array"""
+        pixels = image.reshape(-1, 3)
+        if len(pixels) <= self.sample_size:
+            return pixels
+        if self.sampling == 'strided':
+            return pixels[::len(pixels) // self.sample_size]
+        rng = np.random.default_rng(self.seed)
+        return pixels[rng.choice(len(pixels), self.sample_size, replace=False)]
+
+    def _kmeans_full(self, image, k):
+        """The original quantization: k-means over every pixel, 10 attempts"""
+        data = get_arena().get('scratch:0', (image.shape[0] * image.shape[1], 3), np.float32)
+        np.copyto(data, image.reshape((-1, 3)))
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
+        _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+        return labels.reshape(image.shape[:2]).astype(np.uint8), np.uint8(centers)
+
+    def _kmeans_palette(self, sample, k, attempts):
+        """k-means on the pixel subsample"""
+        k = min(k, len(sample))
+        if self.seed is not None:
+            cv2.setRNGSeed(self.seed)
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
+        _, _, centers = cv2.kmeans(np.float32(sample), k, None, criteria, attempts, cv2.KMEANS_PP_CENTERS)
+        return np.uint8(np.clip(np.round(centers), 0, 255))
+
+    def _median_cut_palette(self, sample, k):
+        """Split the box with the widest channel range at its median until there are k boxes"""
+        boxes = [sample]
+        while len(boxes) < k:
+            ranges = [np.ptp(box, axis=0).max() if len(box) > 1 else -1 for box in boxes]
+            index = int(np.argmax(ranges))
+            if ranges[index] <= 0:
+                break
+            box = boxes.pop(index)
+            channel = int(np.argmax(np.ptp(box, axis=0)))
+            box = box[np.argsort(box[:, channel], kind='stable')]
+            middle = len(box) // 2
+            boxes.extend([box[:middle], box[middle:]])
+        return np.uint8([np.round(box.mean(axis=0)) for box in boxes])
+
+    def _octree_palette(self, sample, k, depth=5):
+        """Octree quantization: merge the least-populated branches until at most k leaves remain"""
+        # Interleave the top `depth` bits of each channel so a node's parent is code >> 3
+        codes = np.zeros(len(sample), dtype=np.int64)
+        for level in range(depth):
+            bit = 7 - level
+            child = (((sample[:, 0] >> bit) & 1) << 2) | (((sample[:, 1] >> bit) & 1) << 1) | ((sample[:, 2] >> bit) & 1)
+            codes = (codes << 3) | child
+
+        leaves, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+        sums = np.zeros((len(leaves), 3), dtype=np.float64)
+        np.add.at(sums, inverse.ravel(), sample.astype(np.float64))
+
+        while len(leaves) > k:
+            parents, parent_of, children = np.unique(leaves >> 3, return_inverse=True, return_counts=True)
+            parent_counts = np.bincount(parent_of, weights=counts)
+            # Merging a parent turns its children into one leaf; merge the emptiest parents first
+            order = np.argsort(parent_counts, kind='stable')
+            leaves_after = len(leaves) - np.cumsum(children[order] - 1)
+            enough = np.nonzero(leaves_after <= k)[0]
+            merge = np.zeros(len(parents), dtype=bool)
+            merge[order[:enough[0] + 1] if len(enough) else order] = True
+
+            merged = merge[parent_of]
+            new_sums = np.zeros((len(parents), 3))
+            np.add.at(new_sums, parent_of[merged], sums[merged])
+            new_counts = np.bincount(parent_of[merged], weights=counts[merged], minlength=len(parents))
+
+            # Unmerged leaves keep their level; the loop ends once k is reached
+            leaves = np.concatenate([leaves[~merged], parents[merge]])
+            sums = np.concatenate([sums[~merged], new_sums[merge]])
+            counts = np.concatenate([counts[~merged], new_counts[merge]])
+            if len(enough):
+                break
+
+        return np.uint8(np.round(sums / counts[:, None]))
+
+
+class TemporalQuantizer(ColorQuantizer):
+    """
+    Quantizer for consecutive frames of one video or burst
+
+    The first frame, and any frame after a scene change, gets a palette from the
+    configured backend. Other frames start from the previous palette and refine it with a
+    couple of k-means iterations on a small sample. A refined palette that moved less
+    than the tolerance is dropped in favour of the previous one, so colors do not flicker
+    and the nearest-color LUT built for it is reused.
+    """
+
+    def __init__(self, backend=None, refine_iterations=2, scene_threshold=0.35, tolerance=3,
+                 refine_sample_size=4000, state=None, **kwargs):
+        """
+        Initialize the temporal quantizer
+
+        Args:
+            backend (str): Backend for full re-clustering (default: CHAT_QUANTIZER)
+            refine_iterations (int): k-means iterations from the previous palette per frame
+            scene_threshold (float): Color histogram distance (0-1) that counts as a scene change
+            tolerance (int): Largest channel change of any color that keeps the previous palette
+            refine_sample_size (int): Pixels sampled (strided) for refinement and scene detection
+            state (dict): Another instance's state, to continue its sequence
+            **kwargs: Passed to ColorQuantizer for full re-clustering
+        """
+        super().__init__(backend, **kwargs)
+        self.refine_iterations = refine_iterations
+        self.scene_threshold = scene_threshold
+        self.tolerance = tolerance
+        self.refine_sample_size = refine_sample_size
+        self.reset()
+        if state:
+            self._palettes = dict(state['palettes'])
+            self._histogram = state['histogram']
+            self.stats = dict(state['stats'])
+
+    def reset(self):
+        """Forget the previous frame, so the next one is clustered from scratch"""
+        self._palettes = {}
+        self._histogram = None
+        self.stats = {'full': 0, 'refined': 0, 'reused': 0}
+
+    @property
+    def state(self):
+        """Palettes, color histogram and counts of the last frame (picklable, for another process)"""
+        return {'palettes': dict(self._palettes), 'histogram': self._histogram, 'stats': dict(self.stats)}
+
+    def quantize(self, image, k=8, style=None):
+        """Quantize a frame (always through the palette and LUT, also for the kmeans backend)"""
+        palette = self.build_palette(image, k, style)
+        return self.label_pixels(image, palette), palette
+
+    def build_palette(self, image, k=8, style=None):
+        """Palette for the next frame of the sequence"""
+        if self.backend == 'palette':
+            return palette_for_style(style)
+
+        pixels = image.reshape(-1, 3)
+        sample = pixels[::max(1, len(pixels) // self.refine_sample_size)]
+        histogram = self._color_histogram(sample)
+        scene_change = self._histogram is None or \
+            0.5 * np.abs(histogram - self._histogram).sum() > self.scene_threshold
+        self._histogram = histogram
+        if scene_change:
+            self._palettes.clear()
+
+        previous = self._palettes.get(k)
+        if previous is None:
+            self.stats['full'] += 1
+            palette = super().build_palette(image, k, style)
+        else:
+            palette = self._refine(sample, previous)
+            if np.abs(palette.astype(np.int16) - previous).max() <= self.tolerance:
+                self.stats['reused'] += 1
+                palette = previous
+            else:
+                self.stats['refined'] += 1
+        self._palettes[k] = palette
+        return palette
+
+    def _refine(self, sample, palette):
+        """A few Lloyd iterations starting from palette; colors nobody picks stay put"""
+        centers = palette.astype(np.float64)
+        for _ in range(self.refine_iterations):
+            labels = self.label_pixels(sample.reshape(-1, 1, 3), np.uint8(np.round(centers))).ravel()
+            counts = np.bincount(labels, minlength=len(centers))
+            used = counts > 0
+            for channel in range(3):
+                sums = np.bincount(labels, weights=sample[:, channel], minlength=len(centers))
+                centers[used, channel] = sums[used] / counts[used]
+        return np.uint8(np.clip(np.round(centers), 0, 255))
+
+    @staticmethod
+    def _color_histogram(sample, bits=3):
+        """Normalized histogram of the sample over a coarse RGB grid"""
+        shift = 8 - bits
+        cells = ((sample[:, 0] >> shift).astype(np.int32) << (2 * bits)) | \
+                ((sample[:, 1] >> shift).astype(np.int32) << bits) | (sample[:, 2] >> shift)
+        histogram = np.bincount(cells, minlength=1 << (3 * bits)).astype(np.float64)
+        return histogram / max(1, len(sample))
+
+
+class FixedPaletteQuantizer(ColorQuantizer):
+    """
+    Quantizer that gives every frame of a clip the same palettes
+
+    The palettes are either passed in (as built by another instance, e.g. in another
+    worker process) or built by the configured backend from the first frame and kept.
+    Frames filtered in parallel and out of order still share their colors, so a clip
+    does not flicker and one GIF color table fits all of its frames.
+    """
+
+    def __init__(self, palettes=None, backend=None, **kwargs):
+        """
+        Initialize the fixed-palette quantizer
+
+        Args:
+            palettes (dict): Palettes by color count, from another instance's palettes
+            backend (str): Backend for palettes not given (default: CHAT_QUANTIZER)
+            **kwargs: Passed to ColorQuantizer
+        """
+        super().__init__(backend, **kwargs)
+        self.palettes = dict(palettes or {})
+
+    def quantize(self, image, k=8, style=None):
+        """Quantize a frame (always through the palette and LUT, also for the kmeans backend)"""
+        palette = self.build_palette(image, k, style)
+        return self.label_pixels(image, palette), palette
+
+    def build_palette(self, image, k=8, style=None):
+        """The clip's palette of k colors, built from this frame if there is none yet"""
+        if self.backend == 'palette':
+            return palette_for_style(style)
+        if k not in self.palettes:
+            self.palettes[k] = super().build_palette(image, k, style)
+        return self.palettes[k]
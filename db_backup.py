@@ -0,0 +1,198 @@
+"""
+Online Backup for the ChatApp Database
+Copies chat_app.db with the SQLite backup API in small page steps so writers are never blocked for long
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+class DatabaseBackup:
+    """Background backup job with scheduling, retention and integrity checks"""
+
+    def __init__(self, db_path='chat_app.db', backup_dir='backups', pages_per_step=64,
+                 step_sleep=0.05, keep=5, interval=6 * 60 * 60):
+        """
+        Initialize the backup job
+
+        Args:
+            db_path (str): Database file to back up
+            backup_dir (str): Directory that holds the snapshots
+            pages_per_step (int): Pages copied per backup step (the write lock is only held per step)
+            step_sleep (float): Seconds to sleep between steps so writers can get in
+            keep (int): Number of snapshots to retain
+            interval (int): Seconds between scheduled backups
+        """
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.keep = keep
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.status = {
+            'state': 'idle',
+            'pages_total': 0,
+            'pages_remaining': 0,
+            'backups_completed': 0,
+            'backups_failed': 0,
+            'last_started': None,
+            'last_success': None,
+            'last_duration': None,
+            'last_size_bytes': 0,
+            'last_snapshot': None,
+            'last_error': None,
+            'snapshots': 0
+        }
+
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+    def _snapshot_prefix(self):
+        """File name prefix for snapshots of this database"""
+        return os.path.splitext(os.path.basename(self.db_path))[0] + '_'
+
+    def _on_progress(self, status, remaining, total):
+        """Progress callback invoked by sqlite3 after every backup step"""
+        self.status['pages_total'] = total
+        self.status['pages_remaining'] = remaining
+
+    def _new_snapshot_path(self):
+        """Path for a new snapshot; microseconds and a counter keep names unique and in time order"""
+        stem = os.path.join(self.backup_dir, self._snapshot_prefix() + datetime.now().strftime("%Y%m%d_%H%M%S_%f"))
+        path = stem + '.db'
+        counter = 1
+        while os.path.exists(path) or os.path.exists(path + '.partial'):
+            path = f"{stem}_{counter}.db"
+            counter += 1
+        return path
+
+    def is_running(self):
+        """Whether a backup is in progress"""
+        return self._lock.locked()
+
+    def run_backup(self):
+        """Run one backup now and return the result (one at a time; others are refused)"""
+        if not self._lock.acquire(blocking=False):
+            return {'success': False, 'message': 'Backup already running'}
+
+        snapshot_path = self._new_snapshot_path()
+        partial_path = snapshot_path + '.partial'
+        start_time = time.time()
+
+        try:
+            self.status['state'] = 'running'
+            self.status['last_started'] = datetime.now().isoformat()
+            self.status['pages_total'] = 0
+            self.status['pages_remaining'] = 0
+
+            source = sqlite3.connect(self.db_path)
+            target = sqlite3.connect(partial_path)
+            try:
+                source.backup(target, pages=self.pages_per_step,
+                              progress=self._on_progress, sleep=self.step_sleep)
+            finally:
+                target.close()
+                source.close()
+
+            self.status['state'] = 'verifying'
+            integrity = self.check_integrity(partial_path)
+            if integrity != 'ok':
+                raise sqlite3.DatabaseError(f"Integrity check failed: {integrity}")
+
+            os.replace(partial_path, snapshot_path)
+            self._prune_snapshots()
+
+            duration = time.time() - start_time
+            size = os.path.getsize(snapshot_path)
+            self.status.update({
+                'state': 'idle',
+                'backups_completed': self.status['backups_completed'] + 1,
+                'last_success': datetime.now().isoformat(),
+                'last_duration': duration,
+                'last_size_bytes': size,
+                'last_snapshot': os.path.basename(snapshot_path),
+                'last_error': None,
+                'snapshots': len(self.list_snapshots())
+            })
+            print(f"✓ Database backup saved to {snapshot_path} in {duration:.2f} seconds")
+
+            return {'success': True, 'path': snapshot_path, 'size': size, 'duration': duration}
+
+        except Exception as e:
+            print(f"Database backup failed: {e}")
+            if os.path.exists(partial_path):
+                try:
+                    os.remove(partial_path)
+                except OSError:
+                    pass
+            self.status['state'] = 'failed'
+            self.status['backups_failed'] += 1
+            self.status['last_error'] = str(e)
+            return {'success': False, 'message': f'Backup failed: {str(e)}'}
+
+        finally:
+            self._lock.release()
+
+    def check_integrity(self, path):
+        """Run PRAGMA integrity_check on a snapshot and return its verdict"""
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute('PRAGMA integrity_check').fetchall()
+        finally:
+            conn.close()
+        return '; '.join(row[0] for row in rows)
+
+    def list_snapshots(self):
+        """List snapshot paths, newest first"""
+        prefix = self._snapshot_prefix()
+        snapshots = [
+            os.path.join(self.backup_dir, name)
+            for name in os.listdir(self.backup_dir)
+            if name.startswith(prefix) and name.endswith('.db')
+        ]
+        return sorted(snapshots, reverse=True)
+
+    def _prune_snapshots(self):
+        """Delete snapshots beyond the retention count"""
+        for path in self.list_snapshots()[self.keep:]:
+            try:
+                os.remove(path)
+                print(f"Removed old backup: {path}")
+            except OSError as e:
+                print(f"Could not remove old backup {path}: {e}")
+
+    def _run_scheduler(self):
+        """Scheduler loop for the background thread"""
+        while not self._stop_event.wait(self.interval):
+            self.run_backup()
+
+    def start(self):
+        """Start scheduled backups in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_scheduler, name='db-backup', daemon=True)
+        self._thread.start()
+        print(f"✓ Database backups scheduled every {self.interval // 60} minutes (keeping {self.keep})")
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get_status(self):
+        """Get a copy of the current backup status"""
+        status = dict(self.status)
+        if status['pages_total']:
+            status['progress'] = 1.0 - status['pages_remaining'] / status['pages_total']
+        else:
+            status['progress'] = 0.0
+        return status
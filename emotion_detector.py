@@ -10,6 +10,7 @@ import time
 import uuid
 from datetime import datetime
 import base64
+from metrics import EMOTION_STAGE_SECONDS
 
 # Suppress TensorFlow warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
@@ -66,8 +67,9 @@ class EmotionDetector:
     
     def detect_faces(self, frame):
         """Detect faces in the frame"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+        with EMOTION_STAGE_SECONDS.time(detector='deepface', stage='face_detection'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
         return faces
     
     def analyze_emotion(self, face_region):
@@ -86,7 +88,8 @@ class EmotionDetector:
         
         try:
             # Use DeepFace to analyze emotion
-            result = DeepFace.analyze(face_region, actions=['emotion'], enforce_detection=False)
+            with EMOTION_STAGE_SECONDS.time(detector='deepface', stage='analysis'):
+                result = DeepFace.analyze(face_region, actions=['emotion'], enforce_detection=False)
             
             # Handle both list and dict returns from DeepFace
             if isinstance(result, list):
@@ -29,17 +29,28 @@ except ImportError as e:
     print("Falling back to CPU-based anime filter simulation")
     TF_AVAILABLE = False
 
+# Fast color quantization shared with the chat app's filter (falls back to full k-means)
+try:
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from color_quantization import ColorQuantizer, apply_palette
+    QUANTIZER_AVAILABLE = True
+except ImportError:
+    QUANTIZER_AVAILABLE = False
+
 class AnimeGANMoodFilter:
     """Ultra-high quality anime-style filter using AnimeGANv2"""
     
-    def __init__(self, style='Hayao'):
+    def __init__(self, style='Hayao', quantizer=None):
         """
         Initialize AnimeGAN MOOD Filter
         
         Args:
             style (str): Animation style - 'Hayao', 'Shinkai', or 'Paprika'
+            quantizer (str): Color quantization backend for the simulated filter (default: CHAT_QUANTIZER)
         """
         self.style = style
+        self.quantizer = ColorQuantizer(quantizer) if QUANTIZER_AVAILABLE else None
         self.output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'anime_captures')
         os.makedirs(self.output_dir, exist_ok=True)
         
@@ -297,18 +308,22 @@ class AnimeGANMoodFilter:
             anime_image = cv2.bilateralFilter(anime_image, 15, 200, 200)
             
             # 2. Color quantization to reduce color palette (anime-like effect)
-            data = anime_image.reshape((-1, 3))
-            data = np.float32(data)
-            
-            # K-means clustering for color reduction
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
             k = 8  # Number of colors
-            _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-            
-            # Convert centers to uint8
-            centers = np.uint8(centers)
-            quantized = centers[labels.flatten()]
-            anime_image = quantized.reshape(image.shape)
+            if self.quantizer:
+                labels, palette = self.quantizer.quantize(anime_image, k, style=self.style)
+                anime_image = apply_palette(labels, palette)
+            else:
+                data = anime_image.reshape((-1, 3))
+                data = np.float32(data)
+                
+                # K-means clustering for color reduction
+                criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
+                _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+                
+                # Convert centers to uint8
+                centers = np.uint8(centers)
+                quantized = centers[labels.flatten()]
+                anime_image = quantized.reshape(image.shape)
             
             # 3. Edge detection and enhancement
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
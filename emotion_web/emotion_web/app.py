@@ -13,7 +13,18 @@ import uuid
 from PIL import Image, ImageDraw, ImageFont
 
 app = Flask(__name__)
-db = EmotionDatabase()
+
+# Optional slow-query tracing shared with the chat app (set CHAT_SQL_TRACE=1)
+sql_tracer = None
+if os.environ.get('CHAT_SQL_TRACE') == '1':
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from query_tracer import tracer as sql_tracer
+
+if sql_tracer:
+    db = EmotionDatabase(connection_factory=sql_tracer.connection_factory())
+else:
+    db = EmotionDatabase()
 
 # Create images directory if it doesn't exist
 images_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images')
@@ -198,6 +209,20 @@ def get_total_count():
         return jsonify({"status": "error", "message": str(e)})
 
 
+def is_local_request():
+    """Check whether the request comes from this machine (a local operator)"""
+    # The app is served directly, not behind a proxy, so remote_addr is the real client
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/api/debug/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Get the slowest SQL statements by total time (needs CHAT_SQL_TRACE=1, local requests only)"""
+    if not is_local_request():
+        return jsonify({"status": "error", "message": "Debug endpoints are only available locally"}), 403
+    if not sql_tracer:
+        return jsonify({"status": "error", "message": "SQL tracing is disabled, set CHAT_SQL_TRACE=1"})
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({"status": "success", "data": sql_tracer.top_statements(limit)})
 
 @app.route('/dashboard')
 def dashboard():
@@ -4,13 +4,19 @@ from datetime import datetime
 import base64
 
 class EmotionDatabase:
-    def __init__(self, db_path='emotion_data.db'):
+    def __init__(self, db_path='emotion_data.db', connection_factory=sqlite3.Connection):
         self.db_path = db_path
+        # Lets callers plug in a timing/tracing connection class
+        self.connection_factory = connection_factory
         self.init_database()
     
+    def _connect(self):
+        """Open a connection to the emotion database"""
+        return sqlite3.connect(self.db_path, factory=self.connection_factory)
+    
     def init_database(self):
         """Initialize the database and create tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Create emotion_records table
@@ -45,7 +51,7 @@ class EmotionDatabase:
     
     def save_emotion_record(self, emotion, confidence=None, face_coords=None, face_image_base64=None, session_id=None):
         """Save an emotion detection record to the database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Convert face coordinates to string if provided
@@ -65,7 +71,7 @@ class EmotionDatabase:
     
     def get_recent_emotions(self, limit=10):
         """Get recent emotion records"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -92,7 +98,7 @@ class EmotionDatabase:
     
     def get_emotion_statistics(self, date_from=None, date_to=None):
         """Get emotion statistics for a date range"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         query = '''
@@ -129,7 +135,7 @@ class EmotionDatabase:
     
     def get_emotions_by_date(self, days=7):
         """Get emotion counts grouped by date for the last N days"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -154,7 +160,7 @@ class EmotionDatabase:
     
     def get_total_records_count(self):
         """Get total number of emotion records"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT COUNT(*) FROM emotion_records')
@@ -165,7 +171,7 @@ class EmotionDatabase:
     
     def delete_old_records(self, days_to_keep=30):
         """Delete records older than specified days"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -0,0 +1,129 @@
+"""
+Face Region Detection for the Anime MOOD Filter
+Finds the face and upper body of a selfie with OpenCV's frontal-face Haar cascade, so the
+filter can spend its full pipeline there and a cheap preset on the background
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+# Turn on ROI-aware filtering for every filter with CHAT_FILTER_ROI=1
+DEFAULT_ROI = os.environ.get('CHAT_FILTER_ROI', '0') == '1'
+
+# Preset the background runs at (see QUALITY_PRESETS in anime_mood_filter.py)
+DEFAULT_BACKGROUND_QUALITY = os.environ.get('CHAT_FILTER_ROI_BACKGROUND', 'fast')
+
+# Upper body around a face box, in face widths and heights: shoulders reach about one face
+# width to each side and the chest about three face heights below the top of the face
+UPPER_BODY_EXTENT = {'left': 1.0, 'right': 1.0, 'top': 0.5, 'bottom': 3.0}
+
+# Faces are searched for on a copy this wide at most; Haar detection does not need more
+_DETECTION_WIDTH = 320
+
+# Region edges sit on this grid so the lower presets' downscaled copies line up with the frame
+_REGION_ALIGN = 8
+
+
+class FaceRegionDetector:
+    """Face and upper-body region of a frame"""
+
+    def __init__(self, margin=0.25, min_face=0.08):
+        """
+        Initialize the detector
+
+        Args:
+            margin (float): Extra border around the upper body, in face widths; the
+                            seam is feathered across it
+            min_face (float): Smallest face to look for, as a share of the frame width
+        """
+        self.margin = margin
+        self.min_face = min_face
+        self._cascade = None
+
+    @property
+    def cascade(self):
+        """The frontal-face cascade, loaded on first use"""
+        if self._cascade is None:
+            self._cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            if self._cascade.empty():
+                raise RuntimeError('Could not load the frontal face Haar cascade')
+        return self._cascade
+
+    def detect_faces(self, image):
+        """
+        Face boxes of a BGR frame
+
+        Returns:
+            list: (x, y, w, h) boxes in frame pixels
+        """
+        height, width = image.shape[:2]
+        scale = min(1.0, _DETECTION_WIDTH / width)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        gray = cv2.equalizeHist(gray)
+        min_side = max(20, int(gray.shape[1] * self.min_face))
+        faces = self.cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(min_side, min_side))
+        return [tuple(int(round(value / scale)) for value in face) for face in faces]
+
+    def region(self, image, faces=None):
+        """
+        Face and upper-body region of every face, plus the margin
+
+        Args:
+            image (np.ndarray): BGR frame
+            faces (list): Face boxes (default: detected in the frame)
+
+        Returns:
+            tuple: (top, left, bottom, right) in frame pixels, or None without a face
+        """
+        faces = self.detect_faces(image) if faces is None else faces
+        if not len(faces):
+            return None
+        height, width = image.shape[:2]
+        boxes = []
+        for x, y, w, h in faces:
+            extra = self.margin * w
+            boxes.append((y - UPPER_BODY_EXTENT['top'] * h - extra,
+                          x - UPPER_BODY_EXTENT['left'] * w - extra,
+                          y + UPPER_BODY_EXTENT['bottom'] * h + extra,
+                          x + w + UPPER_BODY_EXTENT['right'] * w + extra))
+        top, left = min(box[0] for box in boxes), min(box[1] for box in boxes)
+        bottom, right = max(box[2] for box in boxes), max(box[3] for box in boxes)
+        top = max(0, int(top) // _REGION_ALIGN * _REGION_ALIGN)
+        left = max(0, int(left) // _REGION_ALIGN * _REGION_ALIGN)
+        bottom = min(height, -(-int(np.ceil(bottom)) // _REGION_ALIGN) * _REGION_ALIGN)
+        right = min(width, -(-int(np.ceil(right)) // _REGION_ALIGN) * _REGION_ALIGN)
+        return top, left, bottom, right
+
+    def feather_width(self, faces):
+        """Width of the blend between the region and the background: the margin of the smallest face"""
+        return max(4, int(self.margin * min(face[2] for face in faces)))
+
+
+def feather_mask(region, frame_shape, feather):
+    """
+    Blend weights of a region: 1 inside, falling to 0 over `feather` pixels at its edges
+
+    Edges on the frame border do not fade, as there is no background beyond them.
+
+    Returns:
+        np.ndarray: float32 weights with the region's shape
+    """
+    top, left, bottom, right = region
+    height, width = frame_shape[:2]
+
+    def ramp(length, start_fades, end_fades):
+        steps = np.arange(length, dtype=np.float32)
+        weights = np.ones(length, dtype=np.float32)
+        if start_fades:
+            weights = np.minimum(weights, (steps + 1) / (feather + 1))
+        if end_fades:
+            weights = np.minimum(weights, (length - steps) / (feather + 1))
+        return weights
+
+    rows = ramp(bottom - top, top > 0, bottom < height)
+    cols = ramp(right - left, left > 0, right < width)
+    return np.outer(rows, cols)
@@ -0,0 +1,322 @@
+"""
+Anime Filter Result Cache for ChatApp
+Filtered images keyed by (input hash, style, preset, output format, pipeline version) in an in-memory LRU
+backed by a size-capped directory; identical requests in flight share one computation
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, CancelledError
+
+from filter_workers import MAX_FRAME_SIDE
+from image_output import OutputFormat
+from metrics import registry
+from style_registry import styles as style_registry
+
+# Bump whenever anime_mood_filter output changes, so old results are never served.
+# 2: shared multi-style stages, tiled large frames, scratch buffers, pluggable quantizers
+PIPELINE_VERSION = 2
+
+# Disk entries hold whatever OutputFormat encoded (JPEG, WebP, ...), so the suffix names no format
+DISK_SUFFIX = '.bin'
+
+FILTER_CACHE_REQUESTS = registry.counter(
+    'chat_filter_cache_requests_total', 'Filter cache lookups by result (memory, disk, coalesced, miss)', ['result'])
+FILTER_CACHE_BYTES_SAVED = registry.counter(
+    'chat_filter_cache_bytes_saved_total', 'Filtered output bytes served without running the filter')
+
+
+def cache_key(data, style, quality=None, max_side=MAX_FRAME_SIDE, output=None):
+    """
+    Key for a filter result
+
+    The quality preset, quantizer, smoother, ROI mode and output format fall back to the same
+    environment defaults the workers use, so changing them does not serve results made with
+    the old settings. The style's declaration is part of the key too, so editing a style in the
+    registry does not serve images graded the old way.
+    """
+    quality = quality or os.environ.get('CHAT_FILTER_QUALITY', 'balanced')
+    quantizer = os.environ.get('CHAT_QUANTIZER', 'kmeans_sampled')
+    smoother = os.environ.get('CHAT_SMOOTHER', '')
+    roi = os.environ.get('CHAT_FILTER_ROI_BACKGROUND', 'fast') if os.environ.get('CHAT_FILTER_ROI', '0') == '1' else ''
+    digest = hashlib.sha256(data).hexdigest()
+    output = output or OutputFormat()
+    declaration = style_registry.fingerprint(style)
+    settings = f'{PIPELINE_VERSION}|{style}:{declaration}|{quality}|{quantizer}|{smoother}|{roi}|{max_side}|{output.key()}'
+    return f'{digest[:32]}-{hashlib.sha256(settings.encode()).hexdigest()[:16]}'
+
+
+class FilterResultCache:
+    """Two-tier cache of filtered images with in-flight request coalescing"""
+
+    def __init__(self, directory=None, max_memory_bytes=32 * 1024 * 1024, max_disk_bytes=None):
+        """
+        Initialize the cache
+
+        Args:
+            directory (str): Disk tier location (default: CHAT_FILTER_CACHE_DIR or 'filter_cache');
+                             created on first write
+            max_memory_bytes (int): Size cap of the in-memory LRU
+            max_disk_bytes (int): Size cap of the disk tier (default: CHAT_FILTER_CACHE_MB, 256 MB);
+                                  0 disables it
+        """
+        self.directory = directory or os.environ.get('CHAT_FILTER_CACHE_DIR', 'filter_cache')
+        if max_disk_bytes is None:
+            max_disk_bytes = int(os.environ.get('CHAT_FILTER_CACHE_MB', '256')) * 1024 * 1024
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._in_flight = {}
+        self._previews = {}
+        self._lock = threading.Lock()
+        self.stats = {'memory': 0, 'disk': 0, 'coalesced': 0, 'miss': 0, 'bytes_saved': 0}
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        """Pick up results left on disk by earlier runs, oldest first"""
+        if not self.max_disk_bytes or not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(DISK_SUFFIX):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((info.st_mtime, name[:-len(DISK_SUFFIX)], info.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + DISK_SUFFIX)
+
+    def get(self, key):
+        """Cached result, or None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._record('memory', len(data))
+                return data
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+
+        if on_disk:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                data = None
+            with self._lock:
+                if data is None:
+                    self._forget_disk(key)
+                else:
+                    self._remember(key, data)
+                    self._record('disk', len(data))
+                    return data
+        return None
+
+    def put(self, key, data):
+        """Store a result in memory and on disk"""
+        with self._lock:
+            self._remember(key, data)
+            self._previews.pop(key, None)
+        if not self.max_disk_bytes or len(data) > self.max_disk_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f'{self._path(key)}.{threading.get_ident()}.tmp'
+            with open(temporary, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, self._path(key))
+        except OSError as e:
+            print(f"⚠ Filter cache write failed: {e}")
+            return
+        with self._lock:
+            self._forget_disk(key, delete=False)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            self._evict_disk()
+
+    def get_or_compute(self, key, compute, timeout=None):
+        """
+        Cached result for key, computing it at most once at a time
+
+        A request that finds the same key already being computed waits for that result
+        instead of starting another. If the computation is cancelled, the next waiter
+        takes over; other errors are raised to every waiter.
+
+        Args:
+            key (str): From cache_key()
+            compute (callable): Returns the result bytes
+            timeout (float): Seconds to wait on another request's computation
+        """
+        while True:
+            data = self.get(key)
+            if data is not None:
+                return data
+
+            with self._lock:
+                # A computation may have finished between the lookup and here
+                data = self._memory.get(key)
+                if data is not None:
+                    self._record('memory', len(data))
+                    return data
+                future = self._in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._in_flight[key] = Future()
+
+            if not leader:
+                try:
+                    data = future.result(timeout=timeout)
+                except CancelledError:
+                    continue
+                with self._lock:
+                    self._record('coalesced', len(data))
+                return data
+
+            with self._lock:
+                self.stats['miss'] += 1
+            FILTER_CACHE_REQUESTS.inc(result='miss')
+            try:
+                data = compute()
+            except BaseException as e:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                    self._previews.pop(key, None)
+                if isinstance(e, CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                raise
+            self.put(key, data)
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_result(data)
+            return data
+
+    def preview(self, key, render):
+        """
+        Preview of the result for key while it is being computed, rendered at most once
+
+        The preview belongs to the key's entry: requests coalesced on one computation share
+        it, and it is dropped as soon as the full result is cached (or its computation
+        fails), so it can neither outlive nor be evicted apart from the result.
+
+        Args:
+            key (str): From cache_key()
+            render (callable): Starts rendering the preview and returns a Future, or None
+                               to skip it (e.g. when no worker is free)
+
+        Returns:
+            Future: Resolves to the render Future's result, or None if there is no preview;
+                    None when the full result is already cached
+        """
+        with self._lock:
+            if key in self._memory or key in self._disk:
+                return None
+            shared = self._previews.get(key)
+            if shared is not None:
+                return shared
+            shared = self._previews[key] = Future()
+
+        def resolve(result):
+            if result is None:
+                # Skipped or failed: a later request for the key may try again
+                with self._lock:
+                    if self._previews.get(key) is shared:
+                        del self._previews[key]
+            shared.set_result(result)
+
+        try:
+            rendering = render()
+        except BaseException:
+            resolve(None)
+            raise
+        if rendering is None:
+            resolve(None)
+        else:
+            rendering.add_done_callback(
+                lambda done: resolve(None if done.cancelled() or done.exception() is not None else done.result()))
+        return shared
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            keys = list(self._disk)
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in keys:
+                self._forget_disk(key)
+
+    def get_stats(self):
+        """Hit rate, bytes saved and tier sizes"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'in_flight': len(self._in_flight),
+                'previews': len(self._previews)
+            })
+        hits = stats['memory'] + stats['disk'] + stats['coalesced']
+        stats['hit_rate'] = round(hits / (hits + stats['miss']), 4) if hits + stats['miss'] else 0.0
+        return stats
+
+    def _record(self, result, size):
+        """Count a hit (caller holds the lock)"""
+        self.stats[result] += 1
+        self.stats['bytes_saved'] += size
+        FILTER_CACHE_REQUESTS.inc(result=result)
+        FILTER_CACHE_BYTES_SAVED.inc(size)
+
+    def _remember(self, key, data):
+        """Put a result in the memory tier and evict down to the cap (caller holds the lock)"""
+        if len(data) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _forget_disk(self, key, delete=True):
+        """Drop a disk entry (caller holds the lock)"""
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+        if delete:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _evict_disk(self):
+        """Delete the least recently used files until the disk tier fits (caller holds the lock)"""
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            self._forget_disk(next(iter(self._disk)))
+
+
+# Shared cache used by the Flask routes
+filter_cache = FilterResultCache()
+
+registry.gauge('chat_filter_cache_hit_ratio', 'Share of filter requests answered from the cache',
+               callback=lambda: filter_cache.get_stats()['hit_rate'])
+registry.gauge('chat_filter_cache_disk_bytes', 'Size of the on-disk filter cache',
+               callback=lambda: filter_cache.get_stats()['disk_bytes'])
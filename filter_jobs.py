@@ -0,0 +1,245 @@
+"""
+Asynchronous Anime Filter Jobs for ChatApp
+Submitting a filter returns a job id right away; a thumbnail preview, stage progress and
+the result are pushed to the user's socket
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError
+
+from filter_cache import cache_key
+from filter_workers import FilterPoolBusy
+from image_output import OutputFormat
+
+# Pipeline stages in the order they are reported
+JOB_STAGES = ('queued', 'captured', 'smoothed', 'quantized', 'encoded')
+
+# Previews use the fastest preset at thumbnail size, usually a few tens of milliseconds
+PREVIEW_SIDE = 320
+PREVIEW_QUALITY = 'fast'
+PREVIEW_OUTPUT_QUALITY = 70
+
+
+class FilterJobLimit(Exception):
+    """Raised when a user already has the maximum number of jobs in flight"""
+
+
+class FilterJob:
+    """One filter request and its progress"""
+
+    def __init__(self, user_id, style, quality):
+        self.id = uuid.uuid4().hex
+        self.user_id = str(user_id)
+        self.style = style
+        self.quality = quality
+        self.status = 'queued'  # queued, running, done, failed, cancelled
+        self.stage = 'queued'
+        self.created = time.time()
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self.cancel_requested = False
+        self.has_preview = False
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def to_dict(self):
+        """Job state as sent to the browser"""
+        return {
+            'job_id': self.id,
+            'style': self.style,
+            'quality': self.quality,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': JOB_STAGES.index(self.stage) / (len(JOB_STAGES) - 1),
+            'result': self.result,
+            'error': self.error,
+            'has_preview': self.has_preview
+        }
+
+
+class FilterJobManager:
+    """Runs filter jobs through the worker pool and reports progress to their owners"""
+
+    def __init__(self, pool, notify, max_per_user=2, max_finished=200, cache=None, preview_side=PREVIEW_SIDE,
+                 output=None):
+        """
+        Initialize the job manager
+
+        Args:
+            pool (FilterWorkerPool): Worker pool that runs the filter
+            notify (callable): notify(user_id, event, payload) pushes an event to the user's socket
+            max_per_user (int): Jobs a user may have queued or running at once
+            max_finished (int): Finished jobs kept for status lookups
+            cache (FilterResultCache): Serves repeated uploads without filtering them again
+            preview_side (int): Longer side of the preview sent before the full result (0 disables)
+            output (OutputFormat): Encoding of results and previews (default: from the environment)
+        """
+        self.pool = pool
+        self.notify = notify
+        self.max_per_user = max_per_user
+        self.max_finished = max_finished
+        self.cache = cache
+        self.preview_side = preview_side
+        self.output = output or OutputFormat()
+        self.preview_output = OutputFormat(self.output.format, PREVIEW_OUTPUT_QUALITY)
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, style, quality=None, capture=None, upload=None, on_complete=None):
+        """
+        Start a filter job and return it without waiting
+
+        Args:
+            user_id: Owner of the job
+            style (str): Anime style
+            quality (str): Quality preset (default: the workers' CHAT_FILTER_QUALITY)
+            capture (callable): Returns a BGR frame from the camera, or None on failure
+            upload (bytes): Encoded image uploaded by the browser (used when capture is None)
+            on_complete (callable): on_complete(job, encoded_bytes) stores the result (encoded in
+                                    self.output) and returns the result reference sent to the browser
+        """
+        job = FilterJob(user_id, style, quality)
+        with self._lock:
+            active = sum(1 for other in self.jobs.values() if other.user_id == job.user_id and other.active)
+            if active >= self.max_per_user:
+                raise FilterJobLimit(f'You already have {active} filters running, please wait for one to finish')
+            self.jobs[job.id] = job
+            self._prune()
+
+        threading.Thread(target=self._run, args=(job, capture, upload, on_complete), daemon=True).start()
+        return job
+
+    def get(self, job_id, user_id):
+        """A job, only if it belongs to the user"""
+        job = self.jobs.get(job_id)
+        if job is None or job.user_id != str(user_id):
+            return None
+        return job
+
+    def cancel(self, job_id, user_id):
+        """
+        Cancel a job
+
+        Jobs still waiting for a worker are dropped from the queue. A job already in a worker
+        finishes there, but its result is discarded.
+        """
+        job = self.get(job_id, user_id)
+        if job is None or not job.active:
+            return False
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            self._finish(job, 'cancelled')
+        return True
+
+    def _run(self, job, capture, upload, on_complete):
+        """Job thread: capture, filter in a worker, store the result"""
+        try:
+            job.status = 'running'
+            if capture is not None:
+                source = capture()
+                if source is None:
+                    raise RuntimeError('Camera not accessible. Try the Browser Camera button instead')
+            else:
+                source = upload
+            if job.cancel_requested:
+                return self._finish(job, 'cancelled')
+            self._advance(job, 'captured')
+
+            # Camera frames never repeat; uploads often do (the same photo sent to several friends)
+            use_cache = self.cache is not None and upload is not None
+            key = cache_key(source, job.style, job.quality, output=self.output) if use_cache else None
+            encoded = self.cache.get(key) if use_cache else None
+            if encoded is None:
+                if self.preview_side:
+                    self._start_preview(job, source, key)
+                if use_cache:
+                    encoded = self.cache.get_or_compute(
+                        key, lambda: self._filter(job, source), timeout=self.pool.job_timeout)
+                else:
+                    encoded = self._filter(job, source)
+            if job.cancel_requested:
+                return self._finish(job, 'cancelled')
+
+            self._advance(job, 'encoded')
+            job.result = on_complete(job, encoded) if on_complete else None
+            self._finish(job, 'done')
+        except CancelledError:
+            self._finish(job, 'cancelled')
+        except FilterPoolBusy as e:
+            self._finish(job, 'failed', str(e))
+        except Exception as e:
+            print(f"Filter job {job.id} failed: {e}")
+            self._finish(job, 'failed', str(e))
+
+    def _filter(self, job, source):
+        """Run the filter in a worker and wait for the encoded result"""
+        job.future = self.pool.submit_encoded(
+            source, job.style, job.quality, progress=lambda stage: self._advance(job, stage), output=self.output)
+        if job.cancel_requested:
+            job.future.cancel()
+        return job.future.result(timeout=self.pool.job_timeout)[0]
+
+    def _start_preview(self, job, source, key):
+        """
+        Render a thumbnail with the fastest preset ahead of the full result
+
+        Cached uploads share the preview through the cache entry of the full result, so
+        jobs coalesced on one computation render it once. It is best effort: when every
+        worker slot is taken it is skipped rather than delaying the full result.
+        """
+        def render():
+            try:
+                return self.pool.submit_encoded(source, job.style, PREVIEW_QUALITY, max_side=self.preview_side,
+                                                output=self.preview_output, admission_timeout=0)
+            except FilterPoolBusy:
+                return None
+
+        future = self.cache.preview(key, render) if key else render()
+        if future is None:
+            return
+
+        def delivered(done):
+            if done.cancelled() or done.exception() is not None or done.result() is None:
+                return
+            self._send_preview(job, done.result()[0])
+
+        future.add_done_callback(delivered)
+
+    def _send_preview(self, job, preview):
+        """Push the preview, unless the full result got there first"""
+        with self._lock:
+            if not job.active or job.stage == 'encoded' or job.has_preview:
+                return
+            job.has_preview = True
+        payload = job.to_dict()
+        payload['preview'] = self.preview_output.data_url(preview)
+        self.notify(job.user_id, 'filter_job_preview', payload)
+
+    def _advance(self, job, stage):
+        """Report a stage; late reports for earlier stages are ignored"""
+        if not job.active or JOB_STAGES.index(stage) <= JOB_STAGES.index(job.stage):
+            return
+        job.stage = stage
+        self.notify(job.user_id, 'filter_job_progress', job.to_dict())
+
+    def _finish(self, job, status, error=None):
+        """Record the final state and send it once"""
+        with self._lock:
+            if not job.active:
+                return
+            job.status = status
+            job.error = error
+            job.finished = time.time()
+        self.notify(job.user_id, 'filter_job_done', job.to_dict())
+
+    def _prune(self):
+        """Forget the oldest finished jobs (caller holds the lock)"""
+        finished = [job for job in self.jobs.values() if not job.active]
+        for job in sorted(finished, key=lambda job: job.finished)[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.id]
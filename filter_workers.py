@@ -0,0 +1,362 @@
+"""
+Anime Filter Worker Pool for ChatApp
+Runs AnimeMoodFilter in separate processes behind a bounded admission queue,
+so filter requests use every core without holding the GIL the chat threads need
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from image_output import OutputFormat
+from metrics import registry
+
+FILTER_POOL_WAIT_SECONDS = registry.histogram(
+    'chat_filter_pool_wait_seconds', 'Time a filter job waited for a free worker')
+FILTER_POOL_JOB_SECONDS = registry.histogram(
+    'chat_filter_pool_job_seconds', 'Time a worker spent on a filter job', ['style'])
+FILTER_POOL_REQUESTS = registry.counter(
+    'chat_filter_pool_requests_total', 'Filter jobs submitted to the worker pool', ['outcome'])
+
+# Frames larger than this are scaled down before filtering (CHAT_FILTER_MAX_SIDE). Larger
+# frames are filtered in tiles, so raising it costs time but not unbounded memory.
+MAX_FRAME_SIDE = int(os.environ.get('CHAT_FILTER_MAX_SIDE', '1920'))
+
+# Worker-process state: one AnimeMoodFilter per style and the queue progress goes back on
+_worker_filters = {}
+_progress_queue = None
+
+
+class FilterPoolBusy(Exception):
+    """Raised when the admission queue is full"""
+
+
+def _init_worker(progress_queue=None):
+    """Keep each worker on one core and below the web server's priority"""
+    global _progress_queue
+    _progress_queue = progress_queue
+    import cv2
+    cv2.setNumThreads(1)
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(5)
+        except OSError:
+            pass
+
+
+def _get_filter(style):
+    """Reuse filters across jobs so LUTs and hue fields stay cached in the worker"""
+    from anime_mood_filter import AnimeMoodFilter
+    if style not in _worker_filters:
+        _worker_filters[style] = AnimeMoodFilter(style)
+    return _worker_filters[style]
+
+
+def _report(progress_key, stage):
+    """Send a pipeline stage back to the server process"""
+    if progress_key and _progress_queue is not None:
+        _progress_queue.put((progress_key, stage))
+
+
+def _fit_frame(image, max_side):
+    """Scale a frame down so its longer side is at most max_side"""
+    import cv2
+    height, width = image.shape[:2]
+    if max(height, width) <= max_side:
+        return image
+    scale = max_side / max(height, width)
+    return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _filter_array(image, style, quality, progress_key=None, quantizer=None):
+    """Worker task: filter a decoded BGR frame"""
+    start = time.time()
+    filtered = _get_filter(style).apply_anime_filter(
+        image, quality=quality, progress=lambda stage: _report(progress_key, stage), quantizer=quantizer)
+    if filtered is None:
+        raise RuntimeError(f'{style} filter failed')
+    return filtered, time.time() - start
+
+
+def _decode_frame(data, max_side):
+    """An encoded upload or a decoded frame as a BGR frame no larger than max_side"""
+    import cv2
+    import numpy as np
+    if isinstance(data, np.ndarray):
+        image = data
+    else:
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError('Could not decode image')
+    return _fit_frame(image, max_side)
+
+
+def _filter_encoded(data, style, quality, max_side, output, progress_key=None):
+    """Worker task: filter an encoded upload or a decoded frame and return the encoded result"""
+    filtered, elapsed = _filter_array(_decode_frame(data, max_side), style, quality, progress_key)
+    return output.encode(filtered), elapsed
+
+
+def _filter_stream_frame(data, style, quality, max_side, output, state, progress_key=None):
+    """
+    Worker task: filter one encoded frame of a video stream, continuing its palette
+
+    Returns:
+        tuple: ((encoded frame, palette state), seconds); the state goes with the stream's
+               next frame, whichever worker that lands on (None starts a new stream)
+    """
+    from color_quantization import TemporalQuantizer
+    quantizer = TemporalQuantizer(state=state)
+    filtered, elapsed = _filter_array(_decode_frame(data, max_side), style, quality, progress_key, quantizer)
+    return (output.encode(filtered), quantizer.state), elapsed
+
+
+def _render_styles_encoded(data, styles, quality, max_side, output, progress_key=None):
+    """Worker task: render several styles of one image, sharing their common stages"""
+    start = time.time()
+    rendered = _get_filter(styles[0]).render_styles(
+        _decode_frame(data, max_side), styles, quality=quality,
+        progress=lambda stage: _report(progress_key, stage))
+    if rendered is None:
+        raise RuntimeError('Multi-style render failed')
+    variants = {style: output.encode(image) for style, image in rendered['variants'].items()}
+    return {'variants': variants, 'timings': rendered['timings']}, time.time() - start
+
+
+def _filter_clip_frame(image, style, quality, palettes, clip_format, gif_palette=None, progress_key=None):
+    """
+    Worker task: filter one frame of a clip with the clip's palettes and encode it for the
+    clip's writer
+
+    Returns:
+        tuple: ((encoded frame, palettes, GIF color table), seconds); the first frame of a
+               clip (palettes None) builds the palettes and color table the others reuse
+    """
+    from clip_filter import encode_clip_frame, gif_palette_for
+    from color_quantization import FixedPaletteQuantizer
+    start = time.time()
+    quantizer = FixedPaletteQuantizer(palettes)
+    filtered, _ = _filter_array(image, style, quality, progress_key, quantizer=quantizer)
+    if clip_format == 'gif' and gif_palette is None:
+        gif_palette = gif_palette_for(filtered)
+    encoded = encode_clip_frame(filtered, clip_format, gif_palette=gif_palette)
+    return (encoded, quantizer.palettes, gif_palette), time.time() - start
+
+
+def _warm_up():
+    """Worker task: import OpenCV and the filter ahead of the first request"""
+    import anime_mood_filter
+    return os.getpid()
+
+
+class FilterWorkerPool:
+    """Process pool for anime filtering with bounded admission"""
+
+    def __init__(self, max_workers=None, max_pending=None, admission_timeout=2.0, job_timeout=60.0):
+        """
+        Initialize the pool (processes start on first use)
+
+        Args:
+            max_workers (int): Worker processes (default: cores - 1, so the chat threads keep a core)
+            max_pending (int): Jobs allowed to wait for a worker before new ones are rejected
+            admission_timeout (float): Seconds a request waits for a queue slot before FilterPoolBusy
+            job_timeout (float): Seconds a request waits for its result
+        """
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending = self.max_workers * 2 if max_pending is None else max_pending
+        self.admission_timeout = admission_timeout
+        self.job_timeout = job_timeout
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._executor = None
+        self._progress_queue = None
+        self._progress_callbacks = {}
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def _get_executor(self):
+        """Start the worker processes on first use"""
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the server process has live socket and database threads
+                context = multiprocessing.get_context('spawn')
+                self._progress_queue = context.Queue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self._progress_queue,)
+                )
+                threading.Thread(target=self._forward_progress, args=(self._progress_queue,), daemon=True).start()
+                print(f"✓ Filter worker pool started with {self.max_workers} processes")
+            return self._executor
+    
+    def _forward_progress(self, progress_queue):
+        """Hand stage reports from the workers to the callback registered for the job"""
+        while True:
+            item = progress_queue.get()
+            if item is None:
+                return
+            progress_key, stage = item
+            callback = self._progress_callbacks.get(progress_key)
+            if callback is not None:
+                try:
+                    callback(stage)
+                except Exception as e:
+                    print(f"Filter progress callback error: {e}")
+
+    def start(self):
+        """Start the workers and load OpenCV in each of them in the background"""
+        executor = self._get_executor()
+        for _ in range(self.max_workers):
+            executor.submit(_warm_up)
+
+    def shutdown(self):
+        """Stop the workers, dropping queued jobs"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            progress_queue, self._progress_queue = self._progress_queue, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if progress_queue is not None:
+            progress_queue.put(None)
+
+    def submit(self, function, *args, style='', progress=None, admission_timeout=None):
+        """
+        Admit a job and start it in a worker
+        
+        Args:
+            function: Worker task taking a progress_key keyword
+            style (str): Style label for the metrics
+            progress (callable): Called with each pipeline stage the worker reports
+            admission_timeout (float): Seconds to wait for a queue slot (default: the pool's)
+        
+        Returns:
+            Future: Resolves to (result, worker_seconds)
+        """
+        if admission_timeout is None:
+            admission_timeout = self.admission_timeout
+        if not self._slots.acquire(timeout=admission_timeout):
+            FILTER_POOL_REQUESTS.inc(outcome='rejected')
+            raise FilterPoolBusy('Filter workers are busy, please try again in a moment')
+
+        submitted = time.time()
+        progress_key = uuid.uuid4().hex if progress else None
+        with self._lock:
+            self.in_flight += 1
+            if progress_key:
+                self._progress_callbacks[progress_key] = progress
+        try:
+            future = self._get_executor().submit(function, *args, progress_key=progress_key)
+        except Exception:
+            self._release(progress_key)
+            raise
+        future.add_done_callback(lambda done: self._finished(done, submitted, style, progress_key))
+        return future
+
+    def _release(self, progress_key):
+        """Free the job's queue slot"""
+        with self._lock:
+            self.in_flight -= 1
+            self._progress_callbacks.pop(progress_key, None)
+        self._slots.release()
+
+    def _finished(self, future, submitted, style, progress_key):
+        """Done callback: free the slot and record the outcome"""
+        self._release(progress_key)
+        if future.cancelled():
+            FILTER_POOL_REQUESTS.inc(outcome='cancelled')
+            return
+        error = future.exception()
+        if error is not None:
+            if isinstance(error, BrokenProcessPool):
+                # A worker died (e.g. killed for memory); start fresh processes for the next job
+                print("⚠ Filter worker pool broken, restarting on next job")
+                self.shutdown()
+            FILTER_POOL_REQUESTS.inc(outcome='error')
+            return
+        worker_seconds = future.result()[1]
+        FILTER_POOL_REQUESTS.inc(outcome='success')
+        FILTER_POOL_JOB_SECONDS.observe(worker_seconds, style=style)
+        FILTER_POOL_WAIT_SECONDS.observe(max(0.0, time.time() - submitted - worker_seconds))
+
+    def _run(self, function, *args, style=''):
+        """Admit a job, run it in a worker and wait for the result"""
+        future = self.submit(function, *args, style=style)
+        try:
+            return future.result(timeout=self.job_timeout)[0]
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def filter_array(self, image, style, quality=None):
+        """Filter a decoded BGR frame in a worker and return the filtered frame"""
+        return self._run(_filter_array, image, style, quality, style=style)
+
+    def filter_encoded(self, data, style, quality=None, max_side=MAX_FRAME_SIDE, output=None):
+        """
+        Filter an encoded (JPEG/PNG) frame in a worker and return the result encoded once,
+        in output (default: OutputFormat() from the environment)
+        """
+        return self._run(_filter_encoded, data, style, quality, max_side, output or OutputFormat(), style=style)
+
+    def render_styles_encoded(self, data, styles, quality=None, max_side=MAX_FRAME_SIDE, output=None):
+        """
+        Render several styles of one encoded frame in a worker
+        
+        Returns:
+            dict: {'variants': {style: encoded bytes}, 'timings': {stage: seconds}}
+        """
+        return self._run(_render_styles_encoded, data, list(styles), quality, max_side, output or OutputFormat(),
+                         style='multi')
+
+    def submit_encoded(self, data, style, quality=None, progress=None, max_side=MAX_FRAME_SIDE, output=None,
+                       admission_timeout=None):
+        """Start filtering an encoded upload or a decoded frame; the Future resolves to (encoded bytes, seconds)"""
+        return self.submit(_filter_encoded, data, style, quality, max_side, output or OutputFormat(),
+                           style=style, progress=progress, admission_timeout=admission_timeout)
+
+    def submit_stream_frame(self, data, style, state, quality=None, max_side=MAX_FRAME_SIDE, output=None,
+                            admission_timeout=None):
+        """
+        Start filtering one encoded frame of a video stream; the Future resolves to
+        ((encoded bytes, palette state), seconds)
+
+        The palette state travels with the frames instead of staying in a worker, so a
+        stream keeps its colors from frame to frame whichever worker each frame lands on.
+        Pass the state of the previous frame (None for the first one).
+        """
+        return self.submit(_filter_stream_frame, data, style, quality, max_side, output or OutputFormat(), state,
+                           style=style, admission_timeout=admission_timeout)
+
+    def submit_clip_frame(self, image, style, quality, palettes, clip_format, gif_palette=None):
+        """
+        Start filtering one decoded frame of a clip; the Future resolves to
+        ((encoded frame, palettes, GIF color table), seconds)
+
+        A clip keeps only a few frames in flight, so its frames wait for a queue slot
+        as long as a job may take instead of failing with FilterPoolBusy.
+        """
+        return self.submit(_filter_clip_frame, image, style, quality, palettes, clip_format, gif_palette,
+                           style=style, admission_timeout=self.job_timeout)
+
+    def get_status(self):
+        """Pool size and current load"""
+        return {
+            'started': self._executor is not None,
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight
+        }
+
+
+# Shared pool used by the Flask routes
+filter_pool = FilterWorkerPool()
+atexit.register(filter_pool.shutdown)
+
+registry.gauge('chat_filter_pool_in_flight', 'Filter jobs running or waiting for a worker',
+               callback=lambda: filter_pool.in_flight)
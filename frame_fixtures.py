@@ -0,0 +1,70 @@
+"""
+Synthetic Frames for the Tests and Benchmarks
+Camera-like frames, a webcam portrait placed in a scene and short moving clips, so the
+tests and the benchmark scripts share fixtures without importing each other
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+# Common camera frame sizes (height, width)
+SIZES = {
+    '480p': (480, 640),
+    '720p': (720, 1280),
+    '1080p': (1080, 1920),
+}
+
+# A real webcam capture: skin, hair, fabric and a patterned wall
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'anime_captures',
+                               'original_20250721_142923.jpg')
+
+
+def make_frame(height, width, seed=0):
+    """Synthetic camera-like frame: smooth gradients plus noise"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.stack([
+        128 + 100 * np.sin(x / 97.0),
+        128 + 100 * np.cos(y / 53.0),
+        128 + 100 * np.sin((x + y) / 71.0)
+    ], axis=2)
+    frame += rng.normal(0, 12, frame.shape)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def fit_image(image, height, width):
+    """Center-crop a fixture to the frame's aspect ratio and resize it to the frame"""
+    if image is None:
+        return make_frame(height, width)
+    source_height, source_width = image.shape[:2]
+    crop_height = min(source_height, round(source_width * height / width))
+    crop_width = min(source_width, round(source_height * width / height))
+    top, left = (source_height - crop_height) // 2, (source_width - crop_width) // 2
+    cropped = image[top:top + crop_height, left:left + crop_width]
+    interpolation = cv2.INTER_AREA if crop_height > height else cv2.INTER_CUBIC
+    return np.ascontiguousarray(cv2.resize(cropped, (width, height), interpolation=interpolation))
+
+
+def make_scene(height, width, portrait, person_height=0.5):
+    """A synthetic background with the portrait placed bottom center, person_height of the frame tall"""
+    scene = make_frame(height, width)
+    portrait_height = int(height * person_height)
+    portrait_width = portrait_height * portrait.shape[1] // portrait.shape[0]
+    left = (width - portrait_width) // 2
+    scene[height - portrait_height:, left:left + portrait_width] = cv2.resize(
+        portrait, (portrait_width, portrait_height), interpolation=cv2.INTER_AREA)
+    return scene
+
+
+def make_clip_frames(count, height=240, width=320):
+    """A synthetic scene with a dark block moving left to right, one step per frame"""
+    background = make_frame(height, width)
+    frames = []
+    for index in range(count):
+        frame = background.copy()
+        left = 10 + index * (width - 60) // max(1, count - 1)
+        cv2.rectangle(frame, (left, height // 3), (left + 40, height // 3 + 60), (15, 15, 15), -1)
+        frames.append(frame)
+    return frames
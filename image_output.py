@@ -0,0 +1,197 @@
+"""
+Filtered Image Output for ChatApp
+Encodes a filtered frame once in the configured format and reuses the bytes for the disk
+copy, the cache and the response; disk writes go to a background writer thread
+"""
+
+import atexit
+import base64
+import os
+import queue
+import threading
+
+from metrics import registry
+
+IMAGE_WRITES = registry.counter(
+    'chat_image_writes_total', 'Filtered images written to disk by how (background, direct, error)', ['outcome'])
+
+# Supported output formats: file extension and MIME type
+FORMATS = {
+    'jpeg': {'extension': 'jpg', 'mime_type': 'image/jpeg'},
+    'webp': {'extension': 'webp', 'mime_type': 'image/webp'}
+}
+
+# Filtered clip formats (see clip_filter.py)
+CLIP_FORMATS = {
+    'webp': {'extension': 'webp', 'mime_type': 'image/webp'},
+    'gif': {'extension': 'gif', 'mime_type': 'image/gif'},
+    'mp4': {'extension': 'mp4', 'mime_type': 'video/mp4'}
+}
+
+
+class OutputFormat:
+    """How filtered images are encoded (plain attributes, so it can be sent to worker processes)"""
+
+    def __init__(self, format=None, quality=None, progressive=None):
+        """
+        Initialize the output format
+
+        Args:
+            format (str): 'jpeg' or 'webp' (default: CHAT_FILTER_FORMAT, jpeg)
+            quality (int): Encoder quality 1-100 (default: CHAT_FILTER_OUTPUT_QUALITY, 90)
+            progressive (bool): Progressive JPEG, ignored for WebP (default: CHAT_FILTER_PROGRESSIVE)
+        """
+        format = (format or os.environ.get('CHAT_FILTER_FORMAT', 'jpeg')).lower()
+        format = 'jpeg' if format == 'jpg' else format
+        if format not in FORMATS:
+            raise ValueError(f"Unknown output format '{format}', expected one of {', '.join(FORMATS)}")
+        quality = int(os.environ.get('CHAT_FILTER_OUTPUT_QUALITY', '90') if quality is None else quality)
+        if not 1 <= quality <= 100:
+            raise ValueError(f'Output quality must be between 1 and 100, got {quality}')
+        if progressive is None:
+            progressive = os.environ.get('CHAT_FILTER_PROGRESSIVE', '0') == '1'
+
+        self.format = format
+        self.quality = quality
+        self.progressive = bool(progressive) and format == 'jpeg'
+
+    @property
+    def extension(self):
+        return FORMATS[self.format]['extension']
+
+    @property
+    def mime_type(self):
+        return FORMATS[self.format]['mime_type']
+
+    def key(self):
+        """Settings string for cache keys"""
+        return f'{self.format}:{self.quality}:{int(self.progressive)}'
+
+    def encode(self, image):
+        """Encoded bytes of a BGR frame"""
+        import cv2
+        if self.format == 'webp':
+            params = [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        else:
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.quality, cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive)]
+        ok, buffer = cv2.imencode(f'.{self.extension}', image, params)
+        if not ok:
+            raise RuntimeError(f'Could not encode image as {self.format}')
+        return buffer.tobytes()
+
+    def data_url(self, data):
+        """Encoded bytes as a data: URL for the browser"""
+        return f'data:{self.mime_type};base64,' + base64.b64encode(data).decode('ascii')
+
+    def __repr__(self):
+        return f'OutputFormat({self.key()})'
+
+
+def mime_type_for(filename):
+    """MIME type of a file written in one of the output or clip formats, or None"""
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    for info in list(FORMATS.values()) + list(CLIP_FORMATS.values()):
+        if info['extension'] == extension:
+            return info['mime_type']
+    return None
+
+
+class AsyncFileWriter:
+    """
+    Writes files on a background thread so request threads never wait for the disk
+
+    Files are readable through read() from the moment they are queued until they are on
+    disk, so a URL can be handed out before the write finishes. When more than
+    max_pending_bytes are queued, write() writes directly instead of queueing more.
+    """
+
+    def __init__(self, max_pending_bytes=64 * 1024 * 1024):
+        """
+        Initialize the writer (the thread starts on the first write)
+
+        Args:
+            max_pending_bytes (int): Bytes queued before writes block the caller
+        """
+        self.max_pending_bytes = max_pending_bytes
+        self._pending = {}
+        self._pending_bytes = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._thread = None
+        self.stats = {'background': 0, 'direct': 0, 'error': 0}
+
+    def write(self, path, data):
+        """Queue data to be written to path (parent directories must exist)"""
+        with self._lock:
+            previous = self._pending.pop(path, None)
+            if previous is not None:
+                self._pending_bytes -= len(previous)
+            direct = self._pending_bytes + len(data) > self.max_pending_bytes
+            if not direct:
+                self._pending[path] = data
+                self._pending_bytes += len(data)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='image-writer', daemon=True)
+                    self._thread.start()
+            elif previous is not None:
+                self._idle.notify_all()
+        if direct:
+            self._write(path, data, 'direct')
+        else:
+            self._queue.put(path)
+
+    def read(self, path):
+        """Bytes of a file still waiting to be written, or None"""
+        with self._lock:
+            return self._pending.get(path)
+
+    def flush(self, timeout=None):
+        """Wait until every queued file is on disk; False if the timeout ran out first"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def _run(self):
+        """Writer thread: write queued files in order"""
+        while True:
+            path = self._queue.get()
+            with self._lock:
+                data = self._pending.get(path)
+            if data is None:
+                # Written already by an earlier entry for the same path
+                continue
+            self._write(path, data, 'background')
+            with self._idle:
+                if self._pending.get(path) is data:
+                    del self._pending[path]
+                    self._pending_bytes -= len(data)
+                self._idle.notify_all()
+
+    def _write(self, path, data, outcome):
+        """Write through a temporary file so readers never see a partial image"""
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except OSError as e:
+            print(f"⚠ Could not write {path}: {e}")
+            outcome = 'error'
+        with self._lock:
+            self.stats[outcome] += 1
+        IMAGE_WRITES.inc(outcome=outcome)
+
+    def get_stats(self):
+        """Files written and bytes still queued"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({'pending': len(self._pending), 'pending_bytes': self._pending_bytes})
+        return stats
+
+
+# Shared writer used by the Flask routes and the camera filter
+file_writer = AsyncFileWriter()
+atexit.register(file_writer.flush, 5.0)
+
+registry.gauge('chat_image_writer_pending_bytes', 'Bytes of filtered images waiting to be written',
+               callback=lambda: file_writer.get_stats()['pending_bytes'])
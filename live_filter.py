@@ -0,0 +1,223 @@
+"""
+Live Video Mood Filter for ChatApp
+Browser camera frames arrive over Socket.IO and are filtered with the fastest preset;
+only the newest frame waits, so latency never grows with a backlog
+"""
+
+import os
+import threading
+import time
+
+from filter_workers import FilterPoolBusy
+from image_output import OutputFormat
+from metrics import registry
+
+LIVE_FILTER_FRAMES = registry.counter(
+    'chat_live_filter_frames_total', 'Live filter frames by outcome (filtered, dropped, rejected, error)', ['outcome'])
+LIVE_FILTER_LATENCY_SECONDS = registry.histogram(
+    'chat_live_filter_latency_seconds', 'Time from a live frame reaching the server to its filtered frame')
+
+# Live sessions allowed per filter worker (CHAT_LIVE_SESSIONS_PER_WORKER)
+SESSIONS_PER_WORKER = int(os.environ.get('CHAT_LIVE_SESSIONS_PER_WORKER', '2'))
+
+# Frame sizes a session steps between as load changes, largest first
+LIVE_SIDES = (480, 360, 240)
+LIVE_QUALITY = 'fast'
+LIVE_OUTPUT_QUALITY = 70
+MAX_TARGET_FPS = 30
+MAX_FRAME_BYTES = 1024 * 1024
+
+# Weight of the newest sample in the moving averages
+_SMOOTHING = 0.2
+
+# Frames filtered before a session adapts (the first ones include worker start-up)
+_WARM_UP_FRAMES = 3
+
+
+class LiveFilterLimit(Exception):
+    """Raised when every live session slot is taken"""
+
+
+class LiveFilterSession:
+    """One browser streaming frames: the newest unfiltered frame and throughput estimates"""
+
+    def __init__(self, sid, user_id, style, target_fps):
+        self.sid = sid
+        self.user_id = str(user_id)
+        self.style = style
+        self.target_fps = target_fps
+        self.side_index = 0
+        self.in_flight = False
+        self.pending = None  # (seq, data, received) of the newest frame not yet submitted
+        self.quantizer_state = None  # Palette state of the last filtered frame, sent with the next
+        self.worker_seconds = None
+        self.latency = None
+        self.started = time.time()
+        self.stats = {'received': 0, 'filtered': 0, 'dropped': 0, 'rejected': 0, 'error': 0}
+
+    @property
+    def max_side(self):
+        return LIVE_SIDES[self.side_index]
+
+    def to_dict(self, fps=None):
+        """Session state as sent to the browser"""
+        return {
+            'style': self.style,
+            'target_fps': self.target_fps,
+            'fps': fps if fps is not None else self.target_fps,
+            'max_side': self.max_side,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            **self.stats
+        }
+
+
+class LiveFilterManager:
+    """Runs live filter sessions through the worker pool with a hard cap on sessions"""
+
+    def __init__(self, pool, emit, sessions_per_worker=SESSIONS_PER_WORKER):
+        """
+        Initialize the live filter manager
+
+        Args:
+            pool (FilterWorkerPool): Worker pool that runs the filter
+            emit (callable): emit(sid, event, payload) sends an event to one socket
+            sessions_per_worker (int): Live sessions allowed per worker process
+        """
+        self.pool = pool
+        self.emit = emit
+        self.max_sessions = pool.max_workers * sessions_per_worker
+        self.output = OutputFormat('jpeg', LIVE_OUTPUT_QUALITY)
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def start(self, sid, user_id, style, target_fps=12):
+        """
+        Start streaming for a socket (restarting it if it was streaming already)
+
+        Raises:
+            LiveFilterLimit: When max_sessions are running
+        """
+        target_fps = max(1, min(MAX_TARGET_FPS, int(target_fps or 12)))
+        with self._lock:
+            self.sessions.pop(sid, None)
+            if len(self.sessions) >= self.max_sessions:
+                raise LiveFilterLimit(f'All {self.max_sessions} live filter slots are in use, please try again later')
+            session = self.sessions[sid] = LiveFilterSession(sid, user_id, style, target_fps)
+        print(f"✓ Live filter started for user {user_id} ({style}, {target_fps} fps)")
+        return session
+
+    def stop(self, sid):
+        """End a socket's session; a frame still in a worker is discarded when it returns"""
+        with self._lock:
+            session = self.sessions.pop(sid, None)
+        if session is not None:
+            print(f"Live filter stopped for user {session.user_id} after {session.stats['filtered']} frames")
+        return session
+
+    def set_style(self, sid, style):
+        """Switch the style of a running session"""
+        session = self.sessions.get(sid)
+        if session is not None:
+            session.style = style
+        return session
+
+    def submit_frame(self, sid, seq, data):
+        """
+        Accept an encoded camera frame
+
+        The frame replaces any frame of the session still waiting, so at most one frame
+        per session is in a worker and one waits behind it.
+        """
+        session = self.sessions.get(sid)
+        if session is None or not data or len(data) > MAX_FRAME_BYTES:
+            return False
+        with self._lock:
+            session.stats['received'] += 1
+            if session.pending is not None:
+                session.stats['dropped'] += 1
+                LIVE_FILTER_FRAMES.inc(outcome='dropped')
+            session.pending = (seq, data, time.time())
+        self._dispatch(session)
+        return True
+
+    def _dispatch(self, session):
+        """Send the session's newest frame to a worker if it has none there"""
+        with self._lock:
+            if session.in_flight or session.pending is None or self.sessions.get(session.sid) is not session:
+                return
+            seq, data, received = session.pending
+            session.pending = None
+            session.in_flight = True
+        try:
+            # Never wait for a slot: a newer frame will be along before one frees up
+            future = self.pool.submit_stream_frame(data, session.style, session.quantizer_state, LIVE_QUALITY,
+                                                   max_side=session.max_side, output=self.output,
+                                                   admission_timeout=0)
+        except FilterPoolBusy:
+            with self._lock:
+                session.in_flight = False
+                session.stats['rejected'] += 1
+                status = {'seq': seq, **session.to_dict(self._adapt(session, overloaded=True))}
+            LIVE_FILTER_FRAMES.inc(outcome='rejected')
+            # No result is coming for this frame, so tell the browser to slow down now
+            self.emit(session.sid, 'live_filter_status', status)
+            return
+        future.add_done_callback(lambda done: self._frame_done(session, seq, received, done))
+
+    def _frame_done(self, session, seq, received, future):
+        """Worker callback: send the filtered frame back, then start on the newest one"""
+        failed = future.cancelled() or future.exception() is not None
+        with self._lock:
+            session.in_flight = False
+            active = self.sessions.get(session.sid) is session
+            if failed:
+                session.stats['error'] += 1
+            elif active:
+                # The palette state is saved before the next frame can be dispatched with it
+                (frame, session.quantizer_state), worker_seconds = future.result()
+                latency = time.time() - received
+                session.worker_seconds = self._average(session.worker_seconds, worker_seconds)
+                session.latency = self._average(session.latency, latency)
+                session.stats['filtered'] += 1
+                result = {'seq': seq, 'frame': frame, **session.to_dict(self._adapt(session))}
+        if failed:
+            LIVE_FILTER_FRAMES.inc(outcome='error')
+        elif active:
+            LIVE_FILTER_FRAMES.inc(outcome='filtered')
+            LIVE_FILTER_LATENCY_SECONDS.observe(latency)
+            self.emit(session.sid, 'live_filter_result', result)
+        if active:
+            self._dispatch(session)
+
+    @staticmethod
+    def _average(current, sample):
+        return sample if current is None else current + _SMOOTHING * (sample - current)
+
+    def _adapt(self, session, overloaded=False):
+        """
+        Frame rate the browser should send at, stepping the frame size to match
+
+        Workers are shared by every session, so a session can count on its share of them.
+        When that share cannot keep up with half the target rate the frame size steps
+        down; once it could handle twice the target it steps back up.
+        """
+        if overloaded:
+            session.side_index = min(session.side_index + 1, len(LIVE_SIDES) - 1)
+            return max(1, session.target_fps // 2)
+        if not session.worker_seconds or session.stats['filtered'] < _WARM_UP_FRAMES:
+            return session.target_fps
+        share = self.pool.max_workers / max(1, len(self.sessions))
+        sustainable = share / session.worker_seconds
+        if sustainable < session.target_fps / 2 and session.side_index < len(LIVE_SIDES) - 1:
+            session.side_index += 1
+            session.worker_seconds = None
+        elif sustainable > session.target_fps * 2 and session.side_index > 0:
+            session.side_index -= 1
+            session.worker_seconds = None
+        return max(1, min(session.target_fps, round(sustainable, 1)))
+
+    def get_status(self):
+        """Running sessions and the cap"""
+        with self._lock:
+            sessions = [dict(session.to_dict(), user_id=session.user_id) for session in self.sessions.values()]
+        return {'max_sessions': self.max_sessions, 'active': len(sessions), 'sessions': sessions}
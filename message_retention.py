@@ -0,0 +1,305 @@
+"""
+Retention and Archival for Private Messages
+Moves old private messages into an archive database in small batches and keeps the hot database compact
+
+Freed pages are only returned to the filesystem once the hot database uses incremental
+auto-vacuum. Switching an existing database needs one full VACUUM, which locks it for the
+whole rewrite, so it is a one-off migration run while the app is stopped:
+
+    python message_retention.py --enable-incremental-vacuum --db chat_app.db
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+ARCHIVE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS archive.private_messages (
+        id INTEGER PRIMARY KEY,
+        sender_id INTEGER NOT NULL,
+        sender_username TEXT NOT NULL,
+        recipient_username TEXT NOT NULL,
+        message TEXT NOT NULL,
+        message_type TEXT DEFAULT 'text',
+        extra_data TEXT,
+        timestamp DATETIME
+    )
+'''
+
+ARCHIVE_INDEX = '''
+    CREATE INDEX IF NOT EXISTS archive.idx_archived_conversation
+    ON private_messages (sender_username, recipient_username, timestamp)
+'''
+
+MESSAGE_COLUMNS = 'id, sender_id, sender_username, recipient_username, message, message_type, extra_data, timestamp'
+
+
+class MessageRetention:
+    """Tiered retention engine for the private_messages table"""
+
+    def __init__(self, db_path='chat_app.db', archive_path='chat_archive.db', max_age_days=90,
+                 batch_size=500, batch_sleep=0.05, vacuum_pages=256, interval=24 * 60 * 60):
+        """
+        Initialize the retention engine
+
+        Args:
+            db_path (str): Hot chat database
+            archive_path (str): Archive database file, attached only while in use
+            max_age_days (int): Messages older than this are moved to the archive
+            batch_size (int): Rows moved per transaction
+            batch_sleep (float): Seconds to pause between batches so chat writes can get in
+            vacuum_pages (int): Free pages released per incremental_vacuum call
+            interval (int): Seconds between scheduled retention runs
+        """
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self.batch_sleep = batch_sleep
+        self.vacuum_pages = vacuum_pages
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.status = {
+            'state': 'idle',
+            'last_run': None,
+            'last_moved': 0,
+            'total_moved': 0,
+            'last_pages_freed': 0,
+            'last_error': None
+        }
+
+    def _connect(self):
+        """Open a connection to the hot database"""
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _attach_archive(self, conn):
+        """Attach the archive database and make sure its schema exists"""
+        conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+        conn.execute(ARCHIVE_SCHEMA)
+        conn.execute(ARCHIVE_INDEX)
+
+    def incremental_vacuum_enabled(self):
+        """Check whether the hot database uses incremental auto-vacuum (a cheap header read)"""
+        conn = self._connect()
+        try:
+            return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        finally:
+            conn.close()
+
+    def ensure_incremental_vacuum(self):
+        """
+        Switch the hot database to incremental auto-vacuum
+
+        The first time this runs a full VACUUM, which blocks every other connection until
+        the database is rewritten; run it as a migration, not at startup.
+        """
+        conn = self._connect()
+        try:
+            mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            if mode != 2:
+                print("Enabling incremental auto-vacuum on chat database...")
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+                print("✓ Incremental auto-vacuum enabled")
+        finally:
+            conn.close()
+
+    def archive_old_messages(self):
+        """Move expired messages to the archive and release freed pages"""
+        if not self._lock.acquire(blocking=False):
+            return {'success': False, 'message': 'Retention already running'}
+
+        cutoff = (datetime.now() - timedelta(days=self.max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+        moved = 0
+        batches = 0
+        conn = None
+
+        try:
+            self.status['state'] = 'running'
+            conn = self._connect()
+            conn.isolation_level = None  # Explicit transactions per batch
+
+            has_table = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'private_messages'"
+            ).fetchone()
+            if not has_table:
+                self.status['state'] = 'idle'
+                return {'success': True, 'moved': 0, 'batches': 0, 'pages_freed': 0}
+
+            self._attach_archive(conn)
+
+            while not self._stop_event.is_set():
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('''
+                    SELECT MAX(id), COUNT(*) FROM (
+                        SELECT id FROM main.private_messages
+                        WHERE timestamp < ?
+                        ORDER BY id
+                        LIMIT ?
+                    )
+                ''', (cutoff, self.batch_size)).fetchone()
+                last_id, count = row
+                if not count:
+                    conn.execute('COMMIT')
+                    break
+
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO archive.private_messages ({MESSAGE_COLUMNS})
+                    SELECT {MESSAGE_COLUMNS} FROM main.private_messages
+                    WHERE id <= ? AND timestamp < ?
+                ''', (last_id, cutoff))
+                conn.execute('''
+                    DELETE FROM main.private_messages
+                    WHERE id <= ? AND timestamp < ?
+                ''', (last_id, cutoff))
+                conn.execute('COMMIT')
+
+                moved += count
+                batches += 1
+                time.sleep(self.batch_sleep)
+
+            conn.execute('DETACH DATABASE archive')
+            pages_freed = self.incremental_vacuum(conn)
+
+            self.status.update({
+                'state': 'idle',
+                'last_run': datetime.now().isoformat(),
+                'last_moved': moved,
+                'total_moved': self.status['total_moved'] + moved,
+                'last_pages_freed': pages_freed,
+                'last_error': None
+            })
+            if moved:
+                print(f"✓ Archived {moved} private messages in {batches} batches, freed {pages_freed} pages")
+
+            return {'success': True, 'moved': moved, 'batches': batches, 'pages_freed': pages_freed}
+
+        except Exception as e:
+            print(f"Message retention failed: {e}")
+            if conn is not None and conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self.status['state'] = 'failed'
+            self.status['last_error'] = str(e)
+            return {'success': False, 'message': f'Retention failed: {str(e)}', 'moved': moved}
+
+        finally:
+            if conn is not None:
+                conn.close()
+            self._lock.release()
+
+    def incremental_vacuum(self, conn):
+        """Release free pages in small steps and return how many were freed"""
+        freed = 0
+        while not self._stop_event.is_set():
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free_pages == 0:
+                break
+            conn.execute(f'PRAGMA incremental_vacuum({self.vacuum_pages})').fetchall()
+            remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if remaining >= free_pages:
+                # auto_vacuum is not incremental on this database
+                break
+            freed += free_pages - remaining
+            time.sleep(self.batch_sleep)
+        return freed
+
+    def get_archived_history(self, user1, user2, before=None, limit=50):
+        """Get archived messages between two users for scrollback, oldest first"""
+        if not os.path.exists(self.archive_path):
+            return []
+
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            self._attach_archive(conn)
+            query = '''
+                SELECT sender_username, recipient_username, message, message_type, extra_data,
+                       strftime('%H:%M:%S', timestamp) as time, timestamp
+                FROM archive.private_messages
+                WHERE ((sender_username = ? AND recipient_username = ?)
+                    OR (sender_username = ? AND recipient_username = ?))
+            '''
+            params = [user1, user2, user2, user1]
+            if before:
+                query += ' AND timestamp < ?'
+                params.append(before)
+            query += ' ORDER BY timestamp DESC LIMIT ?'
+            params.append(limit)
+
+            messages = conn.execute(query, params).fetchall()
+            conn.execute('DETACH DATABASE archive')
+        finally:
+            conn.close()
+
+        return [
+            {
+                'sender': msg['sender_username'],
+                'recipient': msg['recipient_username'],
+                'message': msg['message'],
+                'type': msg['message_type'],
+                'timestamp': msg['time'],
+                'extra_data': msg['extra_data'],
+                'archived_at': msg['timestamp']
+            }
+            for msg in reversed(messages)
+        ]
+
+    def _run_scheduler(self):
+        """Scheduler loop for the background thread"""
+        while not self._stop_event.wait(self.interval):
+            self.archive_old_messages()
+
+    def start(self):
+        """Start scheduled retention runs in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_scheduler, name='message-retention', daemon=True)
+        self._thread.start()
+        print(f"✓ Private messages older than {self.max_age_days} days will be archived to {self.archive_path}")
+        if os.path.exists(self.db_path) and not self.incremental_vacuum_enabled():
+            print(f"⚠ {self.db_path} does not use incremental auto-vacuum, so archived messages will not "
+                  f"shrink it; stop the app and run: python message_retention.py --enable-incremental-vacuum "
+                  f"--db {self.db_path}")
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get_status(self):
+        """Get a copy of the current retention status"""
+        return dict(self.status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Private message retention maintenance')
+    parser.add_argument('--db', default='chat_app.db', help='Hot chat database (default: chat_app.db)')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='Switch the database to incremental auto-vacuum with one full VACUUM '
+                             '(stop the app first: the VACUUM locks the database until it finishes)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"No database at {args.db}")
+    retention = MessageRetention(args.db)
+    if args.enable_incremental_vacuum:
+        if retention.incremental_vacuum_enabled():
+            print(f"✓ {args.db} already uses incremental auto-vacuum")
+        else:
+            retention.ensure_incremental_vacuum()
+    else:
+        state = 'enabled' if retention.incremental_vacuum_enabled() else 'not enabled'
+        print(f"Incremental auto-vacuum is {state} on {args.db}")
+
+
+if __name__ == '__main__':
+    main()
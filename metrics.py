@@ -0,0 +1,316 @@
+"""
+Lightweight Metrics Registry for ChatApp
+Counters, gauges and histograms rendered in the Prometheus text exposition format
+"""
+
+import bisect
+import inspect
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Latency buckets in seconds, from sub-millisecond DB calls to multi-second filters
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects"""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    """Build the {name="value"} label block for a sample"""
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        """Turn keyword labels into a tuple key in declared order"""
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, labelvalues, extra_label, value) tuples"""
+        return []
+
+    def render(self):
+        """Render HELP, TYPE and all samples"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        for suffix, labelvalues, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, labelvalues, extra)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        """Increase the counter"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """Current value for one label set"""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [('', key, None, value) for key, value in sorted(items)]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or is read from a callback at scrape time"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._callback = callback
+
+    def set(self, value, **labels):
+        """Set the gauge"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        """Increase the gauge"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """Decrease the gauge"""
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        """Current value for one label set"""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        if self._callback is not None:
+            try:
+                return [('', (), None, float(self._callback()))]
+            except Exception as e:
+                print(f"Metrics callback for {self.name} failed: {e}")
+                return []
+        with self._lock:
+            items = list(self._values.items())
+        return [('', key, None, value) for key, value in sorted(items)]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # {labels: [bucket counts..., sum, count]}
+
+    def observe(self, value, **labels):
+        """Record one observation"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 3)
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Context manager that observes the elapsed wall time"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels):
+        """Number of observations for one label set"""
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0
+
+    def get_sum(self, **labels):
+        """Sum of observations for one label set"""
+        state = self._values.get(self._key(labels))
+        return state[-2] if state else 0.0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        samples = []
+        for key, state in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                samples.append(('_bucket', key, ('le', _format_value(bound)), cumulative))
+            samples.append(('_sum', key, None, state[-2]))
+            samples.append(('_count', key, None, state[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together at /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Get or create a counter"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        """Get or create a gauge"""
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        """Look up a registered metric by name"""
+        return self._metrics.get(name)
+
+    def render(self):
+        """Render every metric in the text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# Shared registry used by the app, the data layer and the AI modules
+registry = MetricsRegistry()
+
+DB_QUERY_SECONDS = registry.histogram(
+    'chat_db_query_duration_seconds', 'SQLite statement latency by operation', ['operation'])
+
+FILTER_STAGE_SECONDS = registry.histogram(
+    'anime_filter_stage_duration_seconds', 'Anime mood filter latency per pipeline stage', ['style', 'stage'])
+
+FILTER_ROI_SAVED_SECONDS = registry.counter(
+    'anime_filter_roi_saved_seconds_total',
+    'Estimated filter time saved by running the background of face photos at a cheaper preset', ['style'])
+
+EMOTION_STAGE_SECONDS = registry.histogram(
+    'emotion_detector_stage_duration_seconds', 'Emotion detector latency per stage', ['detector', 'stage'])
+
+
+def timed_handler(histogram, counter, **labels):
+    """Decorator that counts calls and observes latency, labelling failures"""
+    def decorator(func):
+        # Drop surplus positional arguments the way a direct call would reject them,
+        # so callers that probe with optional arguments (Socket.IO connect/disconnect) still work
+        parameters = inspect.signature(func).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+            max_args = None
+        else:
+            max_args = sum(1 for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            start = time.perf_counter()
+            outcome = 'success'
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                outcome = 'error'
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+                counter.inc(outcome=outcome, **labels)
+        return wrapper
+    return decorator
+
+
+def _sql_operation(sql):
+    """First keyword of a statement, used as a low-cardinality label"""
+    parts = sql.lstrip().split(None, 1)
+    return parts[0].upper() if parts else 'UNKNOWN'
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records statement latency"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, operation=_sql_operation(sql))
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, operation=_sql_operation(sql))
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection factory whose statements are timed (use with sqlite3.connect(factory=...))"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, operation='COMMIT')
@@ -0,0 +1,189 @@
+"""
+SQLite Slow-Query Tracer
+Opt-in tracing of slow statements with bound-parameter shapes and a one-time EXPLAIN QUERY PLAN per statement
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from metrics import TimedConnection, TimedCursor
+
+# Only these statements can be explained
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+
+def normalize_sql(sql):
+    """Collapse whitespace so the same statement from different call sites groups together"""
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def redact_literals(sql):
+    """Replace string literals in expanded SQL so message text never reaches the debug page"""
+    return re.sub(r"'(?:[^']|'')*'", "'?'", sql)
+
+
+def parameter_shape(parameters):
+    """Describe bound parameters by type only, never by value"""
+    if parameters is None:
+        return '()'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{name}: {type(value).__name__}' for name, value in sorted(parameters.items())) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+
+
+class QueryTracer:
+    """Collects statements slower than a threshold, grouped by normalized SQL"""
+
+    def __init__(self, threshold_ms=50.0, enabled=False, max_statements=500, explain=True):
+        """
+        Initialize the tracer
+
+        Args:
+            threshold_ms (float): Statements at or above this latency are recorded
+            enabled (bool): Tracing is opt-in; disabled tracers record nothing
+            max_statements (int): Cap on distinct statements kept
+            explain (bool): Capture EXPLAIN QUERY PLAN for each distinct slow statement
+        """
+        self.threshold = threshold_ms / 1000.0
+        self.enabled = enabled
+        self.max_statements = max_statements
+        self.explain = explain
+        self._statements = {}
+        self._lock = threading.Lock()
+        self._connection_class = None
+
+    def enable(self, threshold_ms=None):
+        """Start recording slow statements"""
+        if threshold_ms is not None:
+            self.threshold = threshold_ms / 1000.0
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording"""
+        self.enabled = False
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self._statements.clear()
+
+    def connection_factory(self):
+        """Connection class to pass to sqlite3.connect(factory=...)"""
+        if self._connection_class is None:
+            self._connection_class = self._build_connection_class()
+        return self._connection_class
+
+    def _build_connection_class(self):
+        """Build cursor and connection classes bound to this tracer"""
+        tracer = self
+
+        class TracingCursor(TimedCursor):
+            """Timed cursor that reports slow statements to the tracer"""
+
+            def execute(self, sql, parameters=()):
+                start = time.perf_counter()
+                result = super().execute(sql, parameters)
+                tracer.record(self.connection, sql, parameters, time.perf_counter() - start)
+                return result
+
+            def executemany(self, sql, seq_of_parameters):
+                seq_of_parameters = list(seq_of_parameters)
+                start = time.perf_counter()
+                result = super().executemany(sql, seq_of_parameters)
+                sample = seq_of_parameters[0] if seq_of_parameters else ()
+                tracer.record(self.connection, sql, sample, time.perf_counter() - start)
+                return result
+
+        class TracingConnection(TimedConnection):
+            """Timed connection that traces every statement SQLite runs"""
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.traced_statements = []
+                # Expanded statements as SQLite runs them, including ones from executescript
+                self.set_trace_callback(self._on_trace)
+
+            def _on_trace(self, statement):
+                if len(self.traced_statements) > 20:
+                    del self.traced_statements[0]
+                self.traced_statements.append(statement)
+
+            def cursor(self, factory=TracingCursor):
+                return super().cursor(factory)
+
+        return TracingConnection
+
+    def record(self, conn, sql, parameters, elapsed):
+        """Record one execution if tracing is on and it was slow"""
+        if not self.enabled or elapsed < self.threshold:
+            return
+
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    return
+                entry = self._statements[key] = {
+                    'sql': key,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'parameter_shapes': [],
+                    'sample_statement': None,
+                    'query_plan': None,
+                    'full_scan': None
+                }
+                needs_plan = self.explain
+            else:
+                needs_plan = False
+
+            entry['count'] += 1
+            entry['total_ms'] += elapsed * 1000.0
+            entry['max_ms'] = max(entry['max_ms'], elapsed * 1000.0)
+            shape = parameter_shape(parameters)
+            if shape not in entry['parameter_shapes'] and len(entry['parameter_shapes']) < 5:
+                entry['parameter_shapes'].append(shape)
+            traced = getattr(conn, 'traced_statements', None)
+            if traced:
+                entry['sample_statement'] = redact_literals(traced[-1])
+
+        if needs_plan:
+            plan = self.explain_query_plan(conn, sql, parameters)
+            with self._lock:
+                entry['query_plan'] = plan
+                entry['full_scan'] = any(
+                    step.startswith('SCAN ') and 'USING' not in step for step in plan
+                ) if plan else None
+
+    def explain_query_plan(self, conn, sql, parameters):
+        """Run EXPLAIN QUERY PLAN for a statement and return the plan steps"""
+        parts = sql.lstrip().split(None, 1)
+        if not parts or parts[0].upper() not in EXPLAINABLE:
+            return []
+        # A plain cursor, so explaining is not itself timed or recorded
+        cursor = sqlite3.Cursor(conn)
+        try:
+            rows = cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+            return [row[-1] for row in rows]
+        except Exception as e:
+            return [f'EXPLAIN failed: {e}']
+        finally:
+            cursor.close()
+
+    def top_statements(self, limit=20, order_by='total_ms'):
+        """Slow statements sorted by total (or max) time, slowest first"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._statements.values()]
+        for entry in entries:
+            entry['avg_ms'] = entry['total_ms'] / entry['count'] if entry['count'] else 0.0
+        entries.sort(key=lambda entry: entry.get(order_by, 0), reverse=True)
+        return entries[:limit]
+
+
+# Shared tracer; opt in with CHAT_SQL_TRACE=1 and set the threshold with CHAT_SQL_TRACE_MS
+tracer = QueryTracer(threshold_ms=float(os.environ.get('CHAT_SQL_TRACE_MS', '50')),
+                     enabled=os.environ.get('CHAT_SQL_TRACE') == '1')
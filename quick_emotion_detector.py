@@ -8,6 +8,7 @@ import random
 import os
 import time
 from datetime import datetime
+from metrics import EMOTION_STAGE_SECONDS
 
 class QuickEmotionDetector:
     """Quick emotion detector with immediate capture"""
@@ -102,8 +103,9 @@ class QuickEmotionDetector:
                 
                 # Detect faces for feedback
                 try:
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+                    with EMOTION_STAGE_SECONDS.time(detector='quick', stage='face_detection'):
+                        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                        faces = self.face_cascade.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
                     
                     for (x, y, w, h) in faces:
                         cv2.rectangle(display_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
@@ -3,11 +3,12 @@
 Run script for Real-Time Chat Website
 """
 
-from app import app, socketio, init_db, EMOTION_AVAILABLE
+from app import app, socketio, init_db, start_background_jobs, EMOTION_AVAILABLE
 
 if __name__ == '__main__':
     # Initialize database
     init_db()
+    start_background_jobs()
     
     print("=" * 50)
     print("🚀 Real-Time Chat Website Starting...")
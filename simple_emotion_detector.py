@@ -9,6 +9,7 @@ import time
 import random
 import os
 from datetime import datetime
+from metrics import EMOTION_STAGE_SECONDS
 
 class EmotionDetector:
     """Simplified emotion detection system"""
@@ -120,13 +121,14 @@ class EmotionDetector:
                     # Check for faces every 10 frames to reduce processing load
                     if frame_count - last_face_check > 10:
                         try:
-                            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                            faces = self.face_cascade.detectMultiScale(
-                                gray, 
-                                scaleFactor=1.1, 
-                                minNeighbors=5, 
-                                minSize=(30, 30)
-                            )
+                            with EMOTION_STAGE_SECONDS.time(detector='simple', stage='face_detection'):
+                                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                                faces = self.face_cascade.detectMultiScale(
+                                    gray, 
+                                    scaleFactor=1.1, 
+                                    minNeighbors=5, 
+                                    minSize=(30, 30)
+                                )
                             last_face_check = frame_count
                         except Exception as e:
                             print(f"Face detection error: {e}")
@@ -244,8 +246,9 @@ class EmotionDetector:
     def _capture_emotion(self, frame):
         """Helper method to capture and process emotion"""
         # Simulate emotion detection
-        emotion = random.choice(self.emotions)
-        confidence = random.uniform(75.0, 95.0)
+        with EMOTION_STAGE_SECONDS.time(detector='simple', stage='analysis'):
+            emotion = random.choice(self.emotions)
+            confidence = random.uniform(75.0, 95.0)
         
         # Save captured image
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -254,7 +257,8 @@ class EmotionDetector:
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         
         try:
-            cv2.imwrite(filepath, frame)
+            with EMOTION_STAGE_SECONDS.time(detector='simple', stage='save'):
+                cv2.imwrite(filepath, frame)
             print(f"Image saved: {filepath}")
         except Exception as e:
             print(f"Warning: Could not save image: {e}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Startup Import-Time Report for ChatApp
+Imports app.py under `python -X importtime`, lists the slowest imports and checks them against a startup budget
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must stay out of the startup path (they load lazily or in the warm-up thread)
+HEAVY_MODULES = ['cv2', 'numpy', 'bcrypt', 'tensorflow', 'deepface', 'PIL',
+                 'anime_mood_filter', 'emotion_detector', 'simple_emotion_detector']
+
+DEFAULT_BUDGET_MS = 1500
+
+
+def measure_imports(module='app', python=sys.executable):
+    """Import a module in a fresh interpreter and parse the -X importtime output"""
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=project_dir, capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+
+    imports = []
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            imports.append({
+                'module': name.strip(),
+                'depth': (len(name) - len(name.lstrip())) // 2,
+                'self_ms': int(self_us) / 1000.0,
+                'cumulative_ms': int(cumulative_us) / 1000.0
+            })
+        except ValueError:
+            continue
+    return imports
+
+
+def build_report(imports, module='app', budget_ms=DEFAULT_BUDGET_MS, top=15):
+    """Summarize the import timings and check them against the budget"""
+    loaded = {entry['module'] for entry in imports}
+    total_ms = next((entry['cumulative_ms'] for entry in imports if entry['module'] == module), 0.0)
+    heavy_loaded = [name for name in HEAVY_MODULES if name in loaded]
+
+    return {
+        'module': module,
+        'total_ms': total_ms,
+        'budget_ms': budget_ms,
+        'within_budget': total_ms <= budget_ms and not heavy_loaded,
+        'heavy_modules_loaded': heavy_loaded,
+        'slowest': sorted(imports, key=lambda entry: entry['cumulative_ms'], reverse=True)[:top]
+    }
+
+
+def print_report(report):
+    """Print the report in the same style as the other ChatApp scripts"""
+    print("=" * 60)
+    print(f"⏱  Startup import report for {report['module']}.py")
+    print("=" * 60)
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for entry in report['slowest']:
+        print(f"{entry['cumulative_ms']:>10.1f}ms {entry['self_ms']:>8.1f}ms  {'  ' * entry['depth']}{entry['module']}")
+    print("-" * 60)
+    print(f"Total import time: {report['total_ms']:.1f}ms (budget {report['budget_ms']}ms)")
+    if report['heavy_modules_loaded']:
+        print(f"❌ Heavy modules imported at startup: {', '.join(report['heavy_modules_loaded'])}")
+    if report['within_budget']:
+        print("✅ Startup is within budget")
+    else:
+        print("❌ Startup budget exceeded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check app.py import time against a startup budget')
+    parser.add_argument('--module', default='app', help='Module to import (default: app)')
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('CHAT_STARTUP_BUDGET_MS', DEFAULT_BUDGET_MS)),
+                        help='Maximum cumulative import time in milliseconds')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list')
+    args = parser.parse_args()
+
+    report = build_report(measure_imports(args.module), args.module, args.budget_ms, args.top)
+    print_report(report)
+    sys.exit(0 if report['within_budget'] else 1)
+
+
+if __name__ == '__main__':
+    main()
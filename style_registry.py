@@ -0,0 +1,248 @@
+"""
+Anime Style Registry for ChatApp
+Every mood filter style is declared once here: its display text, palette size, grading
+steps and finishing passes. The filter compiles a declaration into a ready-to-run pipeline;
+the web routes, the camera fallback and the fixed-palette quantizer read the same entries.
+More styles can be added from a JSON file (CHAT_STYLES_FILE) without touching the code.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+
+# Point-wise color steps; they run through one 3D LUT on the palette colors
+GRADING_OPERATIONS = {
+    'color_temperature': {'factor': float},
+    'saturation': {'factor': float},
+}
+
+# Position-dependent steps that run on the painted image
+EFFECTS = {
+    'hue_wave': {'amplitude': float, 'frequency': float, 'saturation': float},
+}
+
+# Edge-preserving smoothing backends a style can pick (implemented in edge_smoothing.py)
+SMOOTHING_BACKENDS = ('bilateral', 'bilateral_downsampled', 'guided', 'domain_transform')
+
+# Values a declaration may leave out
+STYLE_DEFAULTS = {
+    'colors': 8,
+    'smoothing': 'bilateral',
+    'grading': [],
+    'effects': [],
+    'image_weight': 0.85,
+    'edge_strength': 0.15,
+    'brightness': 10,
+    'contrast': 1.1,
+    'palette': None,
+}
+
+DEFAULT_STYLE = 'Shinkai'
+
+# The built-in styles, in the order the dashboard lists them. Each smooths with the fastest
+# backend that scores SSIM 0.96 or more against the full-size bilateral on both the max and
+# balanced presets in benchmarks/bench_smoothing.py, without making any preset slower:
+# - Hayao: guided (0.97-0.98; at 720p max drops from about 900ms to 150ms and balanced from
+#   230ms to 140ms)
+# - Shinkai: bilateral (guided reaches only 0.95 on balanced, as its saturated, high-contrast
+#   edges are where the box windows differ most)
+# - Paprika: bilateral (its hue wave turns small smoothing differences into hue shifts, so no
+#   other backend stays above 0.92)
+# The half-size bilateral scores higher but also halves the max preset's smoothing, so max
+# would lose its full-resolution look. The domain transform makes balanced and fast slower.
+BUILTIN_STYLES = {
+    'Shinkai': {
+        'name': 'Makoto Shinkai Style',
+        'label': 'Shinkai Style',
+        'description': 'Vibrant, saturated colors with dramatic lighting',
+        'colors': 8,
+        'smoothing': 'bilateral',
+        'grading': [{'op': 'saturation', 'factor': 1.3}],
+        'image_weight': 0.85,
+        'edge_strength': 0.15,
+        'palette': ['#0b1026', '#1f3b73', '#3f7fd1', '#8fd3f4', '#ffffff', '#f7a072', '#e2557a', '#6a4c93'],
+    },
+    'Hayao': {
+        'name': 'Studio Ghibli Style',
+        'label': 'Hayao (Miyazaki) Style',
+        'description': 'Warm, soft colors inspired by Miyazaki films',
+        'colors': 8,
+        'smoothing': 'guided',
+        'grading': [{'op': 'color_temperature', 'factor': 1.1}],
+        'image_weight': 0.9,
+        'edge_strength': 0.1,
+        'palette': ['#1e2a3a', '#4a6b8a', '#8fc1e3', '#f4ecd8', '#e8b48a', '#a8643c', '#6b8e3d', '#c4d98a'],
+    },
+    'Paprika': {
+        'name': 'Satoshi Kon Style',
+        'label': 'Paprika Style',
+        'description': 'Psychedelic, intense colors with surreal effects',
+        'colors': 12,  # More colors for the psychedelic look
+        'smoothing': 'bilateral',
+        'effects': [{'op': 'hue_wave', 'amplitude': 30, 'frequency': 0.01, 'saturation': 1.4}],
+        'image_weight': 0.8,
+        'edge_strength': 0.2,
+        'palette': ['#120a1f', '#3d1a5b', '#8e2de2', '#ff3cac', '#ff6b35', '#ffd23f', '#f7f4ea',
+                    '#3bceac', '#0ead69', '#2b59c3', '#c0392b', '#f2b5a0'],
+    },
+}
+
+# Extra styles loaded at startup (a JSON object of name -> declaration)
+STYLES_FILE = os.environ.get('CHAT_STYLES_FILE')
+
+
+def _is_hex_color(color):
+    """True for a '#rrggbb' string"""
+    return (isinstance(color, str) and len(color) == 7 and color[0] == '#'
+            and all(c in '0123456789abcdefABCDEF' for c in color[1:]))
+
+
+class StyleRegistry:
+    """Named style declarations, checked when they are registered"""
+
+    def __init__(self, styles=None, path=None):
+        """
+        Initialize the registry
+
+        Args:
+            styles (dict): Declarations to register, name -> declaration
+            path (str): JSON file with more declarations
+        """
+        self._styles = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        for name, definition in (styles or {}).items():
+            self.register(name, definition)
+        if path:
+            self.load_file(path)
+
+    def register(self, name, definition):
+        """
+        Add or replace a style
+
+        Args:
+            name (str): Style id used by the API and the dashboard
+            definition (dict): name, description and optionally label, colors, smoothing, grading,
+                               effects, image_weight, edge_strength, brightness, contrast, palette
+
+        Raises:
+            ValueError: When the declaration is incomplete or names an unknown step
+        """
+        style = self._validate(name, definition)
+        fingerprint = hashlib.sha1(json.dumps(style, sort_keys=True).encode()).hexdigest()[:12]
+        with self._lock:
+            self._styles[name] = style
+            self._fingerprints[name] = fingerprint
+        return style
+
+    def unregister(self, name):
+        """Remove a style; True if it was registered"""
+        with self._lock:
+            self._fingerprints.pop(name, None)
+            return self._styles.pop(name, None) is not None
+
+    def load_file(self, path):
+        """Register every style in a JSON file and return their ids"""
+        with open(path, encoding='utf-8') as f:
+            definitions = json.load(f)
+        if not isinstance(definitions, dict):
+            raise ValueError(f'{path} must hold a JSON object of style name -> declaration')
+        for name, definition in definitions.items():
+            self.register(name, definition)
+        return list(definitions)
+
+    def _validate(self, name, definition):
+        """A complete copy of a declaration with defaults filled in"""
+        if not isinstance(name, str) or not name.isidentifier():
+            raise ValueError(f'Style id {name!r} must be a plain identifier')
+        if not isinstance(definition, dict):
+            raise ValueError(f"Style '{name}' must be declared as a dict")
+        unknown = set(definition) - set(STYLE_DEFAULTS) - {'name', 'label', 'description'}
+        if unknown:
+            raise ValueError(f"Style '{name}' has unknown fields {sorted(unknown)}")
+        for field in ('name', 'description'):
+            if not isinstance(definition.get(field), str) or not definition[field]:
+                raise ValueError(f"Style '{name}' needs a '{field}'")
+
+        style = copy.deepcopy(STYLE_DEFAULTS)
+        style.update(copy.deepcopy(definition))
+        style.setdefault('label', style['name'])
+        if not isinstance(style['colors'], int) or not 2 <= style['colors'] <= 64:
+            raise ValueError(f"Style '{name}' colors must be an integer from 2 to 64")
+        if style['smoothing'] not in SMOOTHING_BACKENDS:
+            raise ValueError(f"Style '{name}' smoothing must be one of {SMOOTHING_BACKENDS}")
+        for field in ('image_weight', 'edge_strength', 'brightness', 'contrast'):
+            if not isinstance(style[field], (int, float)):
+                raise ValueError(f"Style '{name}' {field} must be a number")
+        style['grading'] = [self._validate_step(name, step, GRADING_OPERATIONS) for step in style['grading']]
+        style['effects'] = [self._validate_step(name, step, EFFECTS) for step in style['effects']]
+        palette = style['palette']
+        if palette is not None and not (isinstance(palette, list) and len(palette) >= 2
+                                        and all(_is_hex_color(color) for color in palette)):
+            raise ValueError(f"Style '{name}' palette must be a list of at least two '#rrggbb' colors")
+        return style
+
+    @staticmethod
+    def _validate_step(name, step, operations):
+        """A grading or effect step with every parameter present and numeric"""
+        if not isinstance(step, dict) or step.get('op') not in operations:
+            raise ValueError(f"Style '{name}' step {step!r} must have an 'op' out of {list(operations)}")
+        parameters = operations[step['op']]
+        unknown = set(step) - set(parameters) - {'op'}
+        missing = set(parameters) - set(step)
+        if unknown or missing:
+            raise ValueError(f"Style '{name}' {step['op']} step takes exactly {sorted(parameters)}")
+        for parameter, kind in parameters.items():
+            if not isinstance(step[parameter], (int, float)):
+                raise ValueError(f"Style '{name}' {step['op']} {parameter} must be a number")
+        return {'op': step['op'], **{parameter: kind(step[parameter]) for parameter, kind in parameters.items()}}
+
+    def __contains__(self, name):
+        return name in self._styles
+
+    def __iter__(self):
+        return iter(list(self._styles))
+
+    def __len__(self):
+        return len(self._styles)
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def names(self):
+        """Style ids in registration order"""
+        return list(self._styles)
+
+    def get(self, name):
+        """
+        A style's declaration with defaults filled in (treat it as read-only)
+
+        Raises:
+            KeyError: When no such style is registered
+        """
+        if name not in self._styles:
+            raise KeyError(f"Unknown style '{name}', expected one of {self.names()}")
+        return self._styles[name]
+
+    def resolve(self, name, default=DEFAULT_STYLE):
+        """A requested style id, or the default when it is not registered"""
+        return name if name in self._styles else default
+
+    def fingerprint(self, name):
+        """Short hash of a style's declaration, so caches notice when it changes"""
+        return self._fingerprints.get(name, '')
+
+    def info(self, name):
+        """Display text of one style"""
+        style = self.get(name)
+        return {'name': style['name'], 'label': style['label'], 'description': style['description']}
+
+    def list_info(self):
+        """Display text of every style, for the style pickers"""
+        return [dict(self.info(name), id=name) for name in self._styles]
+
+
+# Shared registry: the built-in styles plus CHAT_STYLES_FILE
+styles = StyleRegistry(BUILTIN_STYLES, path=STYLES_FILE)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test the filter scratch buffer arena
+"""
+
+import threading
+
+import numpy as np
+
+from anime_mood_filter import AnimeMoodFilter
+from buffer_arena import BufferArena, get_arena
+from frame_fixtures import make_frame
+
+def test_buffers_reused_by_name():
+    """A name keeps one block; smaller shapes and other dtypes are views of it"""
+    arena = BufferArena(max_bytes=10_000)
+    first = arena.get('stage', (10, 20, 3))
+    assert np.shares_memory(arena.get('stage', (10, 20, 3)), first) and arena.allocations == 1
+    smaller = arena.get('stage', (5, 5), np.int32)
+    assert smaller.flags.c_contiguous and np.shares_memory(first, smaller) and arena.allocations == 1
+    arena.get('stage', (30, 30, 3))
+    assert arena.allocations == 2 and arena.bytes == 2700
+
+    # Over the cap the least recently used block goes
+    arena.get('other', (60, 60))
+    arena.get('third', (40, 40, 3))
+    assert arena.get_stats()['evictions'] >= 1 and arena.bytes <= 10_000
+    huge = arena.get('huge', (200, 200))
+    assert huge.shape == (200, 200) and 'huge' not in arena._buffers
+    print("✓ Blocks reused per name, grown on demand and capped")
+
+def test_arena_per_thread():
+    """Threads never share scratch buffers"""
+    arenas = []
+    thread = threading.Thread(target=lambda: arenas.append(get_arena()))
+    thread.start()
+    thread.join()
+    assert arenas[0] is not get_arena() and get_arena() is get_arena()
+    print("✓ One arena per thread")
+
+def test_repeated_requests_allocate_nothing():
+    """After the first request the pipeline runs entirely in reused buffers"""
+    arena = get_arena()
+    frames = [make_frame(360, 640, seed=seed) for seed in range(3)]
+    for style in ['Hayao', 'Paprika']:
+        mood_filter = AnimeMoodFilter(style)
+        first = mood_filter.apply_anime_filter(frames[0], quality='balanced')
+        kept = first.copy()
+        allocations = arena.allocations
+        results = [mood_filter.apply_anime_filter(frame, quality='balanced') for frame in frames[1:]]
+        assert arena.allocations == allocations, (style, arena.allocations - allocations)
+        # Results are new arrays, never arena buffers the next request overwrites
+        assert np.array_equal(first, kept)
+        assert not np.shares_memory(results[0], results[1])
+        assert np.array_equal(mood_filter.apply_anime_filter(frames[1], quality='balanced'), results[0])
+        print(f"✓ {style}: no scratch allocations after the first request")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Buffer Arena Test")
+    print("=" * 50)
+    test_buffers_reused_by_name()
+    test_arena_per_thread()
+    test_repeated_requests_allocate_nothing()
+    print("🎉 Buffer arena tests passed!")
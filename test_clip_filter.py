@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test clip filtering: frame sampling, the fixed clip palette, the streaming writers and
+frame order through the worker pool
+"""
+
+import io
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from clip_filter import (ClipFilter, ClipFilterLimit, ClipReader, encode_clip_frame, gif_palette_for,
+                         open_clip_writer)
+from color_quantization import FixedPaletteQuantizer
+from filter_workers import FilterWorkerPool
+from frame_fixtures import make_clip_frames
+
+def block_position(frame, height=240):
+    """Column of the dark block's center"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)[height // 3:height // 3 + 60].astype(np.float32)
+    dark = (gray < 60).sum(axis=0)
+    return float((np.arange(len(dark)) * dark).sum() / max(1, dark.sum()))
+
+def make_gif(frames, duration=100):
+    images = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames]
+    buffer = io.BytesIO()
+    images[0].save(buffer, 'GIF', save_all=True, append_images=images[1:], duration=duration, loop=0)
+    return buffer.getvalue()
+
+def decode_clip(data, clip_format):
+    """Every frame of an encoded clip, as BGR"""
+    if clip_format == 'mp4':
+        path = os.path.join(tempfile.mkdtemp(), 'clip.mp4')
+        with open(path, 'wb') as f:
+            f.write(data)
+        capture = cv2.VideoCapture(path)
+        frames = []
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+        os.remove(path)
+        return frames
+    image = Image.open(io.BytesIO(data))
+    frames = []
+    for index in range(image.n_frames):
+        image.seek(index)
+        frames.append(cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR))
+    return frames
+
+def test_fixed_palette_shared():
+    """Palettes built from the first frame are reused as-is for a different frame"""
+    first, last = make_clip_frames(2)
+    builder = FixedPaletteQuantizer()
+    _, palette = builder.quantize(first, 8)
+    reused = FixedPaletteQuantizer(builder.palettes).quantize(last, 8)[1]
+    assert np.array_equal(palette, reused)
+    assert not np.array_equal(palette, FixedPaletteQuantizer().quantize(cv2.bitwise_not(last), 8)[1])
+    print("✓ Clip palette reused across frames")
+
+def test_reader_samples_and_cuts():
+    """A 30 fps clip is sampled down evenly, scaled to even sides and cut at the limit"""
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'clip.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (320, 240))
+    for frame in make_clip_frames(60):
+        writer.write(frame)
+    writer.release()
+    try:
+        reader = ClipReader(path, fps=10, max_seconds=10, max_side=250)
+        frames = list(reader)
+        assert reader.fps == 10 and len(frames) == 20 and not reader.truncated
+        assert all(frame.shape == (186, 250, 3) for frame in frames)
+        reader.close()
+        reader = ClipReader(path, fps=10, max_seconds=1)
+        assert len(list(reader)) == 10 and reader.truncated
+        reader.close()
+    finally:
+        os.remove(path)
+        os.rmdir(workdir)
+    print("✓ 60 frames at 30 fps read as 20 frames at 10 fps")
+
+def test_writers_stream_frames():
+    """Each writer turns encoded frames into a clip that decodes with the same frames, in order"""
+    frames = make_clip_frames(6)
+    palette = gif_palette_for(frames[0])
+    workdir = tempfile.mkdtemp()
+    try:
+        for clip_format in ('webp', 'gif', 'mp4'):
+            path = os.path.join(workdir, 'clip.' + clip_format)
+            writer = open_clip_writer(clip_format, path, (320, 240), 10, palette)
+            for frame in frames:
+                writer.add(encode_clip_frame(frame, clip_format, gif_palette=palette))
+            writer.close()
+            with open(path, 'rb') as f:
+                decoded = decode_clip(f.read(), clip_format)
+            assert len(decoded) == len(frames), clip_format
+            positions = [block_position(frame) for frame in decoded]
+            assert positions == sorted(positions), (clip_format, positions)
+            os.remove(path)
+    finally:
+        os.rmdir(workdir)
+    print("✓ WebP, GIF and MP4 writers")
+
+def test_clip_filtered_in_order():
+    """A GIF comes back filtered in every format with its frames in their original order"""
+    pool = FilterWorkerPool(max_workers=2)
+    clip_filter = ClipFilter(pool)
+    try:
+        upload = make_gif(make_clip_frames(8))
+        for clip_format in ('webp', 'gif', 'mp4'):
+            clip = clip_filter.filter(upload, 'Hayao', clip_format=clip_format)
+            assert clip['frames'] == 8 and clip['format'] == clip_format
+            frames = decode_clip(clip['data'], clip_format)
+            assert len(frames) == 8 and frames[0].shape == (240, 320, 3)
+            positions = [block_position(frame) for frame in frames]
+            assert positions == sorted(positions), (clip_format, positions)
+        assert pool.in_flight == 0 and clip_filter.active == 0
+    finally:
+        pool.shutdown()
+    print("✓ GIF filtered in order as WebP, GIF and MP4")
+
+def test_rejections():
+    """Unknown formats, undecodable uploads and a full clip filter are refused"""
+    pool = FilterWorkerPool(max_workers=1)
+    try:
+        for clip_filter, data, clip_format, error in ((ClipFilter(pool), b'GIF', 'avi', ValueError),
+                                                      (ClipFilter(pool), b'not a clip', 'webp', ValueError),
+                                                      (ClipFilter(pool, max_concurrent=0), b'', 'gif',
+                                                       ClipFilterLimit)):
+            try:
+                clip_filter.filter(data, 'Shinkai', clip_format=clip_format)
+            except error:
+                pass
+            else:
+                raise AssertionError(f'{clip_format} clip was not rejected')
+    finally:
+        pool.shutdown()
+    print("✓ Bad clips and a full clip filter rejected")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Clip Filter Test")
+    print("=" * 50)
+    test_fixed_palette_shared()
+    test_reader_samples_and_cuts()
+    test_writers_stream_frames()
+    test_clip_filtered_in_order()
+    test_rejections()
+    print("🎉 Clip filter tests passed!")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test the style grading LUTs against the direct color operations
+"""
+
+import numpy as np
+
+from anime_mood_filter import AnimeMoodFilter
+from color_lut import build_lut, apply_lut
+from frame_fixtures import make_frame
+from image_quality import psnr
+
+def test_identity_lut():
+    """An empty operation chain leaves the image unchanged"""
+    image = make_frame(60, 80)
+    result = apply_lut(image, build_lut([]))
+    assert np.abs(result.astype(int) - image).max() <= 1
+    print("✓ Identity LUT")
+
+def test_style_luts_match_direct_grading():
+    """The compiled Hayao and Shinkai LUTs reproduce their point-wise operations"""
+    image = make_frame(120, 160)
+    for style in ['Hayao', 'Shinkai']:
+        mood_filter = AnimeMoodFilter(style)
+        direct = image
+        for operation in mood_filter._grading_operations():
+            direct = operation(direct)
+        graded = apply_lut(image, mood_filter._get_style_lut())
+        score = psnr(direct, graded)
+        assert score > 40, (style, score)
+        assert mood_filter._get_style_lut() is mood_filter._get_style_lut()
+        print(f"✓ {style} LUT matches direct grading ({score:.1f}dB)")
+
+def test_paprika_saturation_fused():
+    """Saturation inside the hue-shift pass matches a separate saturation pass"""
+    image = make_frame(120, 160)
+    mood_filter = AnimeMoodFilter('Paprika')
+    separate = mood_filter._enhance_saturation(mood_filter._apply_color_shift(image), 1.4)
+    fused = mood_filter._apply_color_shift(image, saturation=1.4)
+    score = psnr(separate, fused)
+    assert score > 40, score
+    print(f"✓ Fused Paprika saturation ({score:.1f}dB)")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Color LUT Test")
+    print("=" * 50)
+    test_identity_lut()
+    test_style_luts_match_direct_grading()
+    test_paprika_saturation_fused()
+    print("🎉 Color LUT tests passed!")
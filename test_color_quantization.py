@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test the color quantization backends against the original full k-means
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from color_quantization import (ColorQuantizer, QUANTIZER_BACKENDS, TemporalQuantizer, apply_palette,
+                                palette_for_style)
+from frame_fixtures import make_frame
+
+def _mse(a, b):
+    return float(np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2))
+
+def _smoothed_frame():
+    """A frame prepared the way apply_anime_filter prepares it"""
+    return cv2.bilateralFilter(make_frame(240, 320), 15, 200, 200)
+
+def test_backends_close_to_full_kmeans():
+    """Sampled k-means, median cut and octree stay close to full k-means quality"""
+    image = _smoothed_frame()
+    labels, palette = ColorQuantizer('kmeans').quantize(image, 8)
+    reference = _mse(apply_palette(labels, palette), image)
+
+    allowed = {'kmeans_sampled': 1.15, 'median_cut': 1.5, 'octree': 2.0}
+    for backend, ratio in allowed.items():
+        labels, palette = ColorQuantizer(backend).quantize(image, 8)
+        assert labels.shape == image.shape[:2] and labels.dtype == np.uint8
+        assert len(palette) <= 8 and labels.max() < len(palette)
+        error = _mse(apply_palette(labels, palette), image)
+        assert error <= reference * ratio, f"{backend}: {error:.1f} vs kmeans {reference:.1f}"
+        print(f"✓ {backend} MSE {error:.1f} (full k-means {reference:.1f})")
+
+def test_palette_backend_uses_style_colors():
+    """The palette backend needs no clustering and only uses the style's colors"""
+    image = _smoothed_frame()
+    labels, palette = ColorQuantizer('palette').quantize(image, 8, style='Paprika')
+    assert np.array_equal(palette, palette_for_style('Paprika'))
+    assert len(palette) == 12
+    print("✓ Fixed style palette applied")
+
+def test_lut_labels_nearest_color():
+    """LUT labels agree with an exact nearest-color search for almost every pixel"""
+    image = _smoothed_frame()
+    quantizer = ColorQuantizer('kmeans_sampled', lut_bits=6)
+    palette = quantizer.build_palette(image, 8)
+    labels = quantizer.label_pixels(image, palette)
+    distances = ((image.reshape(-1, 1, 3).astype(np.int32) - palette.astype(np.int32)) ** 2).sum(axis=2)
+    exact = np.argmin(distances, axis=1).reshape(labels.shape)
+    assert np.mean(labels == exact) > 0.97
+    print(f"✓ LUT agrees with exact search on {np.mean(labels == exact):.1%} of pixels")
+
+def test_sampled_backend_is_deterministic():
+    """Same image and seed give the same palette"""
+    image = _smoothed_frame()
+    first = ColorQuantizer('kmeans_sampled').build_palette(image, 8)
+    second = ColorQuantizer('kmeans_sampled').build_palette(image, 8)
+    assert np.array_equal(first, second)
+    print("✓ Sampled palette is deterministic")
+
+def test_unknown_backend_rejected():
+    """Typos in the backend setting fail loudly"""
+    try:
+        ColorQuantizer('kmean')
+    except ValueError:
+        print(f"✓ Unknown backend rejected (valid: {', '.join(QUANTIZER_BACKENDS)})")
+    else:
+        raise AssertionError('ColorQuantizer accepted an unknown backend')
+
+def _video(frames=8):
+    """A slowly panning camera with sensor noise"""
+    rng = np.random.default_rng(1)
+    base = _smoothed_frame()
+    for index in range(frames):
+        noise = rng.integers(-3, 4, base.shape)
+        yield np.uint8(np.clip(np.roll(base, 2 * index, axis=1).astype(np.int16) + noise, 0, 255))
+
+def test_temporal_quantizer_keeps_palette_steady():
+    """Video frames warm-start from the last palette: steadier, cheaper and about as accurate"""
+    temporal = TemporalQuantizer('kmeans_sampled')
+    per_frame = ColorQuantizer('kmeans_sampled')
+    flicker = {'temporal': [], 'per_frame': []}
+    errors = {'temporal': [], 'per_frame': []}
+    seconds = {'temporal': 0.0, 'per_frame': 0.0}
+    previous = {}
+    for frame in _video():
+        for name, quantizer in (('temporal', temporal), ('per_frame', per_frame)):
+            start = time.perf_counter()
+            labels, palette = quantizer.quantize(frame, 8)
+            seconds[name] += time.perf_counter() - start
+            errors[name].append(_mse(apply_palette(labels, palette), frame))
+            if name in previous:
+                # Distance from each color to the closest color of the previous palette
+                distance = np.abs(palette[:, None, :].astype(int) - previous[name][None, :, :]).sum(axis=2)
+                flicker[name].append(distance.min(axis=1).mean())
+            previous[name] = palette
+
+    assert temporal.stats['full'] == 1 and temporal.stats['reused'] + temporal.stats['refined'] == 7, temporal.stats
+    assert np.mean(flicker['temporal']) < np.mean(flicker['per_frame']), flicker
+    assert np.mean(errors['temporal']) <= np.mean(errors['per_frame']) * 1.2, errors
+
+    # A different scene starts from scratch
+    temporal.quantize(255 - _smoothed_frame(), 8)
+    assert temporal.stats['full'] == 2
+    print(f"✓ Temporal palette: flicker {np.mean(flicker['temporal']):.1f} vs {np.mean(flicker['per_frame']):.1f}, "
+          f"{seconds['temporal'] * 1000:.0f}ms vs {seconds['per_frame'] * 1000:.0f}ms for 8 frames, {temporal.stats}")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Color Quantization Test")
+    print("=" * 50)
+    test_backends_close_to_full_kmeans()
+    test_palette_backend_uses_style_colors()
+    test_lut_labels_nearest_color()
+    test_sampled_backend_is_deterministic()
+    test_unknown_backend_rejected()
+    test_temporal_quantizer_keeps_palette_steady()
+    print("🎉 Color quantization tests passed!")
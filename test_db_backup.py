@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test online database backups
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+
+from db_backup import DatabaseBackup
+
+def _make_database(path, rows=500):
+    """Create a small chat database to back up"""
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE messages (id INTEGER PRIMARY KEY, message TEXT)')
+    conn.executemany('INSERT INTO messages (message) VALUES (?)',
+                     [(f'message {i} ' + 'x' * 200,) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+def test_backup_creates_verified_snapshot():
+    """A backup produces a complete snapshot that passes the integrity check"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'chat_app.db')
+        _make_database(db_path)
+
+        backup = DatabaseBackup(db_path, backup_dir=os.path.join(tmp, 'backups'),
+                                pages_per_step=4, step_sleep=0)
+        result = backup.run_backup()
+
+        assert result['success'], result
+        assert backup.check_integrity(result['path']) == 'ok'
+
+        conn = sqlite3.connect(result['path'])
+        count = conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+        conn.close()
+        assert count == 500
+
+        status = backup.get_status()
+        assert status['state'] == 'idle'
+        assert status['pages_total'] > 4
+        assert status['progress'] == 1.0
+        print(f"✓ Backup copied {status['pages_total']} pages in steps")
+
+def test_backup_retention():
+    """Only the newest snapshots are kept"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'chat_app.db')
+        _make_database(db_path, rows=10)
+        backup_dir = os.path.join(tmp, 'backups')
+        os.makedirs(backup_dir)
+
+        # Pre-existing snapshots from earlier runs
+        for stamp in ['20240101_000000', '20240102_000000', '20240103_000000']:
+            open(os.path.join(backup_dir, f'chat_app_{stamp}.db'), 'wb').close()
+
+        backup = DatabaseBackup(db_path, backup_dir=backup_dir, keep=2, step_sleep=0)
+        result = backup.run_backup()
+
+        snapshots = backup.list_snapshots()
+        assert len(snapshots) == 2
+        assert snapshots[0] == result['path']
+        assert snapshots[1].endswith('chat_app_20240103_000000.db')
+        print("✓ Old snapshots pruned")
+
+def test_backups_do_not_collide():
+    """Back-to-back backups get distinct snapshots; a concurrent one is refused"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'chat_app.db')
+        _make_database(db_path)
+        backup = DatabaseBackup(db_path, backup_dir=os.path.join(tmp, 'backups'), step_sleep=0)
+
+        paths = [backup.run_backup()['path'] for _ in range(3)]
+        assert len(set(paths)) == 3 and backup.list_snapshots() == sorted(paths, reverse=True)
+
+        backup.pages_per_step, backup.step_sleep = 1, 0.02
+        results = []
+        running = threading.Thread(target=lambda: results.append(backup.run_backup()))
+        running.start()
+        for _ in range(500):
+            if backup.is_running():
+                break
+            threading.Event().wait(0.001)
+        refused = backup.run_backup()
+        running.join(30)
+        assert not refused['success'] and refused['message'] == 'Backup already running'
+        assert results[0]['success'] and not backup.is_running()
+        assert len(backup.list_snapshots()) == 4
+    print("✓ Same-second backups kept apart, concurrent backup refused")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Database Backup Test")
+    print("=" * 50)
+    test_backup_creates_verified_snapshot()
+    test_backup_retention()
+    test_backups_do_not_collide()
+    print("🎉 Database backup tests passed!")
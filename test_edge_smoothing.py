@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test the edge-preserving smoothing backends against the bilateral filter
+"""
+
+import cv2
+import numpy as np
+
+from anime_mood_filter import AnimeMoodFilter
+from edge_smoothing import EdgeSmoother, SMOOTHING_BACKENDS
+from frame_fixtures import make_frame
+from image_quality import ssim
+
+def test_backends_close_to_bilateral():
+    """Every backend smooths like two bilateral passes of the same diameter"""
+    frame = make_frame(240, 320)
+    reference = EdgeSmoother('bilateral').smooth(frame, 15).copy()
+    for backend in SMOOTHING_BACKENDS:
+        smoothed = EdgeSmoother(backend).smooth(frame, 15)
+        assert smoothed.shape == frame.shape and smoothed.dtype == np.uint8
+        score = ssim(reference, smoothed)
+        assert score > 0.98, (backend, score)
+        finished = EdgeSmoother(backend).finish(frame, 9)
+        assert finished.shape == frame.shape
+        print(f"✓ {backend}: SSIM {score:.3f} against bilateral")
+
+def test_guided_matches_reference_implementation():
+    """The in-place guided filter matches a plain allocate-as-you-go version"""
+    frame = make_frame(120, 160)
+    radius, eps = 4, 200.0 ** 2
+    size = (2 * radius + 1, 2 * radius + 1)
+    source = frame.astype(np.float32)
+    mean = cv2.boxFilter(source, -1, size)
+    variance = cv2.boxFilter(source * source, -1, size) - mean * mean
+    gain = variance / (variance + eps)
+    expected = cv2.boxFilter(gain, -1, size) * source + cv2.boxFilter(mean - gain * mean, -1, size)
+    expected = np.clip(expected + 0.5, 0, 255).astype(np.uint8)
+    actual = EdgeSmoother('guided').smooth(frame, 2 * radius + 1)
+    assert np.abs(actual.astype(int) - expected).max() <= 1
+    print("✓ Guided filter matches the reference implementation")
+
+def test_style_default_and_override():
+    """Styles pick their backend; an explicit smoother overrides it"""
+    frame = make_frame(480, 640)
+    default = AnimeMoodFilter('Hayao', quality='max').apply_anime_filter(frame)
+    guided = AnimeMoodFilter('Hayao', quality='max', smoother='guided').apply_anime_filter(frame)
+    bilateral = AnimeMoodFilter('Hayao', quality='max', smoother='bilateral').apply_anime_filter(frame)
+    assert np.array_equal(default, guided)
+    assert not np.array_equal(default, bilateral)
+    assert ssim(bilateral, default) > 0.95
+    paprika = AnimeMoodFilter('Paprika', quality='max').apply_anime_filter(frame)
+    assert np.array_equal(paprika, AnimeMoodFilter('Paprika', quality='max', smoother='bilateral').apply_anime_filter(frame))
+    try:
+        EdgeSmoother('median')
+    except ValueError:
+        print("✓ Style default, override and unknown backend")
+    else:
+        raise AssertionError('EdgeSmoother accepted an unknown backend')
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Edge Smoothing Test")
+    print("=" * 50)
+    test_backends_close_to_bilateral()
+    test_guided_matches_reference_implementation()
+    test_style_default_and_override()
+    print("🎉 Edge smoothing tests passed!")
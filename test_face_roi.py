@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test ROI-aware filtering: face region detection, the feathered seam and the fallbacks
+"""
+
+import cv2
+import numpy as np
+
+from anime_mood_filter import AnimeMoodFilter
+from color_quantization import ColorQuantizer
+from face_roi import FaceRegionDetector, feather_mask
+from frame_fixtures import DEFAULT_FIXTURE, make_frame, make_scene
+from image_quality import ssim
+
+def _scene():
+    return make_scene(720, 1280, cv2.imread(DEFAULT_FIXTURE, cv2.IMREAD_COLOR))
+
+def test_region_covers_face_and_shoulders():
+    """The region holds the face box, reaches below it and sits on the 8-pixel grid"""
+    scene = _scene()
+    detector = FaceRegionDetector()
+    faces = detector.detect_faces(scene)
+    assert len(faces) == 1
+    x, y, w, h = faces[0]
+    top, left, bottom, right = detector.region(scene, faces)
+    assert top <= y and left <= x and right >= x + w and bottom >= min(720, y + 2 * h)
+    assert all(value % 8 == 0 for value in (top, left)) and 0 <= top < bottom <= 720 and 0 <= left < right <= 1280
+    assert detector.region(make_frame(360, 480)) is None
+    print(f"✓ Face {faces[0]} -> region {(top, left, bottom, right)}")
+
+def test_feather_mask():
+    """Weights ramp up from the inner edges only; edges on the frame border stay at 1"""
+    mask = feather_mask((100, 0, 300, 200), (300, 400), 10)
+    assert mask.shape == (200, 200) and mask.dtype == np.float32
+    assert mask[100, 100] == 1.0
+    assert mask[0, 100] < 0.1 and mask[100, 199] < 0.1  # Top and right edges border the background
+    assert mask[199, 100] == 1.0 and mask[100, 0] == 1.0  # Bottom and left edges are the frame's
+    print("✓ Feather mask")
+
+def test_roi_filter_saves_time_and_keeps_face():
+    """The face region looks like the whole-frame filter; the background comes from the cheap pass"""
+    scene = _scene()
+    # The default sampled k-means, seeded so both runs start from the same sample
+    whole = AnimeMoodFilter('Hayao', quality='max', quantizer=ColorQuantizer(seed=0), roi=False).apply_anime_filter(scene)
+    mood_filter = AnimeMoodFilter('Hayao', quality='max', quantizer=ColorQuantizer(seed=0), roi=True)
+    output = mood_filter.apply_anime_filter(scene)
+    report = mood_filter.last_roi
+    assert output.shape == scene.shape and report['faces'] == 1 and report['share'] < 0.6
+    assert report['full_estimate_seconds'] > 0 and 'saved_seconds' in report
+    top, left, bottom, right = report['region']
+    assert ssim(whole[top:bottom, left:right], output[top:bottom, left:right]) > 0.95
+    assert not np.array_equal(whole[:top], output[:top])
+    print(f"✓ ROI {report['share']:.0%} of the frame, {report['saved_seconds'] * 1000:.0f}ms saved (estimated)")
+
+def test_falls_back_to_whole_frame():
+    """No face, a close-up selfie or a background preset that is not cheaper filter the whole frame"""
+    frame = make_frame(480, 640)
+    selfie = cv2.imread(DEFAULT_FIXTURE, cv2.IMREAD_COLOR)
+    for image, quality in ((frame, 'balanced'), (selfie, 'balanced'), (_scene(), 'fast')):
+        mood_filter = AnimeMoodFilter('Shinkai', quality=quality, roi=True)
+        output = mood_filter.apply_anime_filter(image)
+        assert mood_filter.last_roi is None
+        assert np.array_equal(output, AnimeMoodFilter('Shinkai', quality=quality, roi=False).apply_anime_filter(image))
+    try:
+        AnimeMoodFilter('Shinkai', roi=True, background_quality='cheap')
+    except ValueError:
+        print("✓ Whole-frame fallbacks and unknown background preset")
+    else:
+        raise AssertionError('AnimeMoodFilter accepted an unknown background preset')
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Face ROI Test")
+    print("=" * 50)
+    test_region_covers_face_and_shoulders()
+    test_feather_mask()
+    test_roi_filter_saves_time_and_keeps_face()
+    test_falls_back_to_whole_frame()
+    print("🎉 Face ROI tests passed!")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test the filter result cache: LRU and disk tiers, keys and request coalescing
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import filter_cache
+from filter_cache import FilterResultCache, cache_key
+
+def test_cache_key_covers_settings():
+    """Style, preset and pipeline version all change the key"""
+    data = b'photo bytes'
+    key = cache_key(data, 'Hayao', 'fast')
+    assert key == cache_key(data, 'Hayao', 'fast')
+    assert key != cache_key(b'other photo', 'Hayao', 'fast')
+    assert key != cache_key(data, 'Shinkai', 'fast')
+    assert key != cache_key(data, 'Hayao', 'max')
+    assert cache_key(data, 'Hayao', None) == cache_key(data, 'Hayao', os.environ.get('CHAT_FILTER_QUALITY', 'balanced'))
+
+    version = filter_cache.PIPELINE_VERSION
+    filter_cache.PIPELINE_VERSION = version + 1
+    try:
+        assert key != cache_key(data, 'Hayao', 'fast')
+    finally:
+        filter_cache.PIPELINE_VERSION = version
+    print("✓ Cache keys change with image, style, preset and pipeline version")
+
+def test_memory_and_disk_tiers():
+    """The LRU keeps recent results, the disk tier survives restarts and stays under its cap"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = FilterResultCache(directory, max_memory_bytes=250, max_disk_bytes=350)
+        for name in 'abcd':
+            cache.put(name, name.encode() * 100)
+        stats = cache.get_stats()
+        assert stats['memory_entries'] == 2 and stats['memory_bytes'] <= 250
+        assert stats['disk_entries'] == 3 and stats['disk_bytes'] <= 350
+        assert not os.path.exists(os.path.join(directory, 'a' + filter_cache.DISK_SUFFIX))
+        assert os.path.exists(os.path.join(directory, 'd' + filter_cache.DISK_SUFFIX))
+
+        assert cache.get('d') == b'd' * 100
+        assert cache.get('b') == b'b' * 100
+        assert cache.get('a') is None
+
+        with open(os.path.join(directory, 'photo.jpg'), 'wb') as f:
+            f.write(b'not a cache entry')
+        restarted = FilterResultCache(directory, max_memory_bytes=250, max_disk_bytes=350)
+        assert restarted.get('c') == b'c' * 100
+        assert restarted.get_stats()['disk_entries'] == 3 and os.path.exists(os.path.join(directory, 'photo.jpg'))
+        os.remove(os.path.join(directory, 'photo.jpg'))
+        stats = cache.get_stats()
+        assert (stats['memory'], stats['disk'], stats['bytes_saved']) == (1, 1, 200)
+
+        restarted.clear()
+        assert restarted.get_stats()['disk_entries'] == 0 and not os.listdir(directory)
+    print("✓ Memory LRU and size-capped disk tier")
+
+def test_identical_requests_share_one_computation():
+    """Requests for a key that is already being computed wait for it"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = FilterResultCache(directory)
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.3)
+            return b'filtered'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+                     for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        for thread in [leader] + followers:
+            thread.join(10)
+
+        assert len(calls) == 1
+        assert results == [b'filtered'] * 5
+        assert cache.get_or_compute('k', compute) == b'filtered' and len(calls) == 1
+        stats = cache.get_stats()
+        assert stats['miss'] == 1 and stats['coalesced'] == 4 and stats['memory'] == 1
+        assert stats['hit_rate'] == round(5 / 6, 4) and stats['bytes_saved'] == 5 * len(b'filtered')
+    print(f"✓ 5 concurrent requests ran the filter once, hit rate {stats['hit_rate']:.0%}")
+
+def test_cancelled_leader_hands_over():
+    """When the computing request is cancelled a waiting request computes instead"""
+    cache = FilterResultCache(max_disk_bytes=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def cancelled():
+        started.set()
+        release.wait(5)
+        raise CancelledError()
+
+    errors = []
+
+    def lead():
+        try:
+            cache.get_or_compute('k', cancelled)
+        except CancelledError:
+            errors.append('cancelled')
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait(5)
+    results = []
+    follower = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', lambda: b'second')))
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ['cancelled'] and results == [b'second']
+
+    try:
+        cache.get_or_compute('broken', lambda: 1 / 0)
+        assert False, 'errors should propagate'
+    except ZeroDivisionError:
+        pass
+    assert cache.get('broken') is None
+    print("✓ Cancelled computations hand over, errors are not cached")
+
+if __name__ == "__main__":
+    print("🧪 Testing filter result cache...")
+    test_cache_key_covers_settings()
+    test_memory_and_disk_tiers()
+    test_identical_requests_share_one_computation()
+    test_cancelled_leader_hands_over()
+    print("🎉 Filter cache tests passed!")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test asynchronous filter jobs with progress events
+"""
+
+import base64
+import threading
+
+import cv2
+import numpy as np
+
+from filter_cache import FilterResultCache
+from filter_jobs import FilterJobManager, FilterJobLimit
+from filter_workers import FilterWorkerPool
+from frame_fixtures import make_frame
+
+class EventLog:
+    """Collects notify() calls and signals when a job finishes"""
+
+    def __init__(self):
+        self.events = []
+        self.done = threading.Event()
+        self.preview = None
+
+    def __call__(self, user_id, event, payload):
+        self.events.append((user_id, event, payload['stage'], payload['status']))
+        if event == 'filter_job_preview':
+            self.preview = payload['preview']
+        if event == 'filter_job_done':
+            self.done.set()
+
+def _upload(height=240, width=320):
+    return cv2.imencode('.jpg', make_frame(height, width))[1].tobytes()
+
+def test_job_reports_stages_and_result():
+    """Submitting returns at once; stages and the result arrive as events"""
+    pool = FilterWorkerPool(max_workers=1)
+    log = EventLog()
+    manager = FilterJobManager(pool, log)
+    try:
+        job = manager.submit(7, 'Hayao', 'fast', upload=_upload(),
+                             on_complete=lambda job, jpeg: {'size': len(jpeg)})
+        assert job.active
+        assert log.done.wait(60), log.events
+        stages = [stage for _, event, stage, _ in log.events if event == 'filter_job_progress']
+        assert stages[0] == 'captured' and stages[-1] == 'encoded', stages
+        assert stages == sorted(stages, key=['captured', 'smoothed', 'quantized', 'encoded'].index)
+        assert log.events[-1][1:] == ('filter_job_done', 'encoded', 'done')
+        assert job.result['size'] > 0
+        assert manager.get(job.id, 8) is None and manager.get(job.id, 7) is job
+    finally:
+        pool.shutdown()
+    print(f"✓ Job reported {', '.join(stages)} and finished")
+
+def test_per_user_limit_and_cancel():
+    """Users have a cap on jobs in flight; queued jobs can be cancelled"""
+    pool = FilterWorkerPool(max_workers=1)
+    log = EventLog()
+    manager = FilterJobManager(pool, log, max_per_user=2)
+    try:
+        slow = manager.submit(1, 'Paprika', 'max', upload=_upload(720, 1280))
+        queued = manager.submit(1, 'Paprika', 'max', upload=_upload(720, 1280))
+        try:
+            manager.submit(1, 'Hayao', 'fast', upload=_upload())
+        except FilterJobLimit:
+            print("✓ Per-user job limit enforced")
+        else:
+            raise AssertionError('Third job admitted past the per-user limit')
+
+        assert manager.cancel(queued.id, 1)
+        assert not manager.cancel(queued.id, 2)
+        for _ in range(600):
+            if not slow.active and not queued.active:
+                break
+            threading.Event().wait(0.1)
+        assert queued.status == 'cancelled', queued.status
+        assert queued.result is None
+        # Slots are free again once jobs finish
+        again = manager.submit(1, 'Hayao', 'fast', upload=_upload())
+        for _ in range(600):
+            if not again.active:
+                break
+            threading.Event().wait(0.1)
+        assert again.status == 'done', again.error
+    finally:
+        pool.shutdown()
+    print("✓ Queued job cancelled")
+
+def test_repeated_upload_served_from_cache():
+    """The same photo sent twice at once is filtered once"""
+    pool = FilterWorkerPool(max_workers=1)
+    log = EventLog()
+    cache = FilterResultCache(max_disk_bytes=0)
+    manager = FilterJobManager(pool, log, cache=cache, preview_side=0)
+    photo = _upload()
+    try:
+        jobs = [manager.submit(user_id, 'Shinkai', 'fast', upload=photo,
+                               on_complete=lambda job, jpeg: {'size': len(jpeg)}) for user_id in (1, 2)]
+        for _ in range(600):
+            if not any(job.active for job in jobs):
+                break
+            threading.Event().wait(0.1)
+        assert [job.status for job in jobs] == ['done', 'done']
+        assert jobs[0].result == jobs[1].result
+        stats = cache.get_stats()
+        assert stats['miss'] == 1 and stats['coalesced'] + stats['memory'] == 1, stats
+    finally:
+        pool.shutdown()
+    print(f"✓ Second upload reused the first result ({stats['bytes_saved']} bytes saved)")
+
+def test_preview_before_full_result():
+    """A thumbnail arrives before the full result; cached results skip it"""
+    pool = FilterWorkerPool(max_workers=1)
+    cache = FilterResultCache(max_disk_bytes=0)
+    photo = _upload(720, 1280)
+    try:
+        log = EventLog()
+        manager = FilterJobManager(pool, log, cache=cache)
+        job = manager.submit(3, 'Hayao', 'balanced', upload=photo, on_complete=lambda job, jpeg: {'size': len(jpeg)})
+        assert log.done.wait(60), log.events
+        events = [event for _, event, _, _ in log.events]
+        assert events.count('filter_job_preview') == 1, events
+        assert events.index('filter_job_preview') < events.index('filter_job_done')
+        assert job.status == 'done' and job.has_preview
+        prefix = 'data:image/jpeg;base64,'
+        assert log.preview.startswith(prefix)
+        preview = cv2.imdecode(np.frombuffer(base64.b64decode(log.preview[len(prefix):]), np.uint8), cv2.IMREAD_COLOR)
+        assert preview.shape[:2] == (180, 320), preview.shape
+
+        log = EventLog()
+        manager.notify = log
+        again = manager.submit(3, 'Hayao', 'balanced', upload=photo)
+        assert log.done.wait(60) and again.status == 'done'
+        assert 'filter_job_preview' not in [event for _, event, _, _ in log.events]
+    finally:
+        pool.shutdown()
+    print(f"✓ Preview {preview.shape[1]}x{preview.shape[0]} sent before the full result, skipped once cached")
+
+def test_coalesced_jobs_share_preview():
+    """Two jobs for the same upload at once render one preview, dropped with the cache entry"""
+    pool = FilterWorkerPool(max_workers=2)
+    cache = FilterResultCache(max_disk_bytes=0)
+    log = EventLog()
+    manager = FilterJobManager(pool, log, cache=cache)
+    photo = _upload(720, 1280)
+    submit_encoded = pool.submit_encoded
+    previews = []
+
+    def counting_submit(*args, **kwargs):
+        if kwargs.get('max_side') == manager.preview_side:
+            previews.append(args[1])
+        return submit_encoded(*args, **kwargs)
+
+    pool.submit_encoded = counting_submit
+    try:
+        jobs = [manager.submit(user_id, 'Hayao', 'max', upload=photo) for user_id in (1, 2)]
+        for _ in range(600):
+            if not any(job.active for job in jobs):
+                break
+            threading.Event().wait(0.1)
+        assert [job.status for job in jobs] == ['done', 'done']
+        assert len(previews) == 1, previews
+        assert all(job.has_preview for job in jobs)
+        stats = cache.get_stats()
+        assert stats['miss'] == 1 and stats['previews'] == 0, stats
+    finally:
+        pool.shutdown()
+    print("✓ Coalesced jobs shared one preview")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Filter Job Test")
+    print("=" * 50)
+    test_job_reports_stages_and_result()
+    test_per_user_limit_and_cancel()
+    test_repeated_upload_served_from_cache()
+    test_preview_before_full_result()
+    test_coalesced_jobs_share_preview()
+    print("🎉 Filter job tests passed!")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test the anime filter quality presets against the max preset
+"""
+
+from anime_mood_filter import AnimeMoodFilter
+from frame_fixtures import make_frame
+from image_quality import psnr, ssim
+
+def test_presets_close_to_max():
+    """Fast and balanced stay close to max (benchmarks/bench_presets.py measures their speed)"""
+    frame = make_frame(540, 960)
+    limits = {'balanced': (28.0, 0.9), 'fast': (27.0, 0.8)}
+    for style in ['Hayao', 'Shinkai']:
+        mood_filter = AnimeMoodFilter(style)
+        reference = mood_filter.apply_anime_filter(frame, quality='max')
+        for quality, (min_psnr, min_ssim) in limits.items():
+            result = mood_filter.apply_anime_filter(frame, quality=quality)
+            assert result.shape == reference.shape
+            score_psnr, score_ssim = psnr(reference, result), ssim(reference, result)
+            assert score_psnr >= min_psnr and score_ssim >= min_ssim, (style, quality, score_psnr, score_ssim)
+            print(f"✓ {style} {quality}: {score_psnr:.1f}dB SSIM {score_ssim:.3f}")
+
+def test_small_images_not_downscaled():
+    """Small frames keep enough pixels for smoothing and quantization"""
+    frame = make_frame(240, 320)
+    mood_filter = AnimeMoodFilter('Hayao', quality='fast')
+    result = mood_filter.apply_anime_filter(frame)
+    assert result is not None and result.shape == frame.shape
+    print("✓ Small frame filtered at full resolution")
+
+def test_unknown_preset_rejected():
+    """Typos in the preset fail loudly"""
+    try:
+        AnimeMoodFilter('Hayao', quality='ultra')
+    except ValueError:
+        print("✓ Unknown preset rejected")
+    else:
+        raise AssertionError('AnimeMoodFilter accepted an unknown preset')
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Filter Preset Test")
+    print("=" * 50)
+    test_presets_close_to_max()
+    test_small_images_not_downscaled()
+    test_unknown_preset_rejected()
+    print("🎉 Filter preset tests passed!")
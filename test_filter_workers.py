@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test the anime filter worker pool
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from filter_workers import FilterWorkerPool, FilterPoolBusy
+from frame_fixtures import make_frame
+
+def test_encoded_frame_filtered_in_worker():
+    """Uploaded JPEG frames come back filtered, as JPEG, at the same size"""
+    pool = FilterWorkerPool(max_workers=2)
+    try:
+        _, upload = cv2.imencode('.jpg', make_frame(240, 320))
+        result = pool.filter_encoded(upload.tobytes(), 'Hayao', 'fast')
+        filtered = cv2.imdecode(np.frombuffer(result, dtype=np.uint8), cv2.IMREAD_COLOR)
+        assert filtered is not None and filtered.shape == (240, 320, 3)
+        assert pool.in_flight == 0
+    finally:
+        pool.shutdown()
+    print("✓ Encoded frame filtered in a worker process")
+
+def test_large_frames_scaled_down():
+    """Frames above the size limit are scaled to fit before filtering"""
+    pool = FilterWorkerPool(max_workers=1)
+    try:
+        _, upload = cv2.imencode('.jpg', make_frame(300, 800))
+        result = pool.filter_encoded(upload.tobytes(), 'Shinkai', 'fast', max_side=400)
+        filtered = cv2.imdecode(np.frombuffer(result, dtype=np.uint8), cv2.IMREAD_COLOR)
+        assert filtered.shape == (150, 400, 3)
+    finally:
+        pool.shutdown()
+    print("✓ Large frame scaled down")
+
+def test_styles_rendered_together():
+    """Several styles of one upload come back from a single worker job"""
+    pool = FilterWorkerPool(max_workers=1)
+    try:
+        _, upload = cv2.imencode('.jpg', make_frame(240, 320))
+        rendered = pool.render_styles_encoded(upload.tobytes(), ['Hayao', 'Paprika'], 'fast')
+        assert list(rendered['variants']) == ['Hayao', 'Paprika']
+        for jpeg in rendered['variants'].values():
+            assert cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR).shape == (240, 320, 3)
+        assert 'smoothing' in rendered['timings']
+    finally:
+        pool.shutdown()
+    print("✓ Two styles rendered in one worker job")
+
+def test_full_queue_rejects():
+    """With every slot taken, new jobs are rejected instead of piling up"""
+    pool = FilterWorkerPool(max_workers=1, max_pending=0, admission_timeout=0.1)
+    frame = make_frame(720, 1280)
+    try:
+        worker = threading.Thread(target=pool.filter_array, args=(frame, 'Paprika', 'max'))
+        worker.start()
+        time.sleep(0.2)
+        try:
+            pool.filter_array(frame, 'Paprika', 'fast')
+        except FilterPoolBusy:
+            print("✓ Full queue rejects new jobs")
+        else:
+            raise AssertionError('Job admitted past the queue limit')
+        worker.join()
+    finally:
+        pool.shutdown()
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Filter Worker Pool Test")
+    print("=" * 50)
+    test_encoded_frame_filtered_in_worker()
+    test_large_frames_scaled_down()
+    test_styles_rendered_together()
+    test_full_queue_rejects()
+    print("🎉 Filter worker pool tests passed!")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test the golden-image quality gate and the palette distance metric
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from frame_fixtures import make_frame
+from golden_gate import GOLDEN_DIR, check, render_mood
+from image_quality import palette_distance
+
+def test_palette_distance():
+    """Noise barely moves the palette; a color cast moves it a lot"""
+    frame = make_frame(240, 320)
+    noisy = np.clip(frame + np.random.default_rng(1).normal(0, 3, frame.shape), 0, 255).astype(np.uint8)
+    warm = frame.copy()
+    warm[:, :, 2] = cv2.add(warm[:, :, 2], 40)
+    assert palette_distance(frame, frame) == 0.0
+    assert palette_distance(frame, noisy) < 2.0
+    assert palette_distance(frame, warm) > 5.0
+    print(f"✓ Palette distance: noise {palette_distance(frame, noisy):.2f}, "
+          f"color cast {palette_distance(frame, warm):.2f}")
+
+def test_current_filter_passes():
+    """The reference and the balanced preset stay within tolerance of the stored golden images"""
+    results = check(filters=['mood'], style_names=['Hayao', 'Paprika'], paths=['reference', 'balanced'])
+    assert len(results) == 2 * 3 * 2
+    assert all(result['passed'] for result in results), [r for r in results if not r['passed']]
+    print(f"✓ {len(results)} golden checks passed")
+
+def test_gate_catches_look_change():
+    """A path that shifts the colors fails even though its structure is unchanged"""
+    def tinted(kind, style, path, image):
+        output = render_mood(style, path, image)
+        output[:, :, 0] = cv2.add(output[:, :, 0], 25)
+        return output
+
+    results = check(filters=['mood'], style_names=['Hayao'], paths=['max'], render=tinted)
+    assert results and not any(result['passed'] for result in results)
+    assert any('palette distance' in failure for result in results for failure in result['failures'])
+    print("✓ Tinted output rejected")
+
+def test_changed_style_needs_new_goldens():
+    """Golden images recorded for another declaration of a style are reported, not scored"""
+    golden_dir = tempfile.mkdtemp()
+    try:
+        shutil.copy(os.path.join(GOLDEN_DIR, 'manifest.json'), golden_dir)
+        with open(os.path.join(golden_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        for entry in manifest['goldens'].values():
+            entry['fingerprint'] = 'outdated'
+        with open(os.path.join(golden_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+        results = check(golden_dir, filters=['mood'], style_names=['Shinkai'])
+        assert len(results) == 3 and all('--update' in result['failures'][0] for result in results)
+    finally:
+        shutil.rmtree(golden_dir)
+    print("✓ Outdated golden images reported")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Golden Image Test")
+    print("=" * 50)
+    test_palette_distance()
+    test_current_filter_passes()
+    test_gate_catches_look_change()
+    test_changed_style_needs_new_goldens()
+    print("🎉 Golden image tests passed!")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the encode-once output formats and the background file writer
+"""
+
+import os
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+from filter_cache import cache_key
+from frame_fixtures import make_frame
+from image_output import AsyncFileWriter, OutputFormat, mime_type_for
+
+def test_output_formats():
+    """Each format encodes to something OpenCV reads back, and changes the cache key"""
+    frame = make_frame(240, 320)
+    sizes = {}
+    for output in (OutputFormat('jpeg', 90), OutputFormat('jpeg', 60), OutputFormat('jpg', 90, progressive=True),
+                   OutputFormat('webp', 80)):
+        data = output.encode(frame)
+        decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        assert decoded.shape == frame.shape, output
+        assert output.data_url(data).startswith(f'data:{output.mime_type};base64,')
+        sizes[output.key()] = len(data)
+    assert sizes['jpeg:60:0'] < sizes['jpeg:90:0']
+    assert OutputFormat('webp', progressive=True).progressive is False
+    assert mime_type_for('anime_hayao_1.webp') == 'image/webp' and mime_type_for('notes.txt') is None
+
+    keys = {cache_key(b'photo', 'Hayao', 'fast', output=OutputFormat(*settings))
+            for settings in (('jpeg', 90), ('jpeg', 70), ('webp', 90))}
+    assert len(keys) == 3
+    for bad in ({'format': 'gif'}, {'quality': 0}):
+        try:
+            OutputFormat(**bad)
+        except ValueError:
+            continue
+        raise AssertionError(f'{bad} accepted')
+    print(f"✓ Output formats encode and decode ({', '.join(f'{k}: {v} B' for k, v in sizes.items())})")
+
+def test_async_writer():
+    """Queued files are readable until written, then on disk; a full queue writes directly"""
+    with tempfile.TemporaryDirectory() as directory:
+        writer = AsyncFileWriter(max_pending_bytes=1000)
+        gate = threading.Lock()
+        gate.acquire()
+        write = writer._write
+
+        def held_write(path, data, outcome):
+            if outcome == 'background':
+                with gate:
+                    pass
+            write(path, data, outcome)
+
+        writer._write = held_write
+        first = os.path.join(directory, 'first.jpg')
+        writer.write(first, b'a' * 600)
+        assert writer.read(first) == b'a' * 600 and not os.path.exists(first)
+
+        # Over the pending cap: written before write() returns
+        second = os.path.join(directory, 'second.jpg')
+        writer.write(second, b'b' * 600)
+        assert os.path.exists(second) and writer.read(second) is None
+
+        gate.release()
+        assert writer.flush(5)
+        with open(first, 'rb') as f:
+            assert f.read() == b'a' * 600
+        assert writer.read(first) is None
+        stats = writer.get_stats()
+        assert (stats['background'], stats['direct'], stats['pending_bytes']) == (1, 1, 0), stats
+        assert sorted(os.listdir(directory)) == ['first.jpg', 'second.jpg']
+    print("✓ Background writer serves queued files from memory and flushes them")
+
+if __name__ == "__main__":
+    print("🧪 Testing image output...")
+    test_output_formats()
+    test_async_writer()
+    print("🎉 Image output tests passed!")
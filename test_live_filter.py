@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test live video filtering: newest-frame-wins dropping, the session cap and load adaptation
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from filter_workers import FilterWorkerPool
+from frame_fixtures import make_frame
+from live_filter import LIVE_SIDES, LiveFilterLimit, LiveFilterManager
+
+class Sent:
+    """Collects emit() calls"""
+
+    def __init__(self):
+        self.events = []
+        self.received = threading.Event()
+
+    def __call__(self, sid, event, payload):
+        self.events.append((sid, event, payload))
+        self.received.set()
+
+def _frame(height=360, width=480):
+    return cv2.imencode('.jpg', make_frame(height, width), [cv2.IMWRITE_JPEG_QUALITY, 70])[1].tobytes()
+
+def test_newest_frame_wins():
+    """A burst of frames is not queued: stale ones are dropped and the newest is filtered"""
+    pool = FilterWorkerPool(max_workers=1)
+    sent = Sent()
+    manager = LiveFilterManager(pool, sent)
+    try:
+        manager.start('sid-1', 1, 'Hayao', target_fps=15)
+        frame = _frame()
+        for seq in range(1, 11):
+            assert manager.submit_frame('sid-1', seq, frame)
+        for _ in range(600):
+            if any(payload['seq'] == 10 for _, _, payload in sent.events):
+                break
+            threading.Event().wait(0.05)
+        seqs = [payload['seq'] for _, event, payload in sent.events if event == 'live_filter_result']
+        assert seqs[-1] == 10 and seqs == sorted(seqs), seqs
+        session = manager.sessions['sid-1']
+        assert session.stats['dropped'] >= 7 and session.stats['filtered'] == len(seqs), session.stats
+        result = sent.events[-1][2]
+        assert cv2.imdecode(np.frombuffer(result['frame'], np.uint8), cv2.IMREAD_COLOR) is not None
+        assert result['latency_ms'] > 0 and 1 <= result['fps'] <= 15
+
+        # Frames after stop are ignored
+        assert manager.stop('sid-1') is session
+        assert not manager.submit_frame('sid-1', 11, frame)
+    finally:
+        pool.shutdown()
+    print(f"✓ 10-frame burst: filtered {seqs}, dropped {session.stats['dropped']}")
+
+def test_palette_follows_stream_across_workers():
+    """With several workers, a stream's frames carry its palette, so one scene is clustered once"""
+    pool = FilterWorkerPool(max_workers=2)
+    sent = Sent()
+    manager = LiveFilterManager(pool, sent)
+    try:
+        session = manager.start('sid-1', 1, 'Hayao', target_fps=15)
+        frame = _frame()
+        for seq in range(1, 7):
+            sent.received.clear()
+            assert manager.submit_frame('sid-1', seq, frame)
+            assert sent.received.wait(60), seq
+        stats = session.quantizer_state['stats']
+        assert session.stats['filtered'] == 6 and stats['full'] == 1, (session.stats, stats)
+        assert stats['full'] + stats['refined'] + stats['reused'] == 6, stats
+    finally:
+        pool.shutdown()
+    print(f"✓ Palette carried across 2 workers: {stats}")
+
+def test_busy_pool_lowers_rate():
+    """A frame turned away by a full pool is reported at once with the reduced rate"""
+    pool = FilterWorkerPool(max_workers=1, max_pending=0)
+    sent = Sent()
+    manager = LiveFilterManager(pool, sent)
+    blocker = threading.Thread(target=pool.filter_array, args=(make_frame(720, 1280), 'Paprika', 'max'))
+    try:
+        session = manager.start('sid-1', 1, 'Hayao', target_fps=12)
+        blocker.start()
+        for _ in range(600):
+            if pool.in_flight:
+                break
+            threading.Event().wait(0.01)
+        assert manager.submit_frame('sid-1', 1, _frame())
+        assert sent.events, 'No status sent for the rejected frame'
+        sid, event, payload = sent.events[-1]
+        assert (sid, event, payload['seq']) == ('sid-1', 'live_filter_status', 1)
+        assert payload['fps'] == 6 and payload['max_side'] == LIVE_SIDES[1] and payload['rejected'] == 1
+        assert not session.in_flight
+    finally:
+        blocker.join(60)
+        pool.shutdown()
+    print(f"✓ Busy pool: status sent at {payload['fps']} fps, {payload['max_side']}px")
+
+def test_session_cap():
+    """Sessions are capped per worker; a stopped session frees its slot"""
+    pool = FilterWorkerPool(max_workers=1)
+    manager = LiveFilterManager(pool, Sent(), sessions_per_worker=2)
+    manager.start('a', 1, 'Hayao')
+    manager.start('b', 2, 'Shinkai')
+    manager.start('a', 1, 'Paprika')  # restarting does not take another slot
+    try:
+        manager.start('c', 3, 'Hayao')
+    except LiveFilterLimit:
+        pass
+    else:
+        raise AssertionError('Third live session admitted past the cap')
+    manager.stop('b')
+    manager.start('c', 3, 'Hayao')
+    assert manager.get_status()['active'] == 2 and manager.get_status()['max_sessions'] == 2
+    print("✓ Live sessions capped per worker")
+
+def test_adapts_to_load():
+    """Slow frames step the size down and lower the requested rate; fast ones step back up"""
+    pool = FilterWorkerPool(max_workers=1)
+    manager = LiveFilterManager(pool, Sent(), sessions_per_worker=4)
+    session = manager.start('a', 1, 'Hayao', target_fps=10)
+    manager.start('b', 2, 'Hayao', target_fps=10)
+
+    session.worker_seconds = 0.2  # two sessions share one worker: 2.5 fps each
+    assert manager._adapt(session) == 10  # still warming up
+    session.stats['filtered'] = 3
+    fps = manager._adapt(session)
+    assert fps == 2.5 and session.max_side == LIVE_SIDES[1]
+
+    session.worker_seconds = 0.01
+    assert manager._adapt(session) == 10 and session.max_side == LIVE_SIDES[0]
+
+    assert manager._adapt(session, overloaded=True) == 5 and session.max_side == LIVE_SIDES[1]
+    print("✓ Frame size and rate follow worker load")
+
+if __name__ == "__main__":
+    print("🧪 Testing live filter...")
+    test_newest_frame_wins()
+    test_palette_follows_stream_across_workers()
+    test_busy_pool_lowers_rate()
+    test_session_cap()
+    test_adapts_to_load()
+    print("🎉 Live filter tests passed!")
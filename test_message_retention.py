@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test private message retention and archival
+"""
+
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+from message_retention import MessageRetention
+
+def _make_database(path, old_rows, new_rows):
+    """Create a chat database with old and recent private messages"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE private_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL,
+            sender_username TEXT NOT NULL,
+            recipient_username TEXT NOT NULL,
+            message TEXT NOT NULL,
+            message_type TEXT DEFAULT 'text',
+            extra_data TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    old_time = datetime.now() - timedelta(days=200)
+    rows = [(1, 'alice', 'bob', f'old {i}', 'text', 'x' * 1000, old_time + timedelta(seconds=i))
+            for i in range(old_rows)]
+    rows += [(2, 'bob', 'alice', f'new {i}', 'text', None, datetime.now()) for i in range(new_rows)]
+    conn.executemany('''
+        INSERT INTO private_messages (sender_id, sender_username, recipient_username, message, message_type, extra_data, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+def test_old_messages_move_to_archive():
+    """Expired messages move to the archive in batches and free pages in the hot DB"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'chat_app.db')
+        archive_path = os.path.join(tmp, 'chat_archive.db')
+        _make_database(db_path, old_rows=250, new_rows=20)
+
+        retention = MessageRetention(db_path, archive_path, max_age_days=90,
+                                     batch_size=100, batch_sleep=0)
+        retention.ensure_incremental_vacuum()
+        result = retention.archive_old_messages()
+
+        assert result['success'], result
+        assert result['moved'] == 250
+        assert result['batches'] == 3
+        assert result['pages_freed'] > 0
+
+        conn = sqlite3.connect(db_path)
+        remaining = conn.execute('SELECT COUNT(*) FROM private_messages').fetchone()[0]
+        conn.close()
+        assert remaining == 20
+
+        conn = sqlite3.connect(archive_path)
+        archived = conn.execute('SELECT COUNT(*) FROM private_messages').fetchone()[0]
+        conn.close()
+        assert archived == 250
+        print(f"✓ Archived {result['moved']} messages, freed {result['pages_freed']} pages")
+
+def test_archived_scrollback():
+    """Archived history pages backwards from the oldest message shown"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'chat_app.db')
+        archive_path = os.path.join(tmp, 'chat_archive.db')
+        _make_database(db_path, old_rows=30, new_rows=0)
+
+        retention = MessageRetention(db_path, archive_path, max_age_days=90, batch_sleep=0)
+        retention.archive_old_messages()
+
+        page = retention.get_archived_history('bob', 'alice', limit=10)
+        assert [m['message'] for m in page] == [f'old {i}' for i in range(20, 30)]
+
+        older = retention.get_archived_history('bob', 'alice', before=page[0]['archived_at'], limit=10)
+        assert [m['message'] for m in older] == [f'old {i}' for i in range(10, 20)]
+        print("✓ Archived scrollback works")
+
+def test_incremental_vacuum_is_a_migration():
+    """Startup leaves an existing database alone; the one-off migration switches it"""
+    import app
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'chat_app.db')
+        _make_database(db_path, old_rows=50, new_rows=0)
+        saved_path, app.DATABASE_PATH = app.DATABASE_PATH, db_path
+        try:
+            app.init_db()
+        finally:
+            app.DATABASE_PATH = saved_path
+
+        retention = MessageRetention(db_path, os.path.join(tmp, 'chat_archive.db'), batch_sleep=0)
+        assert not retention.incremental_vacuum_enabled()  # No full VACUUM at startup
+        result = retention.archive_old_messages()
+        assert result['success'] and result['moved'] == 50 and result['pages_freed'] == 0
+
+        retention.ensure_incremental_vacuum()
+        assert retention.incremental_vacuum_enabled()
+
+        new_path = os.path.join(tmp, 'new_chat_app.db')
+        saved_path, app.DATABASE_PATH = app.DATABASE_PATH, new_path
+        try:
+            app.init_db()
+        finally:
+            app.DATABASE_PATH = saved_path
+        assert MessageRetention(new_path).incremental_vacuum_enabled()  # New databases start incremental
+        print("✓ Incremental auto-vacuum is a migration, not a startup step")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Message Retention Test")
+    print("=" * 50)
+    test_old_messages_move_to_archive()
+    test_archived_scrollback()
+    test_incremental_vacuum_is_a_migration()
+    print("🎉 Message retention tests passed!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test the metrics registry and /metrics exposition format
+"""
+
+import sqlite3
+
+from metrics import MetricsRegistry, TimedConnection, DB_QUERY_SECONDS, timed_handler
+
+def test_histogram_exposition():
+    """Histograms render cumulative buckets, sum and count"""
+    registry = MetricsRegistry()
+    latency = registry.histogram('test_latency_seconds', 'Test latency', ['route'], buckets=(0.1, 1.0))
+    latency.observe(0.05, route='index')
+    latency.observe(0.5, route='index')
+    latency.observe(5.0, route='index')
+
+    text = registry.render()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{route="index",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="index",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{route="index",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{route="index"} 3' in text
+    print("✓ Histogram exposition format correct")
+
+def test_counters_and_gauges():
+    """Counters accumulate and callback gauges are read at scrape time"""
+    registry = MetricsRegistry()
+    events = registry.counter('test_events_total', 'Events', ['event'])
+    events.inc(event='connect')
+    events.inc(2, event='connect')
+    users = {'1': 'alice', '2': 'bob'}
+    registry.gauge('test_online_users', 'Online users', callback=lambda: len(users))
+
+    text = registry.render()
+    assert 'test_events_total{event="connect"} 3' in text
+    assert 'test_online_users 2' in text
+    print("✓ Counters and gauges render")
+
+def test_timed_handler_drops_extra_arguments():
+    """Wrapped handlers accept calls with optional extra arguments like a Socket.IO connect"""
+    registry = MetricsRegistry()
+    latency = registry.histogram('test_handler_seconds', 'Handler latency', ['event'])
+    calls = registry.counter('test_handler_total', 'Handler calls', ['event', 'outcome'])
+
+    @timed_handler(latency, calls, event='connect')
+    def handle_connect():
+        return 'ok'
+
+    assert handle_connect({'token': 'abc'}) == 'ok'
+    assert calls.get(event='connect', outcome='success') == 1
+    assert latency.get_count(event='connect') == 1
+    print("✓ Timed handler records calls")
+
+def test_timed_connection():
+    """Statements through TimedConnection are recorded by operation"""
+    before = DB_QUERY_SECONDS.get_count(operation='SELECT')
+    conn = sqlite3.connect(':memory:', factory=TimedConnection)
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.cursor().execute('SELECT * FROM t').fetchall()
+    conn.execute('SELECT COUNT(*) FROM t').fetchone()
+    conn.close()
+    assert DB_QUERY_SECONDS.get_count(operation='SELECT') == before + 2
+    print("✓ Database statements timed")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Metrics Test")
+    print("=" * 50)
+    test_histogram_exposition()
+    test_counters_and_gauges()
+    test_timed_handler_drops_extra_arguments()
+    test_timed_connection()
+    print("🎉 Metrics tests passed!")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test multi-style rendering with shared pipeline stages
+"""
+
+import numpy as np
+
+from anime_mood_filter import AnimeMoodFilter
+from frame_fixtures import make_frame
+
+STYLES = ['Hayao', 'Shinkai', 'Paprika']
+
+def test_variants_match_single_style_runs():
+    """Every variant is identical to running that style on its own"""
+    frame = make_frame(360, 640)
+    for quality in ['fast', 'max']:
+        rendered = AnimeMoodFilter('Hayao').render_styles(frame, STYLES, quality=quality)
+        assert list(rendered['variants']) == STYLES
+        for style in STYLES:
+            single = AnimeMoodFilter(style).apply_anime_filter(frame, quality=quality)
+            assert np.array_equal(rendered['variants'][style], single), (quality, style)
+        print(f"✓ {quality}: {len(STYLES)} variants match single-style runs")
+
+def test_shared_stages_run_once():
+    """Style-independent stages appear once; only style stages fork"""
+    stages = []
+    rendered = AnimeMoodFilter('Hayao').render_styles(make_frame(360, 640), STYLES, quality='fast',
+                                                       progress=stages.append)
+    timings = rendered['timings']
+    for shared in ['gray', 'edges']:
+        assert shared in timings
+    # Hayao smooths with the guided filter; Shinkai and Paprika share the bilateral smoothing
+    # but not a palette, as Paprika uses 12 colors
+    for stage in ['smoothing', 'upsample']:
+        assert [key for key in timings if key.split(':')[0] == stage] == [f'{stage}:guided', stage]
+    assert [key for key in timings if key.startswith('quantization')] == \
+        ['quantization:8:guided', 'quantization:8', 'quantization:12']
+    for style in STYLES:
+        assert f'style:{style}' in timings and f'brightness_contrast:{style}' in timings
+    assert stages == ['smoothed', 'quantized']
+
+    fixed = AnimeMoodFilter('Hayao', quantizer='palette').render_styles(make_frame(240, 320), ['Hayao', 'Shinkai'])
+    assert [key for key in fixed['timings'] if key.startswith('quantization')] == \
+        ['quantization:8:Hayao:guided', 'quantization:8:Shinkai']
+    print(f"✓ {len(timings)} stages for {len(STYLES)} styles in {rendered['total'] * 1000:.0f}ms")
+
+def test_unknown_style_rejected():
+    """Unknown styles raise instead of rendering a partial set"""
+    try:
+        AnimeMoodFilter('Hayao').render_styles(make_frame(120, 160), ['Hayao', 'Pixar'])
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+    print("✓ Unknown styles rejected")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Multi-Style Render Test")
+    print("=" * 50)
+    test_variants_match_single_style_runs()
+    test_shared_stages_run_once()
+    test_unknown_style_rejected()
+    print("🎉 Multi-style render tests passed!")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test the per-stage pipeline statistics and the benchmark suite's baseline comparison
+"""
+
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from anime_mood_filter import AnimeMoodFilter
+from bench_pipeline import (MachineMismatch, compare, load_images, machine_info, run, trim_baseline,
+                            write_baseline)
+from frame_fixtures import DEFAULT_FIXTURE, fit_image, make_frame
+
+def test_stage_stats_recorded():
+    """apply_anime_filter reports every stage's wall time, CPU time and traced peak memory"""
+    frame = make_frame(240, 320)
+    stats = {}
+    AnimeMoodFilter('Shinkai').apply_anime_filter(frame, quality='balanced', stats=stats)
+    assert {'gray', 'edges', 'style:Shinkai', 'brightness_contrast:Shinkai'} <= set(stats)
+    assert all(entry['calls'] == 1 and entry['wall_seconds'] >= 0 and entry['peak_bytes'] is None
+               for entry in stats.values())
+
+    traced = {}
+    tracemalloc.start()
+    try:
+        AnimeMoodFilter('Shinkai', max_memory_mb=1).apply_anime_filter(frame, quality='balanced', stats=traced)
+    finally:
+        tracemalloc.stop()
+    assert traced['palette']['calls'] == 1 and traced['edges']['calls'] > 1  # Tiles add up
+    assert traced['brightness_contrast:Shinkai']['peak_bytes'] > 0
+    print(f"✓ {len(stats)} stages recorded, {traced['edges']['calls']} tiles")
+
+def test_suite_runs_without_camera():
+    """A small run covers synthetic and fixture images with totals and stages"""
+    images = load_images(['synthetic', 'fixture'], [DEFAULT_FIXTURE])
+    assert fit_image(images['original_20250721_142923'], 240, 426).shape == (240, 426, 3)
+    runs = run(images, ['240p'], ['Hayao'], ['fast'], repeat=1)
+    assert set(runs) == {'synthetic/240p/Hayao/fast', 'original_20250721_142923/240p/Hayao/fast'}
+    for result in runs.values():
+        assert result['total']['wall_ms'] > 0 and result['total']['peak_mb'] > 0
+        assert result['stages']['edges']['cpu_ms'] >= 0
+    print(f"✓ {len(runs)} benchmark runs")
+
+def test_compare_flags_regressions():
+    """Growth past the tolerance and the noise floor is a regression; small changes are not"""
+    def result(total_ms, stage_ms, peak_mb):
+        return {'machine': machine_info(), 'runs': {'synthetic/480p/Hayao/fast': {
+            'total': {'wall_ms': total_ms, 'cpu_ms': total_ms, 'peak_mb': peak_mb},
+            'stages': {'smoothing': {'wall_ms': stage_ms, 'cpu_ms': stage_ms, 'peak_mb': 0.0}}}}}
+    baseline = result(100.0, 2.0, 10.0)
+    assert compare(result(110.0, 2.0, 11.0), baseline) == []
+    assert compare(result(100.0, 4.0, 10.0), baseline) == []  # Doubled, but under the noise floor
+    regressions = compare(result(150.0, 2.0, 20.0), baseline)
+    assert [(r['stage'], r['metric']) for r in regressions] == [('total', 'wall_ms'), ('total', 'peak_mb')]
+    assert compare({'machine': machine_info(),
+                    'runs': {'other/240p/Hayao/max': baseline['runs']['synthetic/480p/Hayao/fast']}},
+                   baseline) == []
+    print("✓ Baseline comparison")
+
+def test_trimmed_baseline():
+    """The stored baseline keeps totals and the machine, one run per line, and still catches regressions"""
+    runs = run(load_images(['synthetic'], []), ['240p'], ['Paprika'], ['fast', 'max'], repeat=1)
+    results = {'created': '2026-01-01T00:00:00', 'machine': machine_info(), 'settings': {'repeat': 1},
+               'runs': runs}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'pipeline.json')
+        write_baseline(trim_baseline(results), path)
+        with open(path) as f:
+            text = f.read()
+        baseline = json.loads(text)
+    assert sum('"synthetic/240p/Paprika/' in line for line in text.splitlines()) == 2
+    assert baseline['machine'] == results['machine']
+    assert all(set(row) == {'total'} for row in baseline['runs'].values())
+    assert compare(results, baseline) == []
+
+    slower = {**results, 'runs': {}}
+    for key, row in runs.items():
+        slower['runs'][key] = {**row, 'total': {**row['total'], 'wall_ms': row['total']['wall_ms'] * 2 + 10}}
+    assert {r['run'] for r in compare(slower, baseline)} == set(runs)
+    print(f"✓ Trimmed baseline: {len(text.splitlines())} lines")
+
+def test_compare_refuses_other_machine():
+    """A baseline from a different machine is refused unless explicitly allowed"""
+    row = {'total': {'wall_ms': 100.0, 'cpu_ms': 100.0, 'peak_mb': 10.0}, 'stages': {}}
+    results = {'machine': machine_info(), 'runs': {'synthetic/480p/Hayao/fast': row}}
+    baseline = {'machine': {**machine_info(), 'cpu_count': 64, 'cpu_model': 'Other CPU'},
+                'runs': {'synthetic/480p/Hayao/fast': row}}
+    try:
+        compare(results, baseline)
+        raise AssertionError('Expected MachineMismatch')
+    except MachineMismatch as e:
+        assert 'cpu_model, cpu_count' in str(e)
+    assert compare(results, baseline, allow_other_machine=True) == []
+    print("✓ Other machine's baseline refused")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Pipeline Benchmark Test")
+    print("=" * 50)
+    test_stage_stats_recorded()
+    test_suite_runs_without_camera()
+    test_compare_flags_regressions()
+    test_trimmed_baseline()
+    test_compare_refuses_other_machine()
+    print("🎉 Pipeline benchmark tests passed!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test the SQLite slow-query tracer
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+from query_tracer import QueryTracer, parameter_shape
+
+def _make_connection(tracer):
+    """In-memory chat database with one indexed and one unindexed column"""
+    conn = sqlite3.connect(':memory:', factory=tracer.connection_factory())
+    conn.execute('CREATE TABLE private_messages (id INTEGER PRIMARY KEY, sender_username TEXT, message TEXT)')
+    conn.execute('CREATE INDEX idx_sender ON private_messages (sender_username)')
+    conn.executemany('INSERT INTO private_messages (sender_username, message) VALUES (?, ?)',
+                     [(f'user{i % 10}', f'secret {i}') for i in range(200)])
+    return conn
+
+def test_slow_statements_recorded_with_plan():
+    """Statements over the threshold are grouped, shaped and explained once"""
+    tracer = QueryTracer(threshold_ms=0, enabled=True)
+    conn = _make_connection(tracer)
+    tracer.reset()
+
+    for i in range(3):
+        conn.execute('SELECT * FROM private_messages WHERE message = ?', (f'secret {i}',)).fetchall()
+    conn.execute('SELECT * FROM  private_messages\n WHERE sender_username = ?', ('user1',)).fetchall()
+
+    top = {entry['sql']: entry for entry in tracer.top_statements()}
+    scan = top['SELECT * FROM private_messages WHERE message = ?']
+    assert scan['count'] == 3
+    assert scan['parameter_shapes'] == ['(str)']
+    assert scan['full_scan'] is True
+    assert 'secret' not in scan['sample_statement']
+
+    indexed = top['SELECT * FROM private_messages WHERE sender_username = ?']
+    assert indexed['full_scan'] is False
+    assert any('idx_sender' in step for step in indexed['query_plan'])
+    conn.close()
+    print("✓ Slow statements recorded with query plans")
+
+def test_disabled_tracer_records_nothing():
+    """Tracing is opt-in"""
+    tracer = QueryTracer(threshold_ms=0, enabled=False)
+    conn = _make_connection(tracer)
+    conn.execute('SELECT COUNT(*) FROM private_messages').fetchone()
+    conn.close()
+    assert tracer.top_statements() == []
+    print("✓ Disabled tracer is silent")
+
+def test_parameter_shapes():
+    """Parameter shapes describe types, not values"""
+    assert parameter_shape(('bob', 5, None)) == '(str, int, NoneType)'
+    assert parameter_shape({'user': 'bob', 'limit': 5}) == '{limit: int, user: str}'
+    print("✓ Parameter shapes")
+
+def test_emotion_database_uses_tracer():
+    """EmotionDatabase statements go through the tracing connection"""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'emotion_web', 'emotion_web'))
+    from database import EmotionDatabase
+
+    tracer = QueryTracer(threshold_ms=0, enabled=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = EmotionDatabase(os.path.join(tmp, 'emotion_data.db'), connection_factory=tracer.connection_factory())
+        db.get_total_records_count()
+    assert any('emotion_records' in entry['sql'] for entry in tracer.top_statements())
+    print("✓ EmotionDatabase traced")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Query Tracer Test")
+    print("=" * 50)
+    test_slow_statements_recorded_with_plan()
+    test_disabled_tracer_records_nothing()
+    test_parameter_shapes()
+    test_emotion_database_uses_tracer()
+    print("🎉 Query tracer tests passed!")
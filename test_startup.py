@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Test that app.py starts without importing the heavy AI libraries
+"""
+
+from startup_report import measure_imports, build_report
+
+def test_app_import_skips_heavy_modules():
+    """cv2, numpy, bcrypt and the AI modules stay out of the startup path"""
+    report = build_report(measure_imports('app'), 'app', budget_ms=float('inf'))
+    assert report['heavy_modules_loaded'] == [], report['heavy_modules_loaded']
+    print(f"✓ app imported in {report['total_ms']:.0f}ms without heavy modules")
+
+def test_ai_modules_load_on_first_use():
+    """AI endpoints load the modules on demand when no warm-up was started"""
+    import app
+    assert app.ai_features_ready() == app.EMOTION_AVAILABLE
+    assert app.ai_ready.is_set()
+    if app.EMOTION_AVAILABLE:
+        assert app.AnimeMoodFilter is not None
+        assert app.EmotionDetector is not None
+    print(f"✓ AI modules loaded on first use: {app.ai_status['state']}")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Startup Test")
+    print("=" * 50)
+    test_app_import_skips_heavy_modules()
+    test_ai_modules_load_on_first_use()
+    print("🎉 Startup tests passed!")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test the declarative style registry and the pipelines compiled from it
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+import anime_mood_filter
+from anime_mood_filter import AnimeMoodFilter
+from filter_cache import cache_key
+from frame_fixtures import make_frame
+from style_registry import StyleRegistry, BUILTIN_STYLES, styles
+
+def test_builtin_styles():
+    """The built-in styles are registered with their display text"""
+    assert styles.names() == ['Shinkai', 'Hayao', 'Paprika']
+    assert styles.get('Hayao')['name'] == 'Studio Ghibli Style'
+    assert styles.get('Paprika')['colors'] == 12
+    assert styles.resolve('Unknown') == 'Shinkai'
+    assert [info['id'] for info in styles.list_info()] == styles.names()
+    print("✓ Built-in styles")
+
+def test_invalid_declarations_rejected():
+    """Incomplete declarations and unknown steps fail at registration, not mid-filter"""
+    registry = StyleRegistry()
+    bad = [
+        {'description': 'no name'},
+        {'name': 'X', 'description': 'x', 'grading': [{'op': 'sepia', 'factor': 1.0}]},
+        {'name': 'X', 'description': 'x', 'grading': [{'op': 'saturation'}]},
+        {'name': 'X', 'description': 'x', 'effects': [{'op': 'hue_wave', 'amplitude': 10}]},
+        {'name': 'X', 'description': 'x', 'palette': ['#12345g', '#000000']},
+        {'name': 'X', 'description': 'x', 'colors': 1},
+        {'name': 'X', 'description': 'x', 'blur': 3},
+    ]
+    for definition in bad:
+        try:
+            registry.register('Custom', definition)
+        except ValueError:
+            continue
+        raise AssertionError(f'{definition} was accepted')
+    assert 'Custom' not in registry
+    print(f"✓ {len(bad)} invalid declarations rejected")
+
+def test_registered_style_renders():
+    """A style added at runtime renders; one declared like Shinkai matches it exactly"""
+    frame = make_frame(120, 160)
+    styles.register('ShinkaiCopy', dict(BUILTIN_STYLES['Shinkai'], name='Copy'))
+    styles.register('Dusk', {
+        'name': 'Dusk Style',
+        'description': 'Cool, heavily graded colors',
+        'colors': 6,
+        'grading': [{'op': 'color_temperature', 'factor': 0.85}, {'op': 'saturation', 'factor': 1.2}],
+        'effects': [{'op': 'hue_wave', 'amplitude': 12, 'frequency': 0.02, 'saturation': 1.0}],
+        'image_weight': 0.8,
+        'edge_strength': 0.2,
+        'brightness': 0,
+        'contrast': 1.2,
+    })
+    try:
+        expected = AnimeMoodFilter('Shinkai', quality='fast').apply_anime_filter(frame)
+        copied = AnimeMoodFilter('ShinkaiCopy', quality='fast').apply_anime_filter(frame)
+        assert np.array_equal(expected, copied)
+
+        dusk = AnimeMoodFilter('Dusk', quality='fast').apply_anime_filter(frame)
+        assert dusk is not None and dusk.shape == frame.shape
+        assert not np.array_equal(dusk, expected)
+        print("✓ Runtime styles render (copy of Shinkai is bit-identical)")
+    finally:
+        styles.unregister('ShinkaiCopy')
+        styles.unregister('Dusk')
+
+def test_compiled_pipeline_cached():
+    """Styles compile once; changing a declaration compiles it again and changes its cache key"""
+    definition = dict(BUILTIN_STYLES['Hayao'], name='Temporary')
+    styles.register('Temporary', definition)
+    try:
+        compiled = anime_mood_filter._compile_style('Temporary')
+        assert anime_mood_filter._compile_style('Temporary') is compiled
+        key = cache_key(b'image', 'Temporary')
+
+        styles.register('Temporary', dict(definition, grading=[{'op': 'color_temperature', 'factor': 1.3}]))
+        recompiled = anime_mood_filter._compile_style('Temporary')
+        assert recompiled is not compiled
+        assert not np.array_equal(recompiled.grading_lut, compiled.grading_lut)
+        assert cache_key(b'image', 'Temporary') != key
+        print("✓ Compiled pipelines cached per declaration")
+    finally:
+        styles.unregister('Temporary')
+
+def test_load_file():
+    """Styles can be added from a JSON file"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'styles.json')
+        with open(path, 'w') as f:
+            json.dump({'Mono': {'name': 'Mono Style', 'description': 'Grey', 'colors': 4,
+                                'grading': [{'op': 'saturation', 'factor': 0.0}]}}, f)
+        registry = StyleRegistry(BUILTIN_STYLES, path=path)
+        assert StyleRegistry().load_file(path) == ['Mono']
+    assert registry.names()[-1] == 'Mono'
+    assert registry.get('Mono')['image_weight'] == 0.85  # Defaults filled in
+    print("✓ Styles loaded from JSON")
+
+def test_camera_fallback_styles():
+    """The camera fallback reads plain display text and falls back to the default style"""
+    from camera_fallback import CameraFallback
+    fallback = CameraFallback()
+    assert isinstance(fallback.anime_styles, dict)
+    assert fallback.anime_styles.get('Missing') is None
+    assert fallback.simulate_mood_filter('Hayao')['style_name'] == styles.info('Hayao')['name']
+    result = fallback.simulate_mood_filter('Missing')
+    assert result['success'] and result['style_name'] == styles.info('Shinkai')['name']
+    print("✓ Camera fallback handles unknown styles")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Style Registry Test")
+    print("=" * 50)
+    test_builtin_styles()
+    test_invalid_declarations_rejected()
+    test_registered_style_renders()
+    test_compiled_pipeline_cached()
+    test_load_file()
+    test_camera_fallback_styles()
+    print("🎉 Style registry tests passed!")
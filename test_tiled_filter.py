@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test tiled, memory-bounded filtering of large frames
+"""
+
+import tracemalloc
+
+from buffer_arena import get_arena
+
+from anime_mood_filter import AnimeMoodFilter
+from frame_fixtures import make_frame
+from image_quality import psnr
+
+def test_tiles_have_no_seams():
+    """With the same palette, tiled output matches the whole-frame output"""
+    frame = make_frame(720, 1280)
+    for style in ['Hayao', 'Shinkai', 'Paprika']:
+        whole = AnimeMoodFilter(style).apply_anime_filter(frame, quality='balanced')
+        # 20 MB forces tiles of a few hundred pixels
+        tiled = AnimeMoodFilter(style, max_memory_mb=20).apply_anime_filter(frame, quality='balanced')
+        assert tiled.shape == whole.shape
+        score = psnr(whole, tiled)
+        assert score >= 45.0, (style, score)
+        print(f"✓ {style} tiled vs whole frame: {score:.1f}dB")
+
+def test_peak_memory_follows_cap():
+    """Peak allocation stays near the cap instead of growing with the frame"""
+    frame = make_frame(1500, 2000)
+    output_mb = frame.nbytes / 2 ** 20
+    peaks = {}
+    for cap in [None, 64, 32]:
+        mood_filter = AnimeMoodFilter('Paprika', max_memory_mb=cap)
+        get_arena().clear()  # Measure a cold worker, not buffers left by the previous run
+        tracemalloc.start()
+        try:
+            result = mood_filter.apply_anime_filter(frame, quality='balanced')
+            peaks[cap] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+        assert result is not None and result.shape == frame.shape
+    for cap in [64, 32]:
+        assert peaks[cap] <= cap * 1.25 + output_mb, (cap, peaks[cap])
+    assert peaks[32] < peaks[64] < peaks[None]
+    print(f"✓ Peak MB: whole frame {peaks[None]:.0f}, cap 64 -> {peaks[64]:.0f}, cap 32 -> {peaks[32]:.0f}")
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("🧪 Tiled Filter Test")
+    print("=" * 50)
+    test_tiles_have_no_seams()
+    test_peak_memory_follows_cap()
+    print("🎉 Tiled filter tests passed!")